@@ -0,0 +1,345 @@
+"""
+Cryptora benchmark suite.
+
+Measures encrypt/decrypt throughput (MB/s), per-file latency percentiles and
+peak RSS for the library (cryptora.encryption) and CLI (cryptora.cli) file
+paths, across file sizes, cipher suites and worker counts, plus a many small
+files case built from data/myFiles/quotes*.json. Every case runs in its own
+process so peak RSS is not inherited from earlier cases, and all input data
+is generated from a fixed seed.
+
+    python benchmarks/bench_cryptora.py --sizes 1K,1M,1G --output results.json
+    python benchmarks/bench_cryptora.py --baseline results.json --tolerance 0.1
+
+With --baseline the run exits non-zero when any case is slower (MB/s) or
+uses more memory (peak RSS) than the baseline by more than the tolerance.
+"""
+import os
+import io
+import sys
+import glob
+import json
+import time
+import random
+import shutil
+import argparse
+import platform
+import resource
+import tempfile
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+SMALL_FILES = os.path.join(ROOT, "data", "myFiles", "quotes*.json")
+UNITS = {"K": 1024, "M": 1024 ** 2, "G": 1024 ** 3}
+BLOCK = 1024 * 1024
+SEED = 20250831
+
+
+# ---------------- Helpers ----------------
+def parse_size(text):
+    text = text.strip().upper().rstrip("B")
+    if text and text[-1] in UNITS:
+        return int(float(text[:-1]) * UNITS[text[-1]])
+    return int(text)
+
+def format_size(size):
+    for unit in ("G", "M", "K"):
+        if size >= UNITS[unit] and size % UNITS[unit] == 0:
+            return f"{size // UNITS[unit]}{unit}"
+    return str(size)
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered) + 0.5) - 1))
+    return ordered[rank]
+
+def peak_rss_mb(who=resource.RUSAGE_SELF):
+    peak = resource.getrusage(who).ru_maxrss
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def write_random_file(path, size, seed):
+    """
+    Writes `size` deterministic pseudo-random bytes in blocks, so generating
+    multi-GB inputs does not inflate the benchmark's own memory use
+    """
+    rng = random.Random(seed)
+    with open(path, "wb") as f:
+        remaining = size
+        while remaining:
+            block = min(BLOCK, remaining)
+            f.write(rng.randbytes(block))
+            remaining -= block
+
+
+# ---------------- Datasets ----------------
+def single_file_dataset(workdir, size):
+    path = os.path.join(workdir, f"single_{format_size(size)}.bin")
+    if not os.path.exists(path):
+        write_random_file(path, size, SEED + size)
+    return [path]
+
+def small_files_dataset(workdir, count):
+    folder = os.path.join(workdir, f"small_{count}")
+    sources = sorted(glob.glob(SMALL_FILES))
+    if not os.path.isdir(folder):
+        os.makedirs(folder)
+        for i in range(count):
+            src = sources[i % len(sources)]
+            shutil.copyfile(src, os.path.join(folder, f"{i:06d}_{os.path.basename(src)}"))
+    return sorted(os.path.join(folder, name) for name in os.listdir(folder))
+
+
+# ---------------- Operations ----------------
+class ThreadOutput(io.TextIOBase):
+    """
+    sys.stdout replacement that sends each thread's prints to its own
+    buffer while capture() is active, and the rest to the real stdout.
+    Installed once: swapping sys.stdout per call races across threads.
+    """
+    def __init__(self, stream):
+        self.stream = stream
+        self.local = threading.local()
+
+    def write(self, text):
+        buffer = getattr(self.local, "buffer", None)
+        return (buffer or self.stream).write(text)
+
+    def flush(self):
+        self.stream.flush()
+
+    def capture(self, func, *args):
+        self.local.buffer = io.StringIO()
+        try:
+            func(*args)
+            return self.local.buffer.getvalue()
+        finally:
+            self.local.buffer = None
+
+def make_ops(api, key_path, cipher, workers):
+    """
+    Returns (encrypt, decrypt) callables taking one path and returning the
+    path of the file they produced
+    """
+    from cryptora import cli, encryption
+
+    if api == "cli":
+        if not isinstance(sys.stdout, ThreadOutput):
+            sys.stdout = ThreadOutput(sys.stdout)
+
+        def run_cli(func, *args):
+            # The CLI reports errors by printing, so surface them here
+            out = sys.stdout.capture(func, *args)
+            if "error" in out.lower() or "failed" in out.lower():
+                raise RuntimeError(out.strip())
+
+        def encrypt(path):
+            run_cli(cli.encrypt_file, path, key_path, workers, cipher)
+            key_name = os.path.splitext(os.path.basename(key_path))[0]
+            return path + f".enc_{key_name}"
+
+        def decrypt(path):
+            run_cli(cli.decrypt_file, path, key_path, workers)
+            return path.split(".enc_")[0]
+        return encrypt, decrypt
+
+    key = cli.load_key(key_path)
+
+    def encrypt(path):
+        return encryption.encrypt_file(path, key, path + ".enc", workers=workers, cipher=cipher)
+
+    def decrypt(path):
+        return encryption.decrypt_file(path, key, path + ".dec", workers=workers)
+    return encrypt, decrypt
+
+def timed(op, path):
+    start = time.perf_counter()
+    output = op(path)
+    return output, time.perf_counter() - start
+
+def measure(op, paths, file_workers):
+    """
+    Runs op over paths (on a thread pool for file_workers > 1), returns
+    the outputs and a throughput/latency summary
+    """
+    start = time.perf_counter()
+    if file_workers > 1:
+        with ThreadPoolExecutor(max_workers=file_workers) as pool:
+            results = list(pool.map(lambda p: timed(op, p), paths))
+    else:
+        results = [timed(op, p) for p in paths]
+    elapsed = time.perf_counter() - start
+
+    size = sum(os.path.getsize(p) for p in paths)
+    latencies = [seconds * 1000 for _, seconds in results]
+    return [output for output, _ in results], {
+        "seconds": round(elapsed, 6),
+        "bytes": size,
+        "mb_s": round(size / BLOCK / elapsed, 3) if elapsed else None,
+        "latency_ms": {
+            "p50": round(percentile(latencies, 50), 3),
+            "p90": round(percentile(latencies, 90), 3),
+            "p99": round(percentile(latencies, 99), 3),
+            "max": round(max(latencies), 3),
+        },
+    }
+
+def run_case(case, workdir, key_path):
+    if case["kind"] == "single":
+        paths = single_file_dataset(workdir, case["size"])
+        chunk_workers, file_workers = case["workers"], 1
+    else:
+        paths = small_files_dataset(workdir, case["count"])
+        chunk_workers, file_workers = 1, case["workers"]
+
+    encrypt, decrypt = make_ops(case["api"], key_path, case["cipher"], chunk_workers)
+    rss_before = peak_rss_mb()
+    enc_stats = dec_stats = None
+    for _ in range(case["repeat"]):
+        encrypted, enc_run = measure(encrypt, paths, file_workers)
+        decrypted, dec_run = measure(decrypt, encrypted, file_workers)
+        for path in encrypted + [p for p in decrypted if p not in paths]:
+            os.remove(path)
+        # Keep the fastest run, the least disturbed by background noise
+        if enc_stats is None or enc_run["seconds"] < enc_stats["seconds"]:
+            enc_stats = enc_run
+        if dec_stats is None or dec_run["seconds"] < dec_stats["seconds"]:
+            dec_stats = dec_run
+
+    return dict(case, encrypt=enc_stats, decrypt=dec_stats,
+                baseline_rss_mb=round(rss_before, 1),
+                peak_rss_mb=round(peak_rss_mb(), 1),
+                peak_children_rss_mb=round(peak_rss_mb(resource.RUSAGE_CHILDREN), 1))
+
+
+# ---------------- Matrix ----------------
+def build_cases(args):
+    from cryptora.encryption import CIPHERS
+    ciphers = args.ciphers or list(CIPHERS)
+    workers = args.workers or sorted({1, os.cpu_count() or 1})
+    cases = []
+    for api in args.apis:
+        for cipher in ciphers:
+            for count in workers:
+                for size in args.sizes:
+                    cases.append({
+                        "name": f"{api}/single/{format_size(size)}/{cipher}/w{count}",
+                        "kind": "single", "api": api, "cipher": cipher, "workers": count,
+                        "size": size, "repeat": args.repeat,
+                    })
+                if args.small_files:
+                    cases.append({
+                        "name": f"{api}/small/{args.small_files}/{cipher}/w{count}",
+                        "kind": "small", "api": api, "cipher": cipher, "workers": count,
+                        "count": args.small_files, "repeat": args.repeat,
+                    })
+    return cases
+
+def run_isolated(case, workdir, key_path):
+    cmd = [sys.executable, os.path.abspath(__file__), "--run-case", json.dumps(case),
+           "--workdir", workdir, "--key", key_path]
+    proc = subprocess.run(cmd, capture_output=True, text=True)
+    if proc.returncode != 0:
+        return dict(case, error=proc.stderr.strip().splitlines()[-1:])
+    # The report is the last line; anything else the case printed is noise
+    lines = proc.stdout.strip().splitlines()
+    try:
+        return json.loads(lines[-1])
+    except (IndexError, ValueError):
+        return dict(case, error=["No JSON report from the case"] + lines[-3:] + proc.stderr.strip().splitlines()[-1:])
+
+
+# ---------------- Baseline ----------------
+def compare(results, baseline, tolerance):
+    """
+    Returns a list of human readable regressions against a baseline report
+    """
+    previous = {case["name"]: case for case in baseline.get("cases", [])}
+    regressions = []
+    for case in results:
+        old = previous.get(case["name"])
+        if not old or "error" in case or "error" in old:
+            continue
+        for op in ("encrypt", "decrypt"):
+            new_speed, old_speed = case[op]["mb_s"], old[op]["mb_s"]
+            if old_speed and new_speed < old_speed * (1 - tolerance):
+                regressions.append(f"{case['name']} {op}: {new_speed} MB/s (baseline {old_speed} MB/s)")
+        if case["peak_rss_mb"] > old["peak_rss_mb"] * (1 + tolerance):
+            regressions.append(f"{case['name']} peak RSS: {case['peak_rss_mb']} MB "
+                               f"(baseline {old['peak_rss_mb']} MB)")
+    return regressions
+
+
+# ---------------- CLI ----------------
+def main():
+    parser = argparse.ArgumentParser(description="Cryptora benchmark suite")
+    parser.add_argument("--sizes", default="1K,1M,64M",
+                        help="Comma separated single file sizes, e.g. 1K,1M,4G (default: 1K,1M,64M)")
+    parser.add_argument("--small-files", type=int, default=1000,
+                        help="Number of small quotes*.json files in the many-files case (0 to skip)")
+    parser.add_argument("--ciphers", nargs="+", help="Cipher suites to run (default: all)")
+    parser.add_argument("--workers", nargs="+", type=int, help="Worker counts to run (default: 1 and CPU count)")
+    parser.add_argument("--apis", nargs="+", choices=["library", "cli"], default=["library", "cli"])
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per case, the fastest one is reported (default: 3)")
+    parser.add_argument("--output", help="Write the JSON report to this file instead of stdout")
+    parser.add_argument("--baseline", help="Compare against a saved JSON report")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="Allowed regression ratio (default: 0.10)")
+    parser.add_argument("--workdir", help=argparse.SUPPRESS)
+    parser.add_argument("--key", help=argparse.SUPPRESS)
+    parser.add_argument("--run-case", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_case:
+        print(json.dumps(run_case(json.loads(args.run_case), args.workdir, args.key)))
+        return 0
+
+    args.sizes = [parse_size(s) for s in args.sizes.split(",") if s]
+    from cryptography.fernet import Fernet
+
+    workdir = tempfile.mkdtemp(prefix="cryptora_bench_")
+    try:
+        key_path = os.path.join(workdir, "bench.key")
+        with open(key_path, "wb") as f:
+            f.write(Fernet.generate_key())
+        results = []
+        for case in build_cases(args):
+            result = run_isolated(case, workdir, key_path)
+            results.append(result)
+            if "error" in result:
+                print(f"{case['name']:<48} ERROR {result['error']}", file=sys.stderr)
+            else:
+                print(f"{case['name']:<48} enc {result['encrypt']['mb_s']:>9} MB/s  "
+                      f"dec {result['decrypt']['mb_s']:>9} MB/s  "
+                      f"rss {result['peak_rss_mb']:>7} MB", file=sys.stderr)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "cases": results,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        if regressions:
+            return 1
+        print("No regressions against baseline.", file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
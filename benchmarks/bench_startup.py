@@ -0,0 +1,150 @@
+"""
+Cryptora CLI startup benchmark.
+
+Measures cold start wall time of short CLI invocations (--help, listkeys,
+and a bare `import cryptora.cli`) in fresh interpreters, and lists the
+heavy modules each one ends up importing. The keys folder is pointed at an
+empty temporary copy of the package so no real keys are touched.
+
+    python benchmarks/bench_startup.py --runs 20 --output startup.json
+    python benchmarks/bench_startup.py --baseline startup.json --tolerance 0.2
+
+With --baseline the run exits non-zero when any case's median start time
+is slower than the baseline by more than the tolerance.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import statistics
+import tempfile
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SRC = os.path.join(ROOT, "src")
+
+CASES = {
+    "import": ["-c", "import cryptora.cli"],
+    "help": ["-m", "cryptora.cli", "--help"],
+    "listkeys": ["-m", "cryptora.cli", "listkeys"],
+}
+
+# Modules that should only load when an action actually needs them
+HEAVY_MODULES = ["cryptography", "cryptora.encryption", "cryptora.batch", "concurrent.futures.process", "PyQt5"]
+
+PROBE = """
+import runpy, sys
+sys.argv = {argv!r}
+try:
+    runpy.run_module("cryptora.cli", run_name="__main__") if {is_main} else __import__("cryptora.cli")
+except SystemExit:
+    pass
+print("\\n" + " ".join(m for m in {heavy!r} if m in sys.modules), file=sys.stderr)
+"""
+
+
+# ---------------- Helpers ----------------
+def copy_package(workdir):
+    """
+    Copies src/cryptora without its keys and logs, so listkeys sees an empty keys folder
+    """
+    target = os.path.join(workdir, "src")
+    shutil.copytree(SRC, target, ignore=shutil.ignore_patterns("keys", "cryplog", "__pycache__", "*.log"))
+    return target
+
+def time_run(args, src):
+    env = dict(os.environ, PYTHONPATH=src)
+    start = time.perf_counter()
+    subprocess.run([sys.executable, *args], env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                   check=True)
+    return time.perf_counter() - start
+
+def heavy_imports(name, src):
+    args = CASES[name]
+    is_main = args[0] == "-m"
+    argv = ["cryptora"] + args[2:] if is_main else ["cryptora"]
+    probe = PROBE.format(argv=argv, is_main=is_main, heavy=HEAVY_MODULES)
+    env = dict(os.environ, PYTHONPATH=src)
+    proc = subprocess.run([sys.executable, "-c", probe], env=env, capture_output=True, text=True)
+    return proc.stderr.strip().splitlines()[-1].split() if proc.stderr.strip() else []
+
+def run_case(name, src, runs):
+    time_run(CASES[name], src)  # warm the OS file cache and write .pyc files
+    times = [time_run(CASES[name], src) * 1000 for _ in range(runs)]
+    return {
+        "name": name,
+        "runs": runs,
+        "ms": {
+            "min": round(min(times), 2),
+            "median": round(statistics.median(times), 2),
+            "max": round(max(times), 2),
+        },
+        "heavy_imports": heavy_imports(name, src),
+    }
+
+
+# ---------------- Baseline ----------------
+def compare(results, baseline, tolerance):
+    previous = {case["name"]: case for case in baseline.get("cases", [])}
+    regressions = []
+    for case in results:
+        old = previous.get(case["name"])
+        if not old:
+            continue
+        new_ms, old_ms = case["ms"]["median"], old["ms"]["median"]
+        if new_ms > old_ms * (1 + tolerance):
+            regressions.append(f"{case['name']}: {new_ms} ms (baseline {old_ms} ms)")
+    return regressions
+
+
+# ---------------- CLI ----------------
+def main():
+    parser = argparse.ArgumentParser(description="Cryptora CLI startup benchmark")
+    parser.add_argument("--runs", type=int, default=20, help="Timed runs per case (default: 20)")
+    parser.add_argument("--cases", nargs="+", choices=list(CASES), default=list(CASES))
+    parser.add_argument("--output", help="Write the JSON report to this file instead of stdout")
+    parser.add_argument("--baseline", help="Compare against a saved JSON report")
+    parser.add_argument("--tolerance", type=float, default=0.20, help="Allowed slowdown ratio (default: 0.20)")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="cryptora_startup_")
+    try:
+        src = copy_package(workdir)
+        baseline_ms = min(time_run(["-c", "pass"], src) for _ in range(args.runs)) * 1000
+        results = []
+        for name in args.cases:
+            result = run_case(name, src, args.runs)
+            results.append(result)
+            print(f"{name:<10} median {result['ms']['median']:>8} ms  min {result['ms']['min']:>8} ms  "
+                  f"heavy: {', '.join(result['heavy_imports']) or '-'}", file=sys.stderr)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "interpreter_ms": round(baseline_ms, 2),
+        "cases": results,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        if regressions:
+            return 1
+        print("No regressions against baseline.", file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,18 @@
+"""
+Cryptora: streaming file encryption.
+
+The library API is importable from the package root, loaded on first use:
+
+    from cryptora import Cryptor, open_encrypted
+"""
+
+_EXPORTS = {
+    "Cryptor": "cryptora.cryptor",
+    "open_encrypted": "cryptora.fileio",
+}
+
+def __getattr__(name):
+    if name in _EXPORTS:
+        import importlib
+        return getattr(importlib.import_module(_EXPORTS[name]), name)
+    raise AttributeError(f"module 'cryptora' has no attribute {name!r}")
@@ -0,0 +1,166 @@
+import os
+import json
+import struct
+
+from cryptora import encryption
+from cryptora.atomic import DEFAULT_BUFFER_SIZE, DEFAULT_DURABILITY, DirSyncer, atomic_output
+from cryptora.fileio import open_encrypted
+
+# ---------------- Archive Format ----------------
+# An archive is one encrypted container whose plaintext is:
+#
+#   members   the member files' bytes, back to back
+#   index     JSON list of members (name, offset, size, mtime, mode)
+#   trailer   index length | ARCHIVE_MAGIC
+#
+# The container's chunk index lets a reader seek, so listing the archive or
+# extracting one member decrypts only the chunks holding the trailer, the
+# index and that member.
+
+ARCHIVE_MAGIC = b"CRYARC01"
+ARCHIVE_VERSION = 1
+
+_TRAILER = struct.Struct(">Q8s")
+COPY_BUFFER = 1024 * 1024
+
+
+class ArchiveError(ValueError):
+    """
+    Raised for containers that are not archives and for bad member names
+    """
+
+
+# Characters that are legal in POSIX file names but would make a member
+# name a drive or a path on Windows
+_UNSAFE_CHARS = ":\\" if os.name == "nt" else ""
+
+def _check_name(name):
+    """
+    Splits a member name into its parts, refusing names that could escape
+    the folder they are extracted to. pack checks with the same rule, so
+    anything it stores can be extracted again.
+    """
+    parts = name.split("/")
+    if (not name or name.startswith("/") or any(part in ("", ".", "..") for part in parts)
+            or any(c in name for c in _UNSAFE_CHARS)):
+        raise ArchiveError(f"Unsafe member name: {name!r}")
+    return parts
+
+def _member_name(root, path):
+    name = os.path.relpath(path, root).replace(os.sep, "/")
+    _check_name(name)
+    return name
+
+def _safe_target(dest_dir, name):
+    """
+    Maps a member name into dest_dir, refusing names that would escape it
+    """
+    return os.path.join(dest_dir, *_check_name(name))
+
+# ---------------- Pack ----------------
+def pack(src_dir, archive_path, key, progress=None, buffer_size=DEFAULT_BUFFER_SIZE,
+         durability=DEFAULT_DURABILITY, **options):
+    """
+    Streams every file under src_dir into one encrypted archive.
+    progress(name) is called before each member. buffer_size and durability
+    are the archive file's output settings (see cryptora.atomic). Options
+    (cipher, compression, envelope, ...) are passed to the container writer.
+    Returns the number of members.
+    """
+    archive_path = os.path.abspath(archive_path)
+    members = []
+    offset = 0
+    # Written to a temp file and renamed on success: an archive already at
+    # archive_path survives a failed run
+    with atomic_output(archive_path, buffer_size, durability) as f, \
+            open_encrypted(f, key, "wb", buffering=COPY_BUFFER, **options) as out:
+        written = os.fstat(f.fileno())
+        for root, dirs, files in os.walk(src_dir):
+            dirs.sort()
+            for name in sorted(files):
+                path = os.path.join(root, name)
+                # Neither the archive nor its temp file, when they sit in src_dir
+                if os.path.abspath(path) == archive_path or os.path.samestat(os.stat(path), written):
+                    continue
+                member_name = _member_name(src_dir, path)
+                if progress:
+                    progress(member_name)
+                with open(path, "rb") as src:
+                    stat = os.fstat(src.fileno())
+                    size = 0
+                    while True:
+                        block = src.read(COPY_BUFFER)
+                        if not block:
+                            break
+                        out.write(block)
+                        size += len(block)
+                members.append({"name": member_name, "offset": offset, "size": size,
+                                "mtime": stat.st_mtime, "mode": stat.st_mode & 0o777})
+                offset += size
+        index = json.dumps({"version": ARCHIVE_VERSION, "members": members}, separators=(",", ":")).encode()
+        out.write(index)
+        out.write(_TRAILER.pack(len(index), ARCHIVE_MAGIC))
+    return len(members)
+
+# ---------------- Read ----------------
+def _read_index(reader):
+    end = reader.seek(0, os.SEEK_END)
+    if end < _TRAILER.size:
+        raise ArchiveError("Not a Cryptora archive")
+    reader.seek(end - _TRAILER.size)
+    length, magic = _TRAILER.unpack(reader.read(_TRAILER.size))
+    if magic != ARCHIVE_MAGIC or length > end - _TRAILER.size:
+        raise ArchiveError("Not a Cryptora archive")
+    reader.seek(end - _TRAILER.size - length)
+    index = json.loads(reader.read(length))
+    if index.get("version") != ARCHIVE_VERSION:
+        raise ArchiveError(f"Unsupported archive version: {index.get('version')}")
+    return index["members"]
+
+def list_members(archive_path, key):
+    """
+    Returns the member list of an archive, decrypting only its end
+    """
+    with open_encrypted(archive_path, key) as reader:
+        return _read_index(reader)
+
+def unpack(archive_path, key, dest_dir, names=None, progress=None, buffer_size=DEFAULT_BUFFER_SIZE,
+           durability=DEFAULT_DURABILITY):
+    """
+    Extracts members of an archive into dest_dir: all of them, or only
+    those in names, in which case only the chunks holding them are
+    decrypted. progress(name) is called before each member. buffer_size
+    and durability are the members' output settings; with "dir" each
+    folder is fsynced once, at the end. Returns the extracted member names.
+    """
+    syncer = DirSyncer()
+    with open_encrypted(archive_path, key, buffering=COPY_BUFFER) as reader:
+        members = _read_index(reader)
+        if names is not None:
+            wanted = set(names)
+            missing = wanted - {member["name"] for member in members}
+            if missing:
+                raise ArchiveError(f"Not in archive: {', '.join(sorted(missing))}")
+            members = [member for member in members if member["name"] in wanted]
+
+        extracted = []
+        for member in sorted(members, key=lambda member: member["offset"]):
+            target = _safe_target(dest_dir, member["name"])
+            if progress:
+                progress(member["name"])
+            os.makedirs(os.path.dirname(target) or ".", exist_ok=True)
+            reader.seek(member["offset"])
+            # A member is renamed into place once complete: no partial files
+            with atomic_output(target, buffer_size, durability, syncer) as out:
+                remaining = member["size"]
+                while remaining:
+                    block = reader.read(min(COPY_BUFFER, remaining))
+                    if not block:
+                        raise encryption.CorruptedFileError(f"Archive ends inside {member['name']}")
+                    out.write(block)
+                    remaining -= len(block)
+            os.chmod(target, member["mode"])
+            os.utime(target, (member["mtime"], member["mtime"]))
+            extracted.append(member["name"])
+    syncer.sync()
+    return extracted
@@ -0,0 +1,107 @@
+import os
+import stat
+import threading
+from contextlib import contextmanager
+
+# ---------------- Atomic Output ----------------
+# Outputs are streamed into a temp file in the destination folder and
+# renamed over the final path only once complete, so a crash or error
+# leaves either the old file or the new one, never a truncated mix.
+#
+# Durability decides what is flushed to disk before that point:
+#
+#   none   nothing: the rename is atomic, but after a power cut the new
+#          file may come back empty or be missing
+#   file   fsync the file before the rename: its contents are on disk
+#   dir    also fsync the folder after the rename: the new name is on disk
+#          too. A DirSyncer collects folders so a batch syncs each once.
+
+DURABILITY = ("none", "file", "dir")
+DEFAULT_DURABILITY = "none"
+DEFAULT_BUFFER_SIZE = 1024 * 1024
+
+TEMP_SUFFIX = ".tmp"
+
+def temp_path(path):
+    """
+    Hidden, unique temp name next to path, in the same folder (and so on the
+    same filesystem, which os.replace needs to be atomic)
+    """
+    directory, name = os.path.split(path)
+    return os.path.join(directory, f".{name}.{os.urandom(4).hex()}{TEMP_SUFFIX}")
+
+def fsync_dir(directory):
+    """
+    Flushes a folder's entries (new and renamed names) to disk. Windows
+    cannot open folders, and NTFS journals renames itself.
+    """
+    if os.name == "nt":
+        return
+    fd = os.open(directory or ".", os.O_RDONLY | getattr(os, "O_DIRECTORY", 0))
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class DirSyncer:
+    """
+    Collects the folders of outputs written with durability "dir" and
+    fsyncs each one once in sync(), instead of once per file. Files become
+    durable at that point. Safe to share across threads.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._dirs = set()
+
+    def add(self, directory):
+        with self._lock:
+            self._dirs.add(directory)
+
+    def sync(self):
+        with self._lock:
+            dirs, self._dirs = self._dirs, set()
+        for directory in sorted(dirs):
+            fsync_dir(directory)
+        return len(dirs)
+
+
+@contextmanager
+def atomic_output(path, buffer_size=DEFAULT_BUFFER_SIZE, durability=DEFAULT_DURABILITY, dir_syncer=None):
+    """
+    Yields a binary stream that becomes path once the block completes.
+    buffer_size sets the write buffer. On error the temp file is removed and
+    an existing file at path is left untouched, and replacing one keeps its
+    permissions. With durability "dir" the folder is fsynced here, or by
+    dir_syncer when one is given.
+    """
+    if durability not in DURABILITY:
+        raise ValueError(f"Unknown durability: {durability}")
+    path = os.path.abspath(path)
+    tmp = temp_path(path)
+    # Created like open() would, so the umask applies as before
+    stream = open(os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, "O_BINARY", 0), 0o666),
+                  "wb", buffering=buffer_size)
+    try:
+        with stream:
+            try:
+                mode = stat.S_IMODE(os.stat(path).st_mode)
+            except FileNotFoundError:
+                pass
+            else:
+                # Before any data is written: a 0600 file is never readable as 0644
+                os.chmod(tmp, mode)
+            yield stream
+            stream.flush()
+            if durability != "none":
+                os.fsync(stream.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    if durability == "dir":
+        if dir_syncer is not None:
+            dir_syncer.add(os.path.dirname(path))
+        else:
+            fsync_dir(os.path.dirname(path))
@@ -0,0 +1,149 @@
+import os
+import glob
+import time
+from collections import Counter, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from cryptography.fernet import InvalidToken
+from cryptora import encryption
+from cryptora.atomic import DEFAULT_BUFFER_SIZE, DEFAULT_DURABILITY, DirSyncer
+from cryptora.constants import ENC_MARKER
+
+BatchResult = namedtuple("BatchResult", ["path", "status", "detail"])
+
+PAST_TENSE = {"encrypt": "Encrypted", "decrypt": "Decrypted", "rotate": "Rotated"}
+
+# ---------------- Naming ----------------
+def encrypted_path(file_path, key_path):
+    key_name = os.path.splitext(os.path.basename(key_path))[0]
+    return file_path + f"{ENC_MARKER}{key_name}"
+
+def decrypted_path(file_path):
+    if ENC_MARKER in file_path:
+        return file_path.split(ENC_MARKER)[0]
+    return file_path + ".dec"
+
+def is_encrypted_file(file_path):
+    """
+    True if the name has an `.enc_` suffix or the content has a Cryptora header
+    """
+    if ENC_MARKER in os.path.basename(file_path):
+        return True
+    try:
+        with open(file_path, "rb") as f:
+            return encryption.is_encrypted(f)
+    except OSError:
+        return False
+
+# ---------------- File Collection ----------------
+def _is_glob(path):
+    return any(c in path for c in "*?[")
+
+def collect_files(paths, action, recursive=True):
+    """
+    Expands files, directories and glob patterns into a list of files.
+    Files found by walking a directory are filtered by action: encrypt
+    skips already encrypted files, other actions keep only encrypted ones.
+    """
+    found = []
+    for path in paths:
+        matches = sorted(glob.glob(path, recursive=True)) if _is_glob(path) else [path]
+        for match in matches:
+            if not os.path.isdir(match):
+                found.append(match)
+                continue
+            for root, dirs, files in os.walk(match):
+                dirs.sort()
+                for name in sorted(files):
+                    path = os.path.join(root, name)
+                    if is_encrypted_file(path) != (action == "encrypt"):
+                        found.append(path)
+                if not recursive:
+                    break
+    return list(dict.fromkeys(found))
+
+# ---------------- Batch Processing ----------------
+def rotate_file(file_path, old_key, old_key_path, new_key, new_key_path):
+    """
+    Re-wraps an envelope file for a new key and renames its `.enc_<key>`
+    suffix to match. Returns the file's (possibly new) path.
+    """
+    encryption.rewrap_file(file_path, old_key, new_key)
+    old_suffix = encrypted_path("", old_key_path)
+    if file_path.endswith(old_suffix):
+        renamed = encrypted_path(file_path[:-len(old_suffix)], new_key_path)
+        if not os.path.exists(renamed):
+            os.replace(file_path, renamed)
+            return renamed
+    return file_path
+
+def process_file(action, file_path, key, key_path, registry=None, stats=None, output=None, **options):
+    """
+    Encrypts, decrypts or rotates one file, returns a BatchResult instead of
+    raising. When decrypting without a key, and for the old key when rotating,
+    the key is looked up in the registry. Options (cipher, envelope,
+    compression, ...) are passed on to encryption.encrypt_file; stage timings
+    are added to stats. output holds the output settings (buffer_size,
+    durability, dir_syncer) for encrypt_file and decrypt_file.
+    """
+    output = output or {}
+    if not os.path.isfile(file_path):
+        return BatchResult(file_path, "failed", "File not found")
+    if action == "encrypt" and ENC_MARKER in file_path:
+        return BatchResult(file_path, "skipped", "Already encrypted")
+    if action != "encrypt" and not is_encrypted_file(file_path):
+        return BatchResult(file_path, "skipped", "Not an encrypted file")
+    try:
+        if action == "encrypt":
+            written = encryption.encrypt_file(file_path, key, encrypted_path(file_path, key_path), stats=stats,
+                                              **output, **options)
+        elif action == "rotate":
+            old_key_path = registry.find_key_path(file_path) if registry else None
+            if not old_key_path:
+                return BatchResult(file_path, "failed", "No key found for this file")
+            old_key = registry.load(old_key_path)
+            if encryption.key_id(old_key) == encryption.key_id(key):
+                return BatchResult(file_path, "skipped", "Already uses this key")
+            written = rotate_file(file_path, old_key, old_key_path, key, key_path)
+        else:
+            if key is None:
+                key_path = registry.find_key_path(file_path) if registry else None
+                if not key_path:
+                    return BatchResult(file_path, "failed", "No key found for this file")
+                key = registry.load(key_path)
+            written = encryption.decrypt_file(file_path, key, decrypted_path(file_path), stats=stats, **output)
+        return BatchResult(file_path, "ok", written)
+    except encryption.CorruptedFileError as e:
+        return BatchResult(file_path, "failed", str(e))
+    except encryption.WrongKeyError as e:
+        return BatchResult(file_path, "failed", str(e))
+    except InvalidToken:
+        return BatchResult(file_path, "failed", "Incorrect key for this file")
+    except Exception as e:
+        return BatchResult(file_path, "failed", str(e))
+
+def run_batch(action, files, key, key_path, workers=None, registry=None, stats=None,
+              buffer_size=DEFAULT_BUFFER_SIZE, durability=DEFAULT_DURABILITY, **options):
+    """
+    Processes files on a thread pool sharing one loaded key (or, to decrypt
+    without a key, keys looked up once each from the registry).
+    With durability "dir" each output folder is fsynced once, after the
+    last file, rather than once per file.
+    Prints one line per file and returns a Counter of statuses.
+    """
+    start = time.perf_counter()
+    counts = Counter()
+    syncer = DirSyncer()
+    output = dict(buffer_size=buffer_size, durability=durability, dir_syncer=syncer)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        jobs = [pool.submit(process_file, action, path, key, key_path, registry, stats, output, **options)
+                for path in files]
+        for job in jobs:
+            result = job.result()
+            counts[result.status] += 1
+            print(f"[{result.status}] {result.path} -> {result.detail}")
+    syncer.sync()
+    elapsed = time.perf_counter() - start
+    print(f"{PAST_TENSE[action]} {counts['ok']} file(s), {counts['skipped']} skipped, "
+          f"{counts['failed']} failed in {elapsed:.2f}s")
+    return counts
@@ -1,8 +1,18 @@
 import os
 import sys
+import time
+import base64
 import datetime
 import argparse
-from cryptography.fernet import Fernet, InvalidToken
+from contextlib import ExitStack, contextmanager
+from cryptora import client, compress, keystore, stats as metrics
+from cryptora.atomic import DEFAULT_BUFFER_SIZE, DEFAULT_DURABILITY, DURABILITY, atomic_output
+from cryptora.constants import CIPHERS, DEFAULT_CHUNK_SIZE, DEFAULT_CIPHER, ENC_MARKER
+from cryptora.parallel import default_workers
+
+# The crypto stack (cryptography, cryptora.encryption, cryptora.batch) is
+# imported inside the functions that need it, so --help, listkeys and
+# genkey start fast. Nothing touches the filesystem at import time.
 
 # ---------------- Paths ----------------
 if getattr(sys, 'frozen', False):  # running as exe
@@ -11,15 +21,19 @@ else:  # running as script
     BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
 KEYS_DIR = os.path.join(BASE_DIR, "keys")
-if not os.path.exists(KEYS_DIR):
-    os.makedirs(KEYS_DIR)
+
+# Read and write pipes in large blocks, one chunk at a time
+PIPE_BUFFER = DEFAULT_CHUNK_SIZE
+ARCHIVE_SUFFIX = ".pack"
 
 # ---------------- Encryption / Decryption Logic ----------------
 def generate_key():
     timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
     key_name = f"cryptora_{timestamp}.key"
+    os.makedirs(KEYS_DIR, exist_ok=True)
     key_path = os.path.join(KEYS_DIR, key_name)
-    key = Fernet.generate_key()
+    # Same format as Fernet.generate_key(), without loading cryptography
+    key = base64.urlsafe_b64encode(os.urandom(32))
     with open(key_path, "wb") as f:
         f.write(key)
     print(f"Key generated: {key_path}")
@@ -29,48 +43,58 @@ def load_key(path):
     if not os.path.exists(path):
         print(f"Key file not found: {path}")
         return None
-    with open(path, "rb") as f:
-        return f.read()
+    from cryptora import encryption
+    return encryption.load_key(path)
+
+def key_registry():
+    return keystore.get_registry(KEYS_DIR)
 
 def list_keys():
-    keys = [f for f in os.listdir(KEYS_DIR) if f.endswith(".key")]
-    if not keys:
+    entries = key_registry().entries()
+    if not entries:
         print("No keys found.")
         return None
-    keys_sorted = sorted(keys)
     print("All keys:")
-    for k in keys_sorted:
-        print(f" - {k}")
-    latest_key = keys_sorted[-1]
-    print(f"Latest key: {latest_key}")
-    return os.path.join(KEYS_DIR, latest_key)
+    for name, entry in entries:
+        print(f" - {name}  (id {entry['id']}, {entry['status']})")
+    latest_key = key_registry().latest_path()
+    if latest_key:
+        print(f"Latest key: {os.path.basename(latest_key)}")
+    return latest_key
 
 def get_latest_key():
-    keys = [f for f in os.listdir(KEYS_DIR) if f.endswith(".key")]
-    if not keys:
-        return None
-    latest_key = sorted(keys)[-1]
-    return os.path.join(KEYS_DIR, latest_key)
+    return key_registry().latest_path()
+
+def retire_keys(old_key_paths, key):
+    """
+    Marks the keys a rotate moved files away from as retired, except the
+    key the files now use
+    """
+    registry = key_registry()
+    for path in sorted(set(old_key_paths) - {None}):
+        if registry.load(path) != key:
+            registry.set_status(os.path.basename(path), "retired")
+            print(f"Retired key: {os.path.basename(path)}")
 
 def select_key_interactively():
-    keys = [f for f in os.listdir(KEYS_DIR) if f.endswith(".key")]
-    if not keys:
+    keys_sorted = key_registry().names()
+    if not keys_sorted:
         print("No keys found. Generate one first.")
         return None
-    keys_sorted = sorted(keys)
     print("Select a key from the list below:")
     for idx, k in enumerate(keys_sorted, 1):
         print(f"{idx}. {k}")
     while True:
         choice = input(f"Enter number (1-{len(keys_sorted)}) or press Enter for latest: ").strip()
         if choice == "":
-            return os.path.join(KEYS_DIR, keys_sorted[-1])
+            return get_latest_key()
         if choice.isdigit() and 1 <= int(choice) <= len(keys_sorted):
             return os.path.join(KEYS_DIR, keys_sorted[int(choice)-1])
         print("Invalid choice, try again.")
 
 # ---------------- File Encryption ----------------
-def encrypt_file(file_path, key_path):
+def encrypt_file(file_path, key_path, workers=1, cipher=DEFAULT_CIPHER, **options):
+    from cryptora import batch, encryption
     if not os.path.exists(file_path):
         print("File not found.")
         return
@@ -83,16 +107,8 @@ def encrypt_file(file_path, key_path):
 
     try:
         key = load_key(key_path)
-        fernet = Fernet(key)
-        with open(file_path, "rb") as f:
-            data = f.read()
-        encrypted = fernet.encrypt(data)
-
-        key_name = os.path.splitext(os.path.basename(key_path))[0]
-        output_file = file_path + f".enc_{key_name}"
-
-        with open(output_file, "wb") as f:
-            f.write(encrypted)
+        output_file = batch.encrypted_path(file_path, key_path)
+        encryption.encrypt_file(file_path, key, output_file, workers=workers, cipher=cipher, **options)
 
         print(f"File encrypted: {output_file}")
         print(f"Used key: {key_path}")
@@ -100,41 +116,401 @@ def encrypt_file(file_path, key_path):
         print(f"Encryption error: {str(e)}")
 
 # ---------------- File Decryption ----------------
-def decrypt_file(file_path, key_path):
+def decrypt_file(file_path, key_path=None, workers=1, stats=None, **output):
+    from cryptora import batch, encryption
     if not os.path.exists(file_path):
         print("File not found.")
         return
+    if not batch.is_encrypted_file(file_path):
+        print("This file does not appear to be encrypted.")
+        return
+    if key_path is None:
+        # Find the key from the id in the file header, even if the file was renamed
+        key_path = key_registry().find_key_path(file_path) or get_latest_key()
+        if not key_path:
+            print("No key found. Generate a key first using 'genkey'.")
+            return
     if not os.path.exists(key_path):
         print("Key not found.")
         return
-    if ".enc_" not in file_path:
-        print("This file does not appear to be encrypted.")
-        return
 
     try:
         key = load_key(key_path)
-        fernet = Fernet(key)
-        with open(file_path, "rb") as f:
-            decrypted = fernet.decrypt(f.read())
-
-        output_file = file_path.split(".enc_")[0]
-        with open(output_file, "wb") as f:
-            f.write(decrypted)
+        output_file = batch.decrypted_path(file_path)
+        encryption.decrypt_file(file_path, key, output_file, workers=workers, stats=stats, **output)
 
         print(f"File decrypted: {output_file}")
         print(f"Used key: {key_path}")
-    except InvalidToken:
+    except encryption.CorruptedFileError as e:
+        print(f"Decryption failed: {e}")
+    except encryption.InvalidToken:
         print("Decryption failed: Incorrect key for this file.")
     except Exception as e:
         print(f"Decryption error: {str(e)}")
 
+def parse_range(text):
+    """
+    Parses START:END into (start, end); either side may be empty
+    """
+    start, sep, end = text.partition(":")
+    if not sep:
+        raise argparse.ArgumentTypeError("Range must look like START:END")
+    try:
+        start, end = int(start or 0), (int(end) if end else None)
+    except ValueError:
+        raise argparse.ArgumentTypeError("Range bounds must be byte offsets")
+    if start < 0 or (end is not None and end < start):
+        raise argparse.ArgumentTypeError("Range must satisfy 0 <= START <= END")
+    return start, end
+
+def positive_int(text):
+    try:
+        value = int(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Expected a positive whole number, got {text!r}")
+    if value < 1:
+        raise argparse.ArgumentTypeError(f"Expected a positive whole number, got {value}")
+    return value
+
+def parse_workers(text):
+    """
+    Parses a worker count: a positive number, or auto for one per CPU core
+    """
+    return default_workers() if text == "auto" else positive_int(text)
+
+def decrypt_range(file_path, key_path, start, end):
+    """
+    Writes plaintext bytes [start, end) of an encrypted file to stdout;
+    messages go to stderr so they never mix with the data
+    """
+    from cryptora import encryption
+    if not os.path.isfile(file_path):
+        print("File not found.", file=sys.stderr)
+        return
+    if key_path is None:
+        key_path = key_registry().find_key_path(file_path) or get_latest_key()
+    if not key_path or not os.path.exists(key_path):
+        print("Key not found.", file=sys.stderr)
+        return
+
+    try:
+        key = load_key(key_path)
+        with open(file_path, "rb") as src:
+            encryption.decrypt_range(src, sys.stdout.buffer, key, start, end)
+        sys.stdout.buffer.flush()
+    except encryption.CorruptedFileError as e:
+        print(f"Decryption failed: {e}", file=sys.stderr)
+    except encryption.InvalidToken:
+        print("Decryption failed: Incorrect key for this file.", file=sys.stderr)
+    except Exception as e:
+        print(f"Decryption error: {str(e)}", file=sys.stderr)
+
+# ---------------- Archives ----------------
+def pack_folder(folder, key_path, output=None, cipher=DEFAULT_CIPHER, buffer_size=DEFAULT_BUFFER_SIZE,
+                durability=DEFAULT_DURABILITY, **options):
+    from cryptora import archive, batch
+    if not os.path.isdir(folder):
+        print("Folder not found.")
+        return
+    output = output or batch.encrypted_path(folder.rstrip("/\\") + ARCHIVE_SUFFIX, key_path)
+    try:
+        key = load_key(key_path)
+        count = archive.pack(folder, output, key, progress=lambda name: print(f"Packing: {name}"),
+                             buffer_size=buffer_size, durability=durability, cipher=cipher, **options)
+        print(f"Folder packed: {output} ({count} files)")
+        print(f"Used key: {key_path}")
+    except Exception as e:
+        print(f"Packing error: {str(e)}")
+
+def unpack_archive(file_path, key_path=None, dest_dir=None, members=None, list_only=False, **output):
+    from cryptora import archive, batch, encryption
+    if not os.path.isfile(file_path):
+        print("File not found.")
+        return
+    if key_path is None:
+        key_path = key_registry().find_key_path(file_path) or get_latest_key()
+        if not key_path:
+            print("No key found. Generate a key first using 'genkey'.")
+            return
+    if not os.path.exists(key_path):
+        print("Key not found.")
+        return
+
+    try:
+        key = load_key(key_path)
+        if list_only:
+            for member in archive.list_members(file_path, key):
+                modified = datetime.datetime.fromtimestamp(member["mtime"]).strftime("%Y-%m-%d %H:%M:%S")
+                print(f"{member['size']:>12}  {modified}  {member['name']}")
+            return
+        if dest_dir is None:
+            dest_dir = batch.decrypted_path(file_path)
+            if dest_dir.endswith(ARCHIVE_SUFFIX):
+                dest_dir = dest_dir[:-len(ARCHIVE_SUFFIX)]
+        names = archive.unpack(file_path, key, dest_dir, members, progress=lambda name: print(f"Extracting: {name}"),
+                               **output)
+        print(f"Archive unpacked: {dest_dir} ({len(names)} files)")
+        print(f"Used key: {key_path}")
+    except archive.ArchiveError as e:
+        print(f"Unpacking failed: {e}")
+    except encryption.CorruptedFileError as e:
+        print(f"Unpacking failed: {e}")
+    except encryption.InvalidToken:
+        print("Unpacking failed: Incorrect key for this archive.")
+    except Exception as e:
+        print(f"Unpacking error: {str(e)}")
+
+# ---------------- Verification ----------------
+def verify_files(paths, key_path=None, workers=1, stats=None, report=None):
+    """
+    Authenticates files without writing plaintext. Prints one line per file
+    and a total, or with report the JSON summary (to stdout for "-").
+    Returns True when every file is intact.
+    """
+    import json
+    from cryptora import batch, verify
+    files = batch.collect_files(paths, "verify")
+    if not files:
+        print("No files matched.")
+        return False
+    key = None
+    if key_path:
+        key = load_key(key_path)
+        if key is None:
+            return False
+
+    def show(result):
+        print(f"[{result.status}] {result.path} -> {result.detail}", flush=True)
+
+    start = time.perf_counter()
+    results = verify.verify_files(files, key, key_registry(), workers, stats, None if report == "-" else show)
+    summary = verify.summary(results, time.perf_counter() - start)
+    if report:
+        text = json.dumps(summary, indent=2)
+        if report == "-":
+            print(text)
+        else:
+            with open(report, "w", encoding="utf-8") as f:
+                f.write(text + "\n")
+    if report != "-":
+        counts = summary["counts"]
+        found = ", ".join(f"{counts[status]} {status}" for status in verify.STATUSES if counts[status])
+        print(f"Verified {summary['files']} file(s): {found or 'none'} in {summary['seconds']:.2f}s")
+    return summary["counts"]["ok"] == summary["files"]
+
+# ---------------- Watch Folder ----------------
+def watch_folder(folder, key_path, dest_dir, workers, stats, args, **options):
+    """
+    Encrypts files as they are dropped into folder until Ctrl+C or SIGTERM
+    """
+    import signal
+    from cryptora import watch
+    key = load_key(key_path)
+    if key is None:
+        return
+    watcher = watch.Watcher(folder, key, key_path, dest_dir, workers, args.queue_size, args.poll, args.interval,
+                            args.remove_source, stats, **options)
+    signal.signal(signal.SIGTERM, lambda signum, frame: watcher.stop())
+    mode = f"polling every {args.interval}s" if watcher.poll else "inotify"
+    print(f"Watching {folder} ({mode}, {workers} workers, key {key_path}). Press Ctrl+C to stop.", flush=True)
+    try:
+        counts = watcher.run()
+    except KeyboardInterrupt:
+        counts = watcher.counts
+    print(f"Stopped. Encrypted {counts['ok']} file(s), {counts['skipped']} skipped, {counts['failed']} failed")
+
+# ---------------- Pipes ----------------
+def _open_input(path):
+    if path == "-":
+        return open(sys.stdin.fileno(), "rb", buffering=PIPE_BUFFER, closefd=False)
+    return open(path, "rb")
+
+@contextmanager
+def _open_output(path, buffer_size=DEFAULT_BUFFER_SIZE, durability=DEFAULT_DURABILITY):
+    """
+    Output stream for path, or stdout for "-". A file is written to a temp
+    file and renamed over path only on success, so a failed run leaves
+    whatever was there untouched.
+    """
+    if path != "-":
+        with atomic_output(path, buffer_size, durability) as f:
+            yield f
+        return
+    sys.stdout.flush()
+    f = open(sys.stdout.fileno(), "wb", buffering=PIPE_BUFFER, closefd=False)
+    try:
+        yield f
+    finally:
+        # closefd=False: closing only flushes
+        try:
+            f.close()
+        except OSError:
+            pass  # already reported, e.g. a broken pipe
+
+def stream_file(action, input_path, output_path, key_path, workers=1, cipher=DEFAULT_CIPHER, stats=None,
+                buffer_size=DEFAULT_BUFFER_SIZE, durability=DEFAULT_DURABILITY, **options):
+    """
+    Encrypts or decrypts input_path into output_path, where "-" means stdin
+    or stdout. Data streams through chunk by chunk, so memory use stays
+    constant however much is piped. buffer_size and durability apply to an
+    output file. Messages go to stderr when the output is stdout. Returns
+    True on success.
+    """
+    from cryptora import encryption
+    log = sys.stderr if output_path == "-" else sys.stdout
+    if input_path != "-" and not os.path.isfile(input_path):
+        print("File not found.", file=log)
+        return False
+
+    if options.get("compression") and input_path != "-" and not compress.worth_compressing(input_path):
+        options["compression"] = None
+
+    try:
+        with _open_input(input_path) as src:
+            if key_path is None:
+                # Find the key from the id in the header, then replay the header
+                if input_path == "-":
+                    src = encryption.ReplayReader(src)
+                    kid = encryption.read_key_id(src)
+                    src.rewind()
+                    key_path = (kid and key_registry().path_for_id(kid)) or get_latest_key()
+                else:
+                    key_path = key_registry().find_key_path(input_path) or get_latest_key()
+            if not key_path or not os.path.exists(key_path):
+                print("Key not found.", file=log)
+                return False
+            key = load_key(key_path)
+
+            with _open_output(output_path, buffer_size, durability) as dst, \
+                    metrics.recording(action, input_path, stats) as stats:
+                if action == "encrypt":
+                    encryption.encrypt_stream(src, dst, key, workers=workers, cipher=cipher, stats=stats, **options)
+                else:
+                    encryption.decrypt_stream(src, dst, key, workers, stats)
+                dst.flush()
+    except encryption.CorruptedFileError as e:
+        print(f"{action.capitalize()}ion failed: {e}", file=log)
+    except encryption.InvalidToken:
+        print(f"{action.capitalize()}ion failed: Incorrect key for this file.", file=log)
+    except Exception as e:
+        print(f"{action.capitalize()}ion error: {str(e)}", file=log)
+    else:
+        if output_path != "-":
+            print(f"File {action}ed: {output_path}", file=log)
+            print(f"Used key: {key_path}", file=log)
+        return True
+    return False
+
+# ---------------- Service ----------------
+def serve(socket_path, max_requests=None):
+    from cryptora import service
+    try:
+        service.serve(key_registry(), socket_path, max_requests or service.DEFAULT_MAX_REQUESTS)
+    except OSError as e:
+        print(f"Cannot serve: {e}")
+
+def remote_file(action, input_path, output_path, socket_path, key_path=None, cipher=DEFAULT_CIPHER,
+                buffer_size=DEFAULT_BUFFER_SIZE, durability=DEFAULT_DURABILITY, **options):
+    """
+    stream_file through a running `serve` process: no crypto is loaded here.
+    Without an output path the output is named as encrypt/decrypt name it.
+    The output is written here, with buffer_size and durability. Returns
+    True on success.
+    """
+    log = sys.stderr if output_path == "-" else sys.stdout
+    if input_path != "-" and not os.path.isfile(input_path):
+        print("File not found.", file=log)
+        return False
+
+    request = {"key": os.path.abspath(key_path) if key_path else None}
+    if action == "encrypt":
+        if options.get("compression") and input_path != "-" and not compress.worth_compressing(input_path):
+            options["compression"] = None
+        request.update(options, cipher=cipher)
+    elif ENC_MARKER in input_path:
+        request["key_name"] = input_path.rsplit(ENC_MARKER, 1)[1]
+
+    def open_output(reply):
+        nonlocal output_path
+        if not output_path:
+            if action == "encrypt":
+                output_path = input_path + ENC_MARKER + os.path.splitext(reply["key"])[0]
+            else:
+                output_path = input_path.split(ENC_MARKER)[0] if ENC_MARKER in input_path else input_path + ".dec"
+        return streams.enter_context(_open_output(output_path, buffer_size, durability))
+
+    try:
+        # The output is only renamed into place once the service reports success
+        with ExitStack() as streams:
+            reply = client.call(socket_path, action, streams.enter_context(_open_input(input_path)),
+                                open_output, **request)
+    except (client.ServiceError, OSError) as e:
+        print(str(e), file=log)
+        return False
+    if output_path != "-":
+        print(f"File {action}ed: {output_path}", file=log)
+        print(f"Used key: {reply['key']}", file=log)
+    return True
+
+def emit_stats(stats, destination):
+    """
+    Finishes stats and writes the JSON report to a file, or stderr for "-"
+    """
+    import json
+    report = json.dumps(stats.finish(), indent=2)
+    if destination == "-":
+        print(report, file=sys.stderr)
+    else:
+        with open(destination, "w", encoding="utf-8") as f:
+            f.write(report + "\n")
+
 # ---------------- CLI ----------------
 def main():
     parser = argparse.ArgumentParser(description="Cryptora - File Encryption/Decryption CLI")
-    parser.add_argument("action", choices=["encrypt", "decrypt", "genkey", "listkeys"], help="Action to perform")
-    parser.add_argument("-f", "--file", help="File path to encrypt/decrypt")
-    parser.add_argument("-k", "--key", help="Key file path (default: latest key)")
+    parser.add_argument("action", choices=["encrypt", "decrypt", "rotate", "pack", "unpack", "sync", "verify", "watch", "serve", "genkey", "listkeys"], help="Action to perform")
+    parser.add_argument("-f", "--file", nargs="+", help="File path(s) or glob pattern(s) to encrypt/decrypt, or - for stdin")
+    parser.add_argument("-d", "--dir", action="append", default=[], help="Folder to encrypt/decrypt recursively (repeatable)")
+    parser.add_argument("-o", "--output", help="Output file for a single file, or - for stdout")
+    parser.add_argument("-k", "--key", help="Key file path (default: latest key; decrypt finds the key from the file header)")
     parser.add_argument("--selectkey", action="store_true", help="Interactively select a key from available keys")
+    parser.add_argument("-w", "--workers", type=parse_workers,
+                        help="Parallel workers: chunk processes for one file, file threads for a batch "
+                             "(default 1), requests at once for serve (default 4); auto = one per CPU core")
+    parser.add_argument("--cipher", choices=CIPHERS, default=DEFAULT_CIPHER,
+                        help="Cipher suite for encryption (decryption reads it from the file header)")
+    parser.add_argument("--envelope", action="store_true",
+                        help="Encrypt with a per-file data key wrapped by the key, so 'rotate' can switch keys in place")
+    parser.add_argument("--compress", choices=compress.available_codecs(),
+                        help="Compress data before encrypting (skipped automatically for data that does not compress)")
+    parser.add_argument("--level", type=int, help="Compression level (default depends on the codec)")
+    parser.add_argument("--stats", nargs="?", const="-", metavar="FILE",
+                        help="Report bytes, seconds and MB/s per stage and peak RSS as JSON (to stderr, or FILE)")
+    parser.add_argument("--range", type=parse_range, metavar="START:END",
+                        help="Decrypt only plaintext bytes START..END of one file to stdout")
+    parser.add_argument("--member", action="append", metavar="NAME",
+                        help="Extract only this archive member (repeatable, unpack only)")
+    parser.add_argument("--list", action="store_true", help="List the members of an archive (unpack only)")
+    parser.add_argument("--delete", action="store_true",
+                        help="Remove outputs whose source file is gone (sync only)")
+    parser.add_argument("--report", nargs="?", const="-", metavar="FILE",
+                        help="Write the verify summary as JSON (to stdout, or FILE)")
+    parser.add_argument("--retire", action="store_true",
+                        help="Once every file is rotated, retire the keys they were rotated away from (rotate only)")
+    parser.add_argument("--remove-source", action="store_true",
+                        help="Delete each source file once it is encrypted (watch only)")
+    parser.add_argument("--poll", action="store_true", help="Poll for new files instead of using inotify (watch only)")
+    parser.add_argument("--interval", type=float, default=1.0,
+                        help="Seconds between polls, or between stop checks with inotify (watch only)")
+    parser.add_argument("--queue-size", type=int, default=1000,
+                        help="Files waiting for a worker before the watcher blocks (watch only)")
+    parser.add_argument("--socket", nargs="?", const=client.default_socket(), default=os.environ.get(client.SOCKET_ENV),
+                        help="serve: socket to listen on. encrypt/decrypt: send the work to the service there "
+                             f"(default when ${client.SOCKET_ENV} is set)")
+    parser.add_argument("--durability", choices=DURABILITY,
+                        help="What reaches the disk before an output counts as written: none (atomic rename only), "
+                             "file (fsync the file) or dir (also fsync its folder, once per folder in a batch)")
+    parser.add_argument("--buffer-size", type=positive_int,
+                        help="Write buffer for output files in bytes (default: 1 MiB)")
     args = parser.parse_args()
 
     if args.action == "genkey":
@@ -145,24 +521,143 @@ def main():
         list_keys()
         return
 
+    if args.action == "serve":
+        serve(args.socket or client.default_socket(), args.workers)
+        return
+
     if args.selectkey:
         key_path = select_key_interactively()
         if not key_path:
             return
+    elif args.key:
+        key_path = args.key
+    elif args.action in ("decrypt", "unpack", "verify"):
+        key_path = None  # resolved per file from its header
     else:
-        key_path = args.key if args.key else get_latest_key()
+        key_path = get_latest_key()
         if not key_path:
             print("No key found. Generate a key first using 'genkey'.")
             return
 
-    if not args.file:
-        print("Please provide a file path using -f")
+    paths = (args.file or []) + args.dir
+    if not paths:
+        print("Please provide a file path using -f or a folder using -d")
         return
 
-    if args.action == "encrypt":
-        encrypt_file(args.file, key_path)
-    elif args.action == "decrypt":
-        decrypt_file(args.file, key_path)
+    if args.retire and args.action != "rotate":
+        parser.error("--retire applies to rotate only")
+
+    output = dict(buffer_size=args.buffer_size or DEFAULT_BUFFER_SIZE, durability=args.durability or DEFAULT_DURABILITY)
+    to_stdout = args.output == "-" or (paths == ["-"] and not args.output)
+    if (args.durability or args.buffer_size is not None) and (args.action in ("rotate", "verify") or args.range
+                                                               or to_stdout):
+        print("--durability and --buffer-size apply to output files: not to rotate (which rewrites headers "
+              "in place), verify, --range or stdout", file=sys.stderr)
+        sys.exit(2)
+
+    if args.range:
+        if args.action != "decrypt" or len(paths) != 1 or args.dir or paths == ["-"]:
+            print("--range needs the decrypt action and a single file (not a pipe)", file=sys.stderr)
+            return
+        decrypt_range(paths[0], key_path, *args.range)
+        return
+
+    if args.action in ("pack", "unpack"):
+        if len(paths) != 1 or args.output == "-":
+            print("pack needs a single folder and unpack a single archive (not a pipe)")
+            return
+        if args.action == "pack":
+            pack_folder(paths[0], key_path, args.output, args.cipher, **output,
+                        envelope=args.envelope, compression=args.compress, level=args.level)
+        else:
+            unpack_archive(paths[0], key_path, args.output, args.member, args.list, **output)
+        return
+
+    workers = args.workers or 1
+    options = dict(envelope=args.envelope, compression=args.compress, level=args.level)
+    stats = metrics.Stats(args.action, paths[0] if len(paths) == 1 else None) if args.stats else None
+    if args.action == "sync":
+        if len(paths) != 1 or not os.path.isdir(paths[0]) or args.output == "-":
+            print("sync needs a single folder (-d) and optionally a destination folder (-o)")
+            return
+        from cryptora import sync
+        key = load_key(key_path)
+        if key is None:
+            return
+        sync.sync_folder(paths[0], key, key_path, args.output, args.delete, workers, stats,
+                         cipher=args.cipher, **output, **options)
+        if stats:
+            emit_stats(stats, args.stats)
+        return
+
+    if args.action == "watch":
+        if len(paths) != 1 or not os.path.isdir(paths[0]) or args.output == "-":
+            print("watch needs a single folder (-d) and optionally a destination folder (-o)")
+            return
+        watch_folder(paths[0], key_path, args.output, workers, stats, args, cipher=args.cipher, **output, **options)
+        if stats:
+            emit_stats(stats, args.stats)
+        return
+
+    if args.action == "verify":
+        ok = verify_files(paths, key_path, workers, stats, args.report)
+        if stats:
+            emit_stats(stats, args.stats)
+        if not ok:
+            sys.exit(1)
+        return
+
+    if args.socket and args.action in ("encrypt", "decrypt") and len(paths) == 1 and not args.dir:
+        # The work runs in the service: its workers and stats are not ours to set
+        if args.stats or args.workers is not None:
+            print(f"--stats and --workers do not apply to requests sent to the service; use them without "
+                  f"--socket (and with ${client.SOCKET_ENV} unset)", file=sys.stderr)
+            sys.exit(2)
+        ok = remote_file(args.action, paths[0], args.output or ("-" if paths == ["-"] else None), args.socket,
+                         key_path if args.key or args.selectkey else None, args.cipher, **output, **options)
+        if not ok:
+            sys.exit(1)
+        return
+
+    if args.output or paths == ["-"]:
+        if args.action not in ("encrypt", "decrypt") or len(paths) != 1 or args.dir:
+            print("-o and -f - need encrypt or decrypt and a single file", file=sys.stderr)
+            sys.exit(1)
+        ok = stream_file(args.action, paths[0], args.output or "-", key_path, workers, args.cipher, stats,
+                         **output, **options)
+        if stats:
+            emit_stats(stats, args.stats)
+        if not ok:
+            sys.exit(1)
+        return
+
+    if len(paths) == 1 and not args.dir and os.path.isfile(paths[0]) and args.action != "rotate":
+        if args.action == "encrypt":
+            encrypt_file(paths[0], key_path, workers, args.cipher, stats=stats, **output, **options)
+        elif args.action == "decrypt":
+            decrypt_file(paths[0], key_path, workers, stats, **output)
+    else:
+        from cryptora import batch
+        files = batch.collect_files(paths, args.action)
+        if not files:
+            print("No files matched.")
+            return
+        key = None
+        if key_path:
+            key = load_key(key_path)
+            if key is None:
+                return
+        # Looked up before rotating: rotate renames the files
+        old_keys = [key_registry().find_key_path(path) for path in files] if args.retire else []
+        counts = batch.run_batch(args.action, files, key, key_path, workers, key_registry(), stats,
+                                 cipher=args.cipher, **output, **options)
+        if args.retire:
+            if counts["failed"]:
+                print("No keys retired: some files were not rotated.")
+            else:
+                retire_keys(old_keys, key)
+    if stats:
+        emit_stats(stats, args.stats)
 
 if __name__ == "__main__":
     main()
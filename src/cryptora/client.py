@@ -0,0 +1,104 @@
+import os
+import json
+import struct
+
+# The client only needs the standard library, so calls routed through a
+# running `cryptora serve` skip loading the crypto stack and the keys.
+# socket and threading are imported on first call to keep the CLI's start
+# fast for everything else.
+
+# ---------------- Protocol ----------------
+# Request:  one JSON line {"op": "encrypt" | "decrypt" | "ping", ...options},
+#           then the input bytes until the client shuts down its side.
+# Response: one JSON line, {"key": name} or {"error": message}; then the
+#           output as frames (u32 length + bytes) ended by an empty frame,
+#           and a closing JSON line {"ok": true} or {"ok": false, "error": ...}.
+
+FRAME = struct.Struct(">I")
+BLOCK_SIZE = 1024 * 1024
+SOCKET_ENV = "CRYPTORA_SOCKET"
+
+def default_socket():
+    """
+    $CRYPTORA_SOCKET, or cryptora-<uid>.sock in the user's runtime folder
+    """
+    if os.environ.get(SOCKET_ENV):
+        return os.environ[SOCKET_ENV]
+    folder = os.environ.get("XDG_RUNTIME_DIR") or os.environ.get("TMPDIR") or "/tmp"
+    uid = os.getuid() if hasattr(os, "getuid") else "user"
+    return os.path.join(folder, f"cryptora-{uid}.sock")
+
+
+class ServiceError(Exception):
+    """
+    Raised when the service cannot be reached or reports a failure
+    """
+
+
+# ---------------- Client ----------------
+def _read_line(stream):
+    line = stream.readline()
+    if not line.endswith(b"\n"):
+        raise ServiceError("Connection closed by the service")
+    return json.loads(line)
+
+def _send_all(sock, src):
+    import socket
+    try:
+        while True:
+            block = src.read(BLOCK_SIZE)
+            if not block:
+                break
+            sock.sendall(block)
+        sock.shutdown(socket.SHUT_WR)
+    except OSError:
+        pass  # the service stopped reading; its reply says why
+
+def call(socket_path, op, src=None, open_output=None, **options):
+    """
+    Runs one request on the service. src is a binary stream sent as input;
+    open_output(reply) is given the first reply (naming the key used) and
+    returns the binary stream the output is written to. Input is sent from
+    a thread while the output is read, so neither side's buffers fill up.
+    Returns the first reply, raises ServiceError on failure.
+    """
+    import socket
+    import threading
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(socket_path)
+    except OSError as e:
+        sock.close()
+        raise ServiceError(f"Cannot reach the service at {socket_path}: {e.strerror}")
+    with sock, sock.makefile("rb") as replies:
+        sock.sendall(json.dumps(dict(options, op=op)).encode() + b"\n")
+        sender = threading.Thread(target=_send_all, args=(sock, src), daemon=True) if src else None
+        if sender:
+            sender.start()
+        else:
+            sock.shutdown(socket.SHUT_WR)
+        try:
+            reply = _read_line(replies)
+            if "error" in reply:
+                raise ServiceError(reply["error"])
+            if op == "ping":
+                return reply
+            dst = open_output(reply)
+            while True:
+                header = replies.read(FRAME.size)
+                if len(header) < FRAME.size:
+                    raise ServiceError("Connection closed by the service")
+                (length,) = FRAME.unpack(header)
+                if not length:
+                    break
+                block = replies.read(length)
+                if len(block) < length:
+                    raise ServiceError("Connection closed by the service")
+                dst.write(block)
+            status = _read_line(replies)
+            if not status.get("ok"):
+                raise ServiceError(status.get("error", "Request failed"))
+            return reply
+        finally:
+            if sender:
+                sender.join()
@@ -0,0 +1,92 @@
+import os
+import lzma
+import zlib
+
+try:  # Python 3.14+
+    from compression import zstd as _zstd
+except ImportError:
+    _zstd = None
+try:
+    import zstandard as _zstandard
+except ImportError:
+    _zstandard = None
+
+# ---------------- Codecs ----------------
+DEFAULT_LEVELS = {"zlib": 6, "lzma": 6, "zstd": 3}
+
+# Probe this much of the first chunk; below this ratio compression is kept
+PROBE_SIZE = 64 * 1024
+PROBE_RATIO = 0.9
+
+# Already compressed formats are never worth another pass
+SKIP_EXTENSIONS = {
+    ".gz", ".tgz", ".bz2", ".xz", ".lz", ".lzma", ".zst", ".zip", ".7z", ".rar",
+    ".jpg", ".jpeg", ".png", ".gif", ".webp", ".heic", ".avif",
+    ".mp3", ".aac", ".ogg", ".opus", ".flac", ".m4a",
+    ".mp4", ".m4v", ".mkv", ".mov", ".avi", ".webm",
+    ".docx", ".xlsx", ".pptx", ".odt", ".ods", ".jar", ".apk",
+}
+
+
+def available_codecs():
+    codecs = ["zlib", "lzma"]
+    if _zstd or _zstandard:
+        codecs.append("zstd")
+    return codecs
+
+def check_codec(codec):
+    if codec not in available_codecs():
+        raise ValueError(f"Compression codec not available: {codec}")
+
+def compress(codec, level, data):
+    if codec == "zlib":
+        return zlib.compress(data, level)
+    if codec == "lzma":
+        return lzma.compress(data, preset=level)
+    if _zstd:
+        return _zstd.compress(data, level=level)
+    return _zstandard.ZstdCompressor(level=level).compress(data)
+
+def decompress(codec, data, max_size):
+    """
+    Decompresses data, refusing output larger than max_size
+    """
+    if codec == "zlib":
+        decoder = zlib.decompressobj()
+        out = decoder.decompress(data, max_size)
+        if decoder.unconsumed_tail or not decoder.eof:
+            raise ValueError("Compressed chunk is too large or incomplete")
+        return out
+    if codec == "lzma":
+        decoder = lzma.LZMADecompressor()
+        out = decoder.decompress(data, max_size)
+        if not decoder.eof:
+            raise ValueError("Compressed chunk is too large or incomplete")
+        return out
+    if _zstd:
+        decoder = _zstd.ZstdDecompressor()
+        out = decoder.decompress(data, max_size)
+        if not decoder.eof:
+            raise ValueError("Compressed chunk is too large or incomplete")
+        return out
+    if _zstandard:
+        return _zstandard.ZstdDecompressor().decompress(data, max_output_size=max_size)
+    raise ValueError("zstd support is not installed")
+
+# ---------------- Auto Skip ----------------
+def worth_compressing(file_path):
+    """
+    False for file types that are already compressed
+    """
+    return os.path.splitext(file_path)[1].lower() not in SKIP_EXTENSIONS
+
+def probe(codec, first_chunk):
+    """
+    Compresses a sample of the first chunk at a fast setting and reports
+    whether the data shrinks enough to be worth compressing
+    """
+    sample = first_chunk[:PROBE_SIZE]
+    if not sample:
+        return False
+    fast = {"zlib": 1, "lzma": 0, "zstd": 1}[codec]
+    return len(compress(codec, fast, sample)) < len(sample) * PROBE_RATIO
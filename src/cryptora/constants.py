@@ -0,0 +1,11 @@
+# ---------------- Shared Constants ----------------
+# Kept free of heavy imports so the CLI can build its options (and answer
+# --help or listkeys) without loading the crypto stack.
+
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+
+CIPHERS = ("aes-256-gcm", "chacha20-poly1305", "fernet")
+DEFAULT_CIPHER = "aes-256-gcm"
+
+# Encrypted files are named <file>.enc_<key name>
+ENC_MARKER = ".enc_"
@@ -0,0 +1,126 @@
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM, ChaCha20Poly1305
+import io
+import os
+import struct
+from concurrent.futures import ThreadPoolExecutor
+
+from cryptora import encryption
+
+# ---------------- Blob Format ----------------
+# A Cryptor seals each blob on its own, without a container's header, chunk
+# frames or index:
+#
+#   header   BLOB_VERSION | cipher (position in CIPHERS)
+#   nonce    12 random bytes
+#   sealed   ciphertext and 16-byte tag, the header as associated data
+#
+# 30 bytes of overhead per blob. The AEAD keys are derived from the key file
+# once, when the Cryptor is built, so a blob costs one os.urandom call and
+# one seal. Nonces are random: keep to 2**32 blobs per key file and cipher.
+# With the fernet cipher blobs are plain Fernet tokens.
+#
+# decrypt also reads Cryptora containers and legacy Fernet tokens, so blobs
+# sealed before this format existed still open.
+
+BLOB_VERSION = 0xB1  # neither "C" (containers) nor "g" (Fernet tokens)
+_HEADER = struct.Struct(">BB")
+_NONCE_SIZE = 12
+_TAG_SIZE = 16
+
+# Derivation salt for blob keys; container file ids are 16 bytes, never this
+_BLOB_SALT = b"cryptora blobs"
+
+
+class Cryptor:
+    """
+    Encrypts and decrypts in-memory blobs with one key.
+
+    The key is parsed and checked once and the AEAD cipher objects are built
+    once, so per-blob cost is the crypto itself. A Cryptor holds no mutable
+    state and can be shared by any number of threads.
+
+        cryptor = Cryptor.from_file("keys/cryptora_20250831_025105.key")
+        sealed = cryptor.encrypt_many(blobs, workers=4)
+        assert cryptor.decrypt_many(sealed) == blobs
+    """
+    def __init__(self, key, cipher=encryption.DEFAULT_CIPHER):
+        if cipher not in encryption.CIPHERS:
+            raise ValueError(f"Unknown cipher: {cipher}")
+        if isinstance(key, str):
+            key = key.encode()
+        # Fails early on anything that is not a 32-byte urlsafe base64 key
+        self._fernet = encryption._fernet(key)
+        self.key = key
+        self.key_id = encryption.key_id(key)
+        self.cipher = cipher
+        self._header = _HEADER.pack(BLOB_VERSION, encryption.CIPHERS.index(cipher))
+        # Both AEADs, so blobs sealed with the other cipher open too
+        self._aeads = {
+            "aes-256-gcm": AESGCM(encryption._aead_key(key, _BLOB_SALT, "aes-256-gcm")),
+            "chacha20-poly1305": ChaCha20Poly1305(encryption._aead_key(key, _BLOB_SALT, "chacha20-poly1305")),
+        }
+
+    @classmethod
+    def from_file(cls, key_path, **options):
+        """
+        Creates a Cryptor for a key file, read through the key cache
+        """
+        return cls(encryption.load_key(key_path), **options)
+
+    def encrypt(self, data):
+        """
+        Encrypts bytes into a blob
+        """
+        if self.cipher == "fernet":
+            return self._fernet.encrypt(data)
+        nonce = os.urandom(_NONCE_SIZE)
+        return self._header + nonce + self._aeads[self.cipher].encrypt(nonce, data, self._header)
+
+    def decrypt(self, blob):
+        """
+        Decrypts a blob, Cryptora container or legacy Fernet token back into
+        bytes. Raises InvalidToken for the wrong key or tampered data.
+        """
+        if blob[:1] == self._header[:1]:
+            return self._open(blob)
+        if blob[:len(encryption.MAGIC)] == encryption.MAGIC:
+            out = io.BytesIO()
+            encryption.decrypt_stream(io.BytesIO(blob), out, self.key)
+            return out.getvalue()
+        return self._fernet.decrypt(blob)
+
+    def _open(self, blob):
+        if len(blob) < _HEADER.size + _NONCE_SIZE + _TAG_SIZE:
+            raise encryption.TruncatedFileError("Blob is truncated")
+        header = blob[:_HEADER.size]
+        _, cipher = _HEADER.unpack(header)
+        aead = self._aeads.get(encryption.CIPHERS[cipher] if cipher < len(encryption.CIPHERS) else None)
+        if aead is None:
+            raise encryption.CorruptedFileError(f"Unknown blob cipher: {cipher}")
+        nonce = blob[_HEADER.size:_HEADER.size + _NONCE_SIZE]
+        try:
+            return aead.decrypt(nonce, blob[_HEADER.size + _NONCE_SIZE:], header)
+        except InvalidTag:
+            raise encryption.InvalidToken
+
+    def encrypt_many(self, blobs, workers=1):
+        """
+        Encrypts each blob, returns the results in order. With workers > 1
+        the blobs are spread over a thread pool.
+        """
+        return self._map(self.encrypt, blobs, workers)
+
+    def decrypt_many(self, blobs, workers=1):
+        """
+        Decrypts each blob, returns the results in order. The first blob that
+        fails raises its InvalidToken.
+        """
+        return self._map(self.decrypt, blobs, workers)
+
+    @staticmethod
+    def _map(func, blobs, workers):
+        if workers <= 1:
+            return [func(blob) for blob in blobs]
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            return list(pool.map(func, blobs))
@@ -1,5 +1,84 @@
-from cryptography.fernet import Fernet
+from cryptography.exceptions import InvalidTag
+from cryptography.fernet import Fernet, InvalidToken
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM, ChaCha20Poly1305
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+from cryptography.hazmat.primitives.keywrap import InvalidUnwrap, aes_key_wrap, aes_key_unwrap
+import array
+import base64
+import functools
+import hashlib
+import itertools
 import os
+import struct
+import sys
+import time
+from collections import namedtuple
+
+from cryptora import compress, stats as metrics
+from cryptora.atomic import DEFAULT_BUFFER_SIZE, DEFAULT_DURABILITY, atomic_output
+from cryptora.constants import CIPHERS, DEFAULT_CHUNK_SIZE, DEFAULT_CIPHER
+from cryptora.parallel import ordered_map
+
+# ---------------- Container Format ----------------
+# A Cryptora file is a small header followed by independently sealed chunks:
+#
+#   preamble  MAGIC | version | header length
+#   header    tag/length/value fields (chunk size, file id, cipher, compression,
+#             key id, wrapped data key, ...)
+#   chunks    length-prefixed sealed chunks, the last one flagged as final
+#   index     offset of every chunk frame, then a footer with the index
+#             offset, chunk count and INDEX_MAGIC
+#
+# Every sealed chunk carries the file id, its position and the final flag, so
+# truncated, reordered or swapped chunks fail authentication. Fernet chunks
+# embed them in the token; AEAD chunks are raw binary, bind them as
+# associated data and use a key derived per file from the key file.
+#
+# In envelope mode chunks are sealed with a random per-file data key, stored
+# in the header wrapped (AES key wrap) by the key file. Rotating to a new key
+# only re-wraps that field in place; the data is never rewritten.
+#
+# Every chunk but the last holds exactly chunk size plaintext bytes, so with
+# the index a byte range maps straight to the few chunks that cover it.
+
+MAGIC = b"CRYPTORA"
+INDEX_MAGIC = b"CRYINDEX"
+FORMAT_VERSION = 1
+KEY_CACHE_SIZE = 16
+
+_PREAMBLE = struct.Struct(">8sBH")
+_FIELD = struct.Struct(">BH")
+_FRAME = struct.Struct(">I")
+_CHUNK_INFO = struct.Struct(">16sQ?")
+_FINAL_BIT = 0x80000000
+_INDEX_ENTRY = struct.Struct(">Q")
+_FOOTER = struct.Struct(">QQ8s")
+
+TAG_CHUNK_SIZE = 1
+TAG_FILE_ID = 2
+TAG_CIPHER = 3
+TAG_KEY_ID = 4
+TAG_WRAPPED_KEY = 5
+TAG_COMPRESSION = 6
+TAG_INDEX = 7
+
+
+class CorruptedFileError(InvalidToken):
+    """
+    Raised when an encrypted file is truncated, reordered or malformed
+    """
+
+class TruncatedFileError(CorruptedFileError):
+    """
+    Raised when an encrypted file ends before its final chunk or index
+    """
+
+class WrongKeyError(InvalidToken):
+    """
+    Raised when a file's header names a different key than the one given
+    """
+
 
 def generate_key():
     """
@@ -12,29 +91,754 @@ def generate_key():
 
 def load_key(key_file="key.key"):
     """
-    Loads the key from a file
+    Loads the key from a file. Recently used keys are cached and only read
+    again when the file's size or mtime changes.
+    """
+    stat = os.stat(key_file)
+    return _read_key(os.path.abspath(key_file), stat.st_mtime_ns, stat.st_size)
+
+@functools.lru_cache(maxsize=KEY_CACHE_SIZE)
+def _read_key(path, mtime_ns, size):
+    with open(path, "rb") as f:
+        return f.read()
+
+def key_id(key):
+    """
+    Returns the 8-byte id of a key, stored in headers to find the key again
+    """
+    if isinstance(key, str):
+        key = key.encode()
+    return hashlib.sha256(b"cryptora key id" + key.strip()).digest()[:8]
+
+# ---------------- Envelope Keys ----------------
+def _key_bytes(key):
+    return base64.urlsafe_b64decode(key)
+
+def new_data_key():
+    """
+    Returns a random per-file data key, in the same format as a key file
+    """
+    return base64.urlsafe_b64encode(os.urandom(32))
+
+def wrap_data_key(key, data_key):
+    return aes_key_wrap(_key_bytes(key), _key_bytes(data_key))
+
+def unwrap_data_key(key, wrapped):
+    try:
+        return base64.urlsafe_b64encode(aes_key_unwrap(_key_bytes(key), wrapped))
+    except InvalidUnwrap:
+        raise WrongKeyError("Data key cannot be unwrapped with this key")
+
+# ---------------- Header ----------------
+def _pack_header(fields):
+    body = b"".join(_FIELD.pack(tag, len(value)) + value for tag, value in fields.items())
+    return _PREAMBLE.pack(MAGIC, FORMAT_VERSION, len(body)) + body
+
+def _read_exact(stream, size):
+    """
+    Reads exactly size bytes, fewer only at end of stream
+    """
+    buf = bytearray()
+    while len(buf) < size:
+        data = stream.read(size - len(buf))
+        if not data:
+            break
+        buf += data
+    return bytes(buf)
+
+def _field_spans(body):
+    """
+    Returns {tag: (offset, length)} of each field value within the header body
+    """
+    spans = {}
+    offset = 0
+    while offset < len(body):
+        if offset + _FIELD.size > len(body):
+            raise CorruptedFileError("Malformed header")
+        tag, length = _FIELD.unpack_from(body, offset)
+        offset += _FIELD.size
+        spans[tag] = (offset, length)
+        offset += length
+    if offset != len(body):
+        raise CorruptedFileError("Malformed header")
+    return spans
+
+def _parse_header(body):
+    return {tag: body[offset:offset + length] for tag, (offset, length) in _field_spans(body).items()}
+
+def read_header(stream, prefix=b""):
+    """
+    Reads the container header, returns a dict of tag -> value bytes
+    """
+    preamble = prefix + _read_exact(stream, _PREAMBLE.size - len(prefix))
+    if len(preamble) < _PREAMBLE.size:
+        raise TruncatedFileError("Truncated header")
+    magic, version, length = _PREAMBLE.unpack(preamble)
+    if magic != MAGIC:
+        raise CorruptedFileError("Not a Cryptora file")
+    if version != FORMAT_VERSION:
+        raise CorruptedFileError(f"Unsupported format version: {version}")
+    body = _read_exact(stream, length)
+    if len(body) < length:
+        raise TruncatedFileError("Truncated header")
+    return _parse_header(body)
+
+def is_encrypted(stream):
+    """
+    True if the stream starts with a Cryptora container header
+    """
+    return _read_exact(stream, len(MAGIC)) == MAGIC
+
+def read_key_id(stream):
+    """
+    Returns the key id recorded in a container header, or None for
+    legacy files and containers written before key ids were recorded
+    """
+    prefix = _read_exact(stream, len(MAGIC))
+    if prefix != MAGIC:
+        return None
+    return read_header(stream, prefix).get(TAG_KEY_ID)
+
+class ReplayReader:
+    """
+    Wraps a pipe so the header can be read to find the key, then read again:
+    bytes read before rewind() are returned first afterwards
+    """
+    def __init__(self, stream):
+        self.stream = stream
+        self.seen = bytearray()
+        self.replay = b""
+
+    def rewind(self):
+        self.replay, self.seen = bytes(self.seen), None
+
+    def read(self, size=-1):
+        if self.replay:
+            if size < 0:
+                data, self.replay = self.replay + self.stream.read(), b""
+            else:
+                data, self.replay = self.replay[:size], self.replay[size:]
+            return data
+        data = self.stream.read(size)
+        if self.seen is not None:
+            self.seen += data
+        return data
+
+# ---------------- Chunk Pipeline ----------------
+def read_chunks(stream, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Yields fixed-size chunks from a binary stream
+    """
+    while True:
+        chunk = _read_exact(stream, chunk_size)
+        if not chunk:
+            return
+        yield chunk
+        if len(chunk) < chunk_size:
+            return
+
+def _flag_final(chunks):
+    """
+    Yields (index, final, chunk), looking one chunk ahead to flag the last one.
+    Empty input still yields one empty final chunk.
+    """
+    chunks = iter(chunks)
+    previous = next(chunks, b"")
+    index = 0
+    for chunk in chunks:
+        yield index, False, previous
+        previous = chunk
+        index += 1
+    yield index, True, previous
+
+# ---------------- Cipher Suites ----------------
+def _aead_key(key, file_id, cipher):
+    """
+    Derives a per-file AEAD key from a key file's 32 key bytes
+    """
+    material = _key_bytes(key)
+    hkdf = HKDF(algorithm=hashes.SHA256(), length=32, salt=file_id,
+                info=b"cryptora chunk key " + cipher.encode())
+    return hkdf.derive(material)
+
+@functools.lru_cache(maxsize=KEY_CACHE_SIZE)
+def _fernet(key):
+    return Fernet(key)
+
+@functools.lru_cache(maxsize=64)
+def _chunk_cipher(cipher, key, file_id):
+    if cipher == "fernet":
+        # Fernet chunks use the key itself, so one instance serves every file
+        return _fernet(key)
+    aead = AESGCM if cipher == "aes-256-gcm" else ChaCha20Poly1305
+    return aead(_aead_key(key, file_id, cipher))
+
+def _nonce(index):
+    # Chunk keys are unique per file, so the chunk index is a unique nonce
+    return index.to_bytes(12, "big")
+
+# Everything a worker needs to seal or open the chunks of one file
+ChunkParams = namedtuple("ChunkParams", ["cipher", "key", "file_id", "binding", "chunk_size", "codec", "level",
+                                         "indexed"])
+
+def _binding(file_id, compression):
+    """
+    Id bound into every chunk. Compressed files mix the codec into it, so
+    editing the codec in the header fails authentication.
+    """
+    if not compression:
+        return file_id
+    return hashlib.sha256(b"cryptora binding" + file_id + compression).digest()[:16]
+
+def seal_chunk(params, item):
+    """
+    Seals item = (index, final, chunk) into a length-prefixed frame
+    """
+    index, final, chunk = item
+    return _seal(params, index, final, _pack(params, chunk))
+
+def open_chunk(params, item):
+    """
+    Opens item = (index, final, sealed), returns (final, chunk)
+    """
+    index, final, sealed = item
+    final, chunk = _unseal(params, index, final, sealed)
+    return final, _unpack(params, index, chunk)
+
+def _seal_timed(params, item):
+    """
+    seal_chunk that also returns the sizes and times of its stages:
+    (frame, plain bytes, packed bytes, compress seconds, encrypt seconds)
+    """
+    index, final, chunk = item
+    start = time.perf_counter()
+    packed = _pack(params, chunk)
+    packed_at = time.perf_counter()
+    frame = _seal(params, index, final, packed)
+    return frame, len(chunk), len(packed), packed_at - start, time.perf_counter() - packed_at
+
+def verify_chunk(params, item):
+    """
+    Authenticates item = (index, final, sealed) and drops its plaintext,
+    returns (final, sealed bytes, seconds)
+    """
+    index, final, sealed = item
+    start = time.perf_counter()
+    final, _ = _unseal(params, index, final, sealed)
+    return final, len(sealed), time.perf_counter() - start
+
+def _open_timed(params, item):
+    """
+    open_chunk that also returns the sizes and times of its stages:
+    (final, chunk, sealed bytes, decrypt seconds, decompress seconds)
+    """
+    index, final, sealed = item
+    start = time.perf_counter()
+    final, packed = _unseal(params, index, final, sealed)
+    opened_at = time.perf_counter()
+    chunk = _unpack(params, index, packed)
+    return final, chunk, len(sealed), opened_at - start, time.perf_counter() - opened_at
+
+def _pack(params, chunk):
+    if params.codec:
+        # One flag byte per chunk: 1 = compressed, 0 = stored as is
+        packed = compress.compress(params.codec, params.level, chunk)
+        chunk = b"\x01" + packed if len(packed) < len(chunk) else b"\x00" + chunk
+    return chunk
+
+def _seal(params, index, final, chunk):
+    info = _CHUNK_INFO.pack(params.binding, index, final)
+    sealer = _chunk_cipher(params.cipher, params.key, params.file_id)
+    if params.cipher == "fernet":
+        sealed = sealer.encrypt(info + chunk)
+    else:
+        sealed = sealer.encrypt(_nonce(index), chunk, info)
+    return _FRAME.pack(len(sealed) | (_FINAL_BIT if final else 0)) + sealed
+
+def _unseal(params, index, final, sealed):
+    opener = _chunk_cipher(params.cipher, params.key, params.file_id)
+    if params.cipher != "fernet":
+        # The final flag travels in the frame and is authenticated as AAD
+        try:
+            chunk = opener.decrypt(_nonce(index), sealed, _CHUNK_INFO.pack(params.binding, index, final))
+        except InvalidTag:
+            raise InvalidToken
+    else:
+        plain = opener.decrypt(sealed)
+        if len(plain) < _CHUNK_INFO.size:
+            raise CorruptedFileError(f"Chunk {index} is malformed")
+        binding, chunk_index, final = _CHUNK_INFO.unpack_from(plain)
+        if binding != params.binding or chunk_index != index:
+            raise CorruptedFileError(f"Chunk {index} is out of place")
+        chunk = plain[_CHUNK_INFO.size:]
+    return final, chunk
+
+def _unpack(params, index, chunk):
+    if params.codec:
+        if not chunk:
+            raise CorruptedFileError(f"Chunk {index} is malformed")
+        if chunk[0]:
+            try:
+                chunk = compress.decompress(params.codec, chunk[1:], params.chunk_size)
+            except Exception:
+                raise CorruptedFileError(f"Chunk {index} does not decompress")
+        else:
+            chunk = chunk[1:]
+    return chunk
+
+# ---------------- Chunk Framing ----------------
+def _read_frame(stream, index, max_frame):
+    """
+    Reads one length-prefixed frame, returns (final, sealed) or None at end of stream
+    """
+    frame = _read_exact(stream, _FRAME.size)
+    if not frame:
+        return None
+    if len(frame) < _FRAME.size:
+        raise TruncatedFileError("File is truncated")
+    (length,) = _FRAME.unpack(frame)
+    final = bool(length & _FINAL_BIT)
+    length &= ~_FINAL_BIT
+    if length > max_frame:
+        raise CorruptedFileError(f"Chunk {index} is malformed")
+    sealed = _read_exact(stream, length)
+    if len(sealed) < length:
+        raise TruncatedFileError("File is truncated")
+    return final, sealed
+
+def _max_frame(chunk_size):
+    return 2 * (chunk_size + _CHUNK_INFO.size) + 1024
+
+def _read_frames(stream, chunk_size, stop_at_final=False):
+    """
+    Yields (index, final, sealed) for each length-prefixed frame until end
+    of stream, or until the final frame when an index trailer follows it
+    """
+    max_frame = _max_frame(chunk_size)
+    index = 0
+    while True:
+        frame = _read_frame(stream, index, max_frame)
+        if frame is None:
+            return
+        yield (index,) + frame
+        if stop_at_final and frame[0]:
+            return
+        index += 1
+
+def _check_index_trailer(stream, count):
+    """
+    Skips over the index trailer after the final chunk, checking its footer
+    """
+    remaining = count * _INDEX_ENTRY.size
+    while remaining:
+        block = stream.read(min(remaining, DEFAULT_CHUNK_SIZE))
+        if not block:
+            raise TruncatedFileError("File is truncated")
+        remaining -= len(block)
+    footer = _read_exact(stream, _FOOTER.size)
+    if len(footer) < _FOOTER.size:
+        raise TruncatedFileError("File is truncated")
+    _, footer_count, magic = _FOOTER.unpack(footer)
+    if magic != INDEX_MAGIC or footer_count != count:
+        raise CorruptedFileError("Chunk index is malformed")
+    if stream.read(1):
+        raise CorruptedFileError("Unexpected data after chunk index")
+
+def seal_chunks(chunks, params, workers=1, stats=None):
+    """
+    Encrypts chunks, yielding length-prefixed sealed frames in order
+    """
+    if stats is None:
+        seal = functools.partial(seal_chunk, params)
+        yield from ordered_map(seal, _flag_final(chunks), workers)
+        return
+    seal = functools.partial(_seal_timed, params)
+    for frame, plain_size, packed_size, pack_seconds, seal_seconds in ordered_map(seal, _flag_final(chunks), workers):
+        if params.codec:
+            stats.add("compress", plain_size, pack_seconds)
+        stats.add("encrypt", packed_size, seal_seconds)
+        yield frame
+
+def _timed_chunks(frames, params, workers, stats):
+    unseal = functools.partial(_open_timed, params)
+    for final, chunk, sealed_size, open_seconds, unpack_seconds in ordered_map(unseal, frames, workers):
+        stats.add("decrypt", sealed_size, open_seconds)
+        if params.codec:
+            stats.add("decompress", len(chunk), unpack_seconds)
+        yield final, chunk
+
+def open_chunks(stream, params, workers=1, stats=None):
+    """
+    Reads sealed frames from a stream and yields authenticated plaintext chunks
+    """
+    frames = _read_frames(stream, params.chunk_size, stop_at_final=params.indexed)
+    if stats is None:
+        opened = ordered_map(functools.partial(open_chunk, params), frames, workers)
+    else:
+        opened = _timed_chunks(frames, params, workers, stats)
+    for _, chunk in _in_order(opened, stream, params):
+        yield chunk
+
+def _in_order(opened, stream, params):
+    """
+    Passes on the (final, ...) results of opened frames, checking that only
+    the last chunk is flagged final and that the index trailer follows it
+    """
+    final = False
+    count = 0
+    for result in opened:
+        if final:
+            raise CorruptedFileError("Unexpected data after final chunk")
+        final = result[0]
+        count += 1
+        yield result
+    if not final:
+        raise TruncatedFileError("File is truncated")
+    if params.indexed:
+        _check_index_trailer(stream, count)
+
+def chunk_params(header, key):
+    """
+    Validates a parsed header against key and returns its ChunkParams,
+    unwrapping the data key of envelope files
+    """
+    try:
+        (chunk_size,) = struct.unpack(">I", header[TAG_CHUNK_SIZE])
+        file_id = header[TAG_FILE_ID]
+        cipher = header.get(TAG_CIPHER, b"fernet").decode()
+        codec, level = None, None
+        if TAG_COMPRESSION in header:
+            codec, level = header[TAG_COMPRESSION].decode().split(":")
+            level = int(level)
+    except (KeyError, ValueError, struct.error):
+        raise CorruptedFileError("Malformed header")
+    if cipher not in CIPHERS:
+        raise CorruptedFileError(f"Unknown cipher: {cipher}")
+    if codec:
+        try:
+            compress.check_codec(codec)
+        except ValueError as e:
+            raise CorruptedFileError(str(e))
+    if header.get(TAG_KEY_ID, key_id(key)) != key_id(key):
+        raise WrongKeyError(f"File was encrypted with key {header[TAG_KEY_ID].hex()}")
+    if TAG_WRAPPED_KEY in header:
+        key = unwrap_data_key(key, header[TAG_WRAPPED_KEY])
+    binding = _binding(file_id, header.get(TAG_COMPRESSION))
+    return ChunkParams(cipher, key, file_id, binding, chunk_size, codec, level, TAG_INDEX in header)
+
+# ---------------- Stream Encryption ----------------
+def encrypt_stream(src, dst, key, chunk_size=DEFAULT_CHUNK_SIZE, workers=1, cipher=DEFAULT_CIPHER,
+                   envelope=False, compression=None, level=None, stats=None):
+    """
+    Encrypts a binary stream into the chunked container format,
+    sealing chunks on `workers` processes. With envelope=True chunks are
+    sealed with a random data key stored wrapped by `key` in the header.
+    With a compression codec each chunk is compressed before sealing,
+    unless a probe of the first chunk shows the data does not compress.
+    With a cryptora.stats.Stats, every stage is timed into it.
+    """
+    if stats is not None:
+        src, dst = stats.reader(src), stats.writer(dst)
+    chunks = read_chunks(src, chunk_size)
+    first = next(chunks, b"")
+    header, params = new_container(key, first, chunk_size, cipher, envelope, compression, level)
+    dst.write(header)
+
+    offsets = array.array("Q")
+    position = len(header)
+    for frame in seal_chunks(itertools.chain([first], chunks), params, workers, stats):
+        offsets.append(position)
+        dst.write(frame)
+        position += len(frame)
+    dst.write(index_trailer(offsets, position))
+
+def new_container(key, first_chunk, chunk_size=DEFAULT_CHUNK_SIZE, cipher=DEFAULT_CIPHER,
+                  envelope=False, compression=None, level=None):
+    """
+    Builds the header of a new container, returns (header bytes, ChunkParams).
+    With a compression codec the first chunk is probed to decide whether
+    compressing is worth it.
+    """
+    if cipher not in CIPHERS:
+        raise ValueError(f"Unknown cipher: {cipher}")
+    codec_field = None
+    if compression:
+        compress.check_codec(compression)
+        level = compress.DEFAULT_LEVELS[compression] if level is None else level
+        if compress.probe(compression, first_chunk):
+            codec_field = f"{compression}:{level}".encode()
+        else:
+            compression = None
+
+    file_id = os.urandom(16)
+    fields = {
+        TAG_CHUNK_SIZE: struct.pack(">I", chunk_size),
+        TAG_FILE_ID: file_id,
+        TAG_CIPHER: cipher.encode(),
+    }
+    if codec_field:
+        fields[TAG_COMPRESSION] = codec_field
+    fields[TAG_INDEX] = b"\x01"
+    # Key id and wrapped key stay adjacent so rotation rewrites them in one write
+    fields[TAG_KEY_ID] = key_id(key)
+    data_key = key
+    if envelope:
+        data_key = new_data_key()
+        fields[TAG_WRAPPED_KEY] = wrap_data_key(key, data_key)
+    params = ChunkParams(cipher, data_key, file_id, _binding(file_id, codec_field), chunk_size,
+                         compression, level, True)
+    return _pack_header(fields), params
+
+def index_trailer(offsets, index_offset):
+    """
+    Packs the chunk index written after the final chunk: the frame offsets
+    (an array of "Q"), then the footer
+    """
+    offsets = array.array("Q", offsets)
+    if sys.byteorder == "little":
+        offsets.byteswap()
+    return offsets.tobytes() + _FOOTER.pack(index_offset, len(offsets), INDEX_MAGIC)
+
+def read_params(src, key):
+    """
+    Reads a container header from src, returns (ChunkParams, None). Legacy
+    files are one Fernet token that can only be decrypted whole, so for
+    those it returns (None, plaintext).
+    """
+    prefix = _read_exact(src, len(MAGIC))
+    if prefix != MAGIC:
+        return None, _fernet(key).decrypt(prefix + src.read())
+    return chunk_params(read_header(src, prefix), key), None
+
+def decrypt_stream(src, dst, key, workers=1, stats=None):
+    """
+    Decrypts a container (or a legacy single-token Fernet file) into dst.
+    With a cryptora.stats.Stats, every stage is timed into it.
+    """
+    if stats is not None:
+        src, dst = stats.reader(src), stats.writer(dst)
+    start = time.perf_counter()
+    params, legacy = read_params(src, key)
+    if params is None:
+        if stats is not None:
+            stats.add("decrypt", len(legacy), time.perf_counter() - start)
+        dst.write(legacy)
+        return
+    for chunk in open_chunks(src, params, workers, stats):
+        dst.write(chunk)
+
+def verify_stream(src, key, workers=1, stats=None):
+    """
+    Authenticates every chunk of a container (or a legacy Fernet file)
+    without writing plaintext anywhere. Chunks are not decompressed: the
+    tag already proves they are what was written. Raises like
+    decrypt_stream on any damage, returns the number of bytes checked.
+    """
+    if stats is not None:
+        src = stats.reader(src)
+    start = time.perf_counter()
+    params, legacy = read_params(src, key)
+    if params is None:
+        if stats is not None:
+            stats.add("decrypt", len(legacy), time.perf_counter() - start)
+        return len(legacy)
+    frames = _read_frames(src, params.chunk_size, stop_at_final=params.indexed)
+    checked = 0
+    for _, sealed_size, seconds in _in_order(ordered_map(functools.partial(verify_chunk, params), frames, workers),
+                                             src, params):
+        checked += sealed_size
+        if stats is not None:
+            stats.add("decrypt", sealed_size, seconds)
+    return checked
+
+# ---------------- Random Access ----------------
+def chunk_offsets(src, params, data_start):
+    """
+    Returns the offset of every chunk frame of a seekable container: from the
+    index trailer when there is one, otherwise by walking the frame headers
+    """
+    if params.indexed:
+        try:
+            src.seek(-_FOOTER.size, os.SEEK_END)
+        except OSError:
+            raise TruncatedFileError("File is truncated")
+        index_offset, count, magic = _FOOTER.unpack(_read_exact(src, _FOOTER.size))
+        if magic != INDEX_MAGIC:
+            raise CorruptedFileError("Chunk index is missing")
+        src.seek(index_offset)
+        raw = _read_exact(src, count * _INDEX_ENTRY.size)
+        if len(raw) < count * _INDEX_ENTRY.size or count == 0:
+            raise CorruptedFileError("Chunk index is malformed")
+        offsets = array.array("Q", raw)
+        if sys.byteorder == "little":
+            offsets.byteswap()
+        return offsets
+
+    offsets = array.array("Q")
+    position = data_start
+    src.seek(position)
+    while True:
+        frame = _read_exact(src, _FRAME.size)
+        if not frame:
+            break
+        if len(frame) < _FRAME.size:
+            raise TruncatedFileError("File is truncated")
+        offsets.append(position)
+        position += _FRAME.size + (_FRAME.unpack(frame)[0] & ~_FINAL_BIT)
+        src.seek(position)
+    return offsets
+
+def read_chunk(src, params, offsets, index):
+    """
+    Reads and authenticates a single chunk of a seekable container
+    """
+    src.seek(offsets[index])
+    frame = _read_frame(src, index, _max_frame(params.chunk_size))
+    if frame is None:
+        raise TruncatedFileError("File is truncated")
+    final, chunk = open_chunk(params, (index,) + frame)
+    if final != (index == len(offsets) - 1):
+        raise CorruptedFileError("Chunk index does not match the file")
+    if not final and len(chunk) != params.chunk_size:
+        raise CorruptedFileError(f"Chunk {index} is malformed")
+    return chunk
+
+def decrypt_range(src, dst, key, start=0, end=None):
+    """
+    Decrypts plaintext bytes [start, end) of a seekable container into dst,
+    reading and authenticating only the chunks that cover the range
+    """
+    params, legacy = read_params(src, key)
+    if params is None:
+        dst.write(legacy[start:end])
+        return
+    offsets = chunk_offsets(src, params, src.tell())
+    if not offsets:
+        raise TruncatedFileError("File is truncated")
+    size = params.chunk_size
+    last = len(offsets) - 1 if end is None else min((end - 1) // size, len(offsets) - 1)
+    for index in range(start // size, last + 1):
+        chunk = read_chunk(src, params, offsets, index)
+        base = index * size
+        dst.write(chunk[max(start - base, 0):None if end is None else end - base])
+
+def verify_file(file_path, key, workers=1, stats=None):
+    """
+    Checks that an encrypted file is intact and opens with key, discarding
+    the plaintext. Returns the number of bytes checked.
+    """
+    with metrics.recording("verify", file_path, stats) as stats, open(file_path, "rb") as src:
+        return verify_stream(src, key, workers, stats)
+
+def rewrap_file(file_path, old_key, new_key):
+    """
+    Re-wraps an envelope file's data key from old_key to new_key.
+    Only the key id and wrapped key in the header are rewritten, in place,
+    with a single write.
+    """
+    with open(file_path, "r+b") as f:
+        preamble = _read_exact(f, _PREAMBLE.size)
+        if len(preamble) < _PREAMBLE.size or not preamble.startswith(MAGIC):
+            raise CorruptedFileError("Not a Cryptora file")
+        _, _, length = _PREAMBLE.unpack(preamble)
+        body = _read_exact(f, length)
+        spans = _field_spans(body)
+        if TAG_WRAPPED_KEY not in spans or TAG_KEY_ID not in spans:
+            raise ValueError("File is not envelope-encrypted; it must be re-encrypted to change keys")
+        kid_offset, kid_length = spans[TAG_KEY_ID]
+        wrap_offset, wrap_length = spans[TAG_WRAPPED_KEY]
+        if body[kid_offset:kid_offset + kid_length] != key_id(old_key):
+            raise WrongKeyError("File was not encrypted with the old key")
+
+        data_key = unwrap_data_key(old_key, body[wrap_offset:wrap_offset + wrap_length])
+        region = bytearray(body[kid_offset:wrap_offset + wrap_length])
+        new_kid = key_id(new_key)
+        new_wrapped = wrap_data_key(new_key, data_key)
+        region[:kid_length] = new_kid
+        region[-wrap_length:] = new_wrapped
+
+        f.seek(_PREAMBLE.size + kid_offset)
+        f.write(region)
+        f.flush()
+        os.fsync(f.fileno())
+
+class _ProgressReader:
+    """
+    Wraps a binary stream and reports the number of bytes read so far.
+    The callback may raise to abort the operation.
+    """
+    def __init__(self, stream, progress):
+        self.stream = stream
+        self.progress = progress
+        self.done = 0
+
+    def read(self, size=-1):
+        data = self.stream.read(size)
+        self.done += len(data)
+        self.progress(self.done)
+        return data
+
+class _HashingReader:
+    """
+    Wraps a binary stream and feeds everything read to a hashlib object
+    """
+    def __init__(self, stream, digest):
+        self.stream = stream
+        self.digest = digest
+
+    def read(self, size=-1):
+        data = self.stream.read(size)
+        self.digest.update(data)
+        return data
+
+def _write_output(output_path, write, buffer_size=DEFAULT_BUFFER_SIZE, durability=DEFAULT_DURABILITY,
+                  dir_syncer=None):
+    """
+    Writes output_path via write(stream) through a temp file renamed into
+    place, see cryptora.atomic
     """
-    return open(key_file, "rb").read()
+    with atomic_output(output_path, buffer_size, durability, dir_syncer) as dst:
+        write(dst)
 
-def encrypt_file(file_path, key):
+# ---------------- File Encryption ----------------
+def encrypt_file(file_path, key, output_path=None, chunk_size=DEFAULT_CHUNK_SIZE, workers=1,
+                 cipher=DEFAULT_CIPHER, progress=None, envelope=False, compression=None, level=None,
+                 stats=None, digest=None, buffer_size=DEFAULT_BUFFER_SIZE, durability=DEFAULT_DURABILITY,
+                 dir_syncer=None):
     """
-    Encrypts a file with the given key
+    Encrypts a file with the given key.
+    progress(bytes_read) is called as the input is consumed, and digest (a
+    hashlib object) is updated with the plaintext on the same pass.
+    The output is written atomically; buffer_size, durability and dir_syncer
+    are described in cryptora.atomic.
+    Compression is skipped for file types that are already compressed.
+    Stage timings go to `stats` (a cryptora.stats.Stats) or to the hooks.
     """
-    fernet = Fernet(key)
-    with open(file_path, "rb") as file:
-        original = file.read()
-    encrypted = fernet.encrypt(original)
-    with open(file_path + ".enc", "wb") as encrypted_file:
-        encrypted_file.write(encrypted)
+    output_path = output_path or file_path + ".enc"
+    if compression and not compress.worth_compressing(file_path):
+        compression = None
+    with metrics.recording("encrypt", file_path, stats) as stats, open(file_path, "rb") as src:
+        if progress:
+            src = _ProgressReader(src, progress)
+        if digest is not None:
+            src = _HashingReader(src, digest)
+        _write_output(output_path, lambda dst: encrypt_stream(src, dst, key, chunk_size, workers, cipher,
+                                                              envelope, compression, level, stats),
+                      buffer_size, durability, dir_syncer)
+    return output_path
 
-def decrypt_file(file_path, key):
+def decrypt_file(file_path, key, output_path=None, workers=1, progress=None, stats=None,
+                 buffer_size=DEFAULT_BUFFER_SIZE, durability=DEFAULT_DURABILITY, dir_syncer=None):
     """
-    Decrypts an encrypted file with the given key
+    Decrypts an encrypted file with the given key.
+    progress(bytes_read) is called as the input is consumed.
+    The output is written atomically, as for encrypt_file.
+    Stage timings go to `stats` (a cryptora.stats.Stats) or to the hooks.
     """
-    fernet = Fernet(key)
-    with open(file_path, "rb") as enc_file:
-        encrypted = enc_file.read()
-    decrypted = fernet.decrypt(encrypted)
-    new_file_path = file_path.replace(".enc", "_dec")
-    with open(new_file_path, "wb") as dec_file:
-        dec_file.write(decrypted)
+    output_path = output_path or file_path.replace(".enc", "_dec")
+    with metrics.recording("decrypt", file_path, stats) as stats, open(file_path, "rb") as src:
+        if progress:
+            src = _ProgressReader(src, progress)
+        _write_output(output_path, lambda dst: decrypt_stream(src, dst, key, workers, stats),
+                      buffer_size, durability, dir_syncer)
+    return output_path
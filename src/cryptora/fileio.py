@@ -0,0 +1,261 @@
+import io
+import os
+
+from cryptora import encryption
+
+# ---------------- Encrypted Reader ----------------
+class EncryptedReader(io.RawIOBase):
+    """
+    Raw binary stream over an encrypted container that decrypts one chunk at
+    a time as it is read, so only the current chunk is held in memory.
+    Reading straight through streams the chunks in order; when the source is
+    seekable, seek() jumps to any offset by opening just the chunk there.
+    """
+    def __init__(self, src, key, workers=1, closefd=False):
+        super().__init__()
+        self._src = src
+        self._closefd = closefd
+        self._params, legacy = encryption.read_params(src, key)
+        self._offsets = None
+        self._chunk_start = 0
+        self._pos = 0
+        if self._params is None:
+            # A legacy file is decrypted whole, as one chunk
+            self._chunk = legacy
+            self._chunks = None
+        else:
+            self._chunk = b""
+            self._data_start = src.tell() if src.seekable() else None
+            self._chunks = encryption.open_chunks(src, self._params, workers)
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return self._params is None or self._data_start is not None
+
+    def _load(self):
+        """
+        Makes the current chunk cover self._pos, returns False at end of data
+        """
+        while not self._chunk_start <= self._pos < self._chunk_start + len(self._chunk):
+            if self._chunks is not None and self._pos == self._chunk_start + len(self._chunk):
+                chunk = next(self._chunks, None)
+                if chunk is None:
+                    self._stop_chunks()
+                    return False
+                self._chunk_start += len(self._chunk)
+                self._chunk = chunk
+            elif self._params is None:
+                return False
+            else:
+                # Random access after a seek: open only the chunk at self._pos
+                offsets = self._chunk_offsets()
+                index = self._pos // self._params.chunk_size
+                if index >= len(offsets):
+                    return False
+                self._chunk = encryption.read_chunk(self._src, self._params, offsets, index)
+                self._chunk_start = index * self._params.chunk_size
+                # Past the end of a short final chunk
+                return self._pos < self._chunk_start + len(self._chunk)
+        return True
+
+    def _chunk_offsets(self):
+        if self._offsets is None:
+            self._offsets = encryption.chunk_offsets(self._src, self._params, self._data_start)
+        return self._offsets
+
+    def readinto(self, buffer):
+        if not self._load():
+            return 0
+        start = self._pos - self._chunk_start
+        data = self._chunk[start:start + len(buffer)]
+        buffer[:len(data)] = data
+        self._pos += len(data)
+        return len(data)
+
+    def _size(self):
+        if self._params is None:
+            return self._chunk_start + len(self._chunk)
+        offsets = self._chunk_offsets()
+        last = len(offsets) - 1
+        return last * self._params.chunk_size + len(
+            encryption.read_chunk(self._src, self._params, offsets, last))
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if not self.seekable():
+            raise io.UnsupportedOperation("The encrypted source is not seekable")
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence == io.SEEK_END:
+            offset += self._size()
+        elif whence != io.SEEK_SET:
+            raise ValueError(f"Invalid whence: {whence}")
+        if offset < 0:
+            raise ValueError(f"Negative seek position {offset}")
+        if self._params is not None and (offset != self._pos or whence == io.SEEK_END):
+            # Leave sequential mode; chunks are opened by index from now on.
+            # _size() has moved the source under the sequential reader even
+            # when the position is unchanged.
+            self._stop_chunks()
+        self._pos = offset
+        return offset
+
+    def tell(self):
+        return self._pos
+
+    def _stop_chunks(self):
+        # Closing the generator shuts down its worker pool
+        if self._chunks is not None:
+            getattr(self._chunks, "close", lambda: None)()
+            self._chunks = None
+
+    def close(self):
+        if not self.closed:
+            self._stop_chunks()
+            if self._closefd:
+                self._src.close()
+        super().close()
+
+# ---------------- Encrypted Writer ----------------
+class EncryptedWriter(io.RawIOBase):
+    """
+    Raw binary stream that encrypts into the container format as it is
+    written. Plaintext is sealed one chunk at a time; closing the writer
+    seals the final chunk and writes the chunk index, so it must be closed
+    for the output to be a complete container. abort(), or leaving a with
+    block on an exception, closes it without them: readers then report the
+    output as truncated rather than as a complete, shorter file.
+    """
+    def __init__(self, dst, key, chunk_size=encryption.DEFAULT_CHUNK_SIZE, cipher=encryption.DEFAULT_CIPHER,
+                 envelope=False, compression=None, level=None, closefd=False):
+        super().__init__()
+        if cipher not in encryption.CIPHERS:
+            raise ValueError(f"Unknown cipher: {cipher}")
+        self._dst = dst
+        self._closefd = closefd
+        self._key = key
+        self._options = dict(chunk_size=chunk_size, cipher=cipher, envelope=envelope,
+                             compression=compression, level=level)
+        self._chunk_size = chunk_size
+        self._params = None
+        self._pending = bytearray()
+        self._offsets = []
+        self._position = 0
+        self._aborted = False
+
+    def writable(self):
+        return True
+
+    def _seal(self, chunk, final):
+        if self._params is None:
+            # The header is written with the first chunk, which the
+            # compression probe needs to see
+            header, self._params = encryption.new_container(self._key, chunk, **self._options)
+            self._dst.write(header)
+            self._position = len(header)
+        frame = encryption.seal_chunk(self._params, (len(self._offsets), final, chunk))
+        self._offsets.append(self._position)
+        self._dst.write(frame)
+        self._position += len(frame)
+
+    def write(self, data):
+        if self.closed:
+            raise ValueError("write to closed file")
+        self._pending += data
+        # Keep at least one byte back: the last chunk must be flagged final
+        while len(self._pending) > self._chunk_size:
+            self._seal(bytes(self._pending[:self._chunk_size]), False)
+            del self._pending[:self._chunk_size]
+        return len(data)
+
+    def close(self):
+        if self.closed:
+            return
+        try:
+            if not self._aborted:
+                self._seal(bytes(self._pending), True)
+                self._dst.write(encryption.index_trailer(self._offsets, self._position))
+            elif self._params is None:
+                # At least the header, so even an early abort reads as truncated
+                header, self._params = encryption.new_container(self._key, bytes(self._pending), **self._options)
+                self._dst.write(header)
+            self._dst.flush()
+            self._pending.clear()
+        finally:
+            if self._closefd:
+                self._dst.close()
+            super().close()
+
+    def abort(self):
+        """
+        Closes without sealing the final chunk or writing the index
+        """
+        self._aborted = True
+        self.close()
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.abort()
+        return super().__exit__(exc_type, exc, tb)
+
+
+# The layers open_encrypted puts on top of a writer: leaving a with block on
+# an exception aborts the container. Buffered data is dropped, since close()
+# does nothing once the raw writer is closed.
+class _BufferedEncryptedWriter(io.BufferedWriter):
+    def abort(self):
+        self.raw.abort()
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.abort()
+        return super().__exit__(exc_type, exc, tb)
+
+
+class _TextEncryptedWriter(io.TextIOWrapper):
+    def abort(self):
+        self.buffer.abort()
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.abort()
+        return super().__exit__(exc_type, exc, tb)
+
+# ---------------- open() ----------------
+def open_encrypted(file, key, mode="rb", buffering=io.DEFAULT_BUFFER_SIZE, encoding=None, errors=None,
+                   newline=None, workers=1, **options):
+    """
+    Opens an encrypted file (a path or a binary file object) like open().
+
+    Modes are "rb"/"r" to decrypt as the data is read and "wb"/"w" to
+    encrypt as it is written; text modes wrap the stream in a TextIOWrapper.
+    Plaintext is never written to disk:
+
+        with open_encrypted("quotes.json.enc_mykey", key, "r") as f:
+            quotes = json.load(f)
+
+    Options (chunk_size, cipher, envelope, compression, level) apply when
+    writing. A with block left on an exception, or abort(), leaves a
+    writer's output truncated instead of complete.
+    """
+    if mode not in ("r", "rb", "w", "wb"):
+        raise ValueError(f"Invalid mode: {mode}")
+    writing = mode[0] == "w"
+    owned = isinstance(file, (str, bytes, os.PathLike))
+    stream = open(file, "wb" if writing else "rb") if owned else file
+    try:
+        if writing:
+            raw = EncryptedWriter(stream, key, closefd=owned, **options)
+            buffered = _BufferedEncryptedWriter(raw, buffering)
+        else:
+            raw = EncryptedReader(stream, key, workers, closefd=owned)
+            buffered = io.BufferedReader(raw, buffering)
+    except BaseException:
+        if owned:
+            stream.close()
+        raise
+    if "b" in mode:
+        return buffered
+    text = _TextEncryptedWriter if writing else io.TextIOWrapper
+    return text(buffered, encoding=encoding, errors=errors, newline=newline)
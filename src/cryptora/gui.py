@@ -1,13 +1,21 @@
 import os
 import sys
+import time
+import queue
+import base64
 import datetime
+import threading
 from PyQt5.QtWidgets import (
     QApplication, QWidget, QVBoxLayout, QHBoxLayout, QLabel,
-    QPushButton, QLineEdit, QFileDialog, QTextEdit, QCheckBox, QSizePolicy
+    QPushButton, QLineEdit, QFileDialog, QPlainTextEdit, QCheckBox, QSizePolicy,
+    QProgressBar
 )
-from PyQt5.QtGui import QFont, QTextCursor, QTextCharFormat, QColor
-from PyQt5.QtCore import Qt
-from cryptography.fernet import Fernet, InvalidToken
+from PyQt5.QtGui import QFont
+from PyQt5.QtCore import Qt, QObject, QRunnable, QThreadPool, QTimer, pyqtSignal
+
+# The crypto stack (cryptography, cryptora.encryption, cryptora.batch) and
+# the key registry are imported where they are used, so the window opens
+# without loading them.
 
 # ---------------- Paths ----------------
 if getattr(sys, 'frozen', False):
@@ -18,8 +26,11 @@ else:
 KEYS_DIR = os.path.join(BASE_DIR, "keys")
 LOGS_DIR = os.path.join(BASE_DIR, "cryplog")
 
-os.makedirs(KEYS_DIR, exist_ok=True)
-os.makedirs(LOGS_DIR, exist_ok=True)
+# ---------------- Logging ----------------
+LOG_VIEW_LINES = 5000      # the viewer drops its oldest lines past this
+LOG_VIEW_INTERVAL = 100    # ms between viewer refreshes
+LOG_FLUSH_INTERVAL = 0.5   # seconds between log file flushes
+LOG_TAIL_BYTES = 256 * 1024  # "Load Logs" shows only the end of the file
 
 
 # ---------------- Encryption Logic ----------------
@@ -28,8 +39,10 @@ def generate_key_name():
     return f"cryptora_{timestamp}.key"
 
 def save_key():
-    key = Fernet.generate_key()
+    # Same format as Fernet.generate_key(), without loading cryptography
+    key = base64.urlsafe_b64encode(os.urandom(32))
     key_name = generate_key_name()
+    os.makedirs(KEYS_DIR, exist_ok=True)
     key_path = os.path.join(KEYS_DIR, key_name)
     with open(key_path, "wb") as key_file:
         key_file.write(key)
@@ -38,8 +51,146 @@ def save_key():
 def load_key(path):
     if not os.path.exists(path):
         return None
-    with open(path, "rb") as key_file:
-        return key_file.read()
+    from cryptora import encryption
+    return encryption.load_key(path)
+
+def key_registry():
+    from cryptora import keystore
+    return keystore.get_registry(KEYS_DIR)
+
+
+# ---------------- Log Writer ----------------
+class LogWriter:
+    """
+    Appends log lines to files from a background thread. Lines queue up
+    and are written in one batch per file every LOG_FLUSH_INTERVAL seconds,
+    so logging never blocks the UI on disk I/O.
+    """
+    def __init__(self, interval=LOG_FLUSH_INTERVAL):
+        self.interval = interval
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target=self._run, name="cryptora-log-writer", daemon=True)
+        self.thread.start()
+
+    def write(self, path, line):
+        self.queue.put((path, line))
+
+    def flush(self):
+        """
+        Blocks until every line queued so far is on disk
+        """
+        done = threading.Event()
+        self.queue.put(done)
+        done.wait()
+
+    def close(self):
+        self.queue.put(None)
+        self.thread.join()
+
+    def _run(self):
+        running = True
+        while running:
+            items = [self.queue.get()]
+            deadline = time.monotonic() + self.interval
+            while items[-1] is not None and not isinstance(items[-1], threading.Event):
+                try:
+                    items.append(self.queue.get(timeout=max(0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+            lines = {}
+            for item in items:
+                if item is None:
+                    running = False
+                elif not isinstance(item, threading.Event):
+                    lines.setdefault(item[0], []).append(item[1])
+            for path, pending in lines.items():
+                try:
+                    with open(path, "a", encoding="utf-8") as f:
+                        f.write("\n".join(pending) + "\n")
+                except OSError:
+                    pass  # e.g. the log folder was removed; keep the UI going
+            for item in items:
+                if isinstance(item, threading.Event):
+                    item.set()
+
+def read_log_tail(path, max_bytes=LOG_TAIL_BYTES):
+    """
+    Returns (lines, truncated): the last complete lines of a log file that
+    fit in max_bytes, without reading the rest of it
+    """
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        f.seek(max(0, size - max_bytes))
+        data = f.read()
+    truncated = size > max_bytes
+    if truncated:
+        # Drop the partial line the cut landed in
+        data = data.split(b"\n", 1)[-1]
+    return data.decode("utf-8", errors="replace").splitlines(), truncated
+
+
+# ---------------- Background Jobs ----------------
+class JobCancelled(Exception):
+    pass
+
+class JobSignals(QObject):
+    progress = pyqtSignal(int)
+    done = pyqtSignal(object, str)
+
+class CryptoJob(QRunnable):
+    """
+    Encrypts or decrypts one file off the UI thread, reporting progress
+    in percent and a final status message through JobSignals
+    """
+    def __init__(self, action, file_path, key_path):
+        super().__init__()
+        self.setAutoDelete(False)
+        self.action = action
+        self.file_path = file_path
+        self.key_path = key_path
+        self.cancelled = False
+        self.signals = JobSignals()
+
+    def cancel(self):
+        self.cancelled = True
+
+    def report(self, done, total):
+        if self.cancelled:
+            raise JobCancelled
+        self.signals.progress.emit(min(100, done * 100 // total))
+
+    def run(self):
+        from cryptora import batch, encryption
+        # done is always emitted, or the job would stay queued in the UI forever
+        msg = f"🛑 Cancelled → {self.file_path}"
+        try:
+            if self.cancelled:
+                return
+            # The file may have been moved or deleted while the job was queued
+            total = max(os.path.getsize(self.file_path), 1)
+            progress = lambda done: self.report(done, total)
+            key = load_key(self.key_path)
+            if self.action == "encrypt":
+                output_file = batch.encrypted_path(self.file_path, self.key_path)
+                encryption.encrypt_file(self.file_path, key, output_file, progress=progress)
+                msg = f"🔒 Encrypted → {output_file}"
+            else:
+                output_file = batch.decrypted_path(self.file_path)
+                encryption.decrypt_file(self.file_path, key, output_file, progress=progress)
+                msg = f"✅ Decrypted → {output_file}"
+        except JobCancelled:
+            msg = f"🛑 Cancelled → {self.file_path}"
+        except FileNotFoundError as e:
+            msg = f"❌ File not found: {e.filename}"
+        except encryption.CorruptedFileError as e:
+            msg = f"❌ Decryption failed: {e}"
+        except encryption.InvalidToken:
+            msg = "❌ Decryption failed: Incorrect key"
+        except Exception as e:
+            msg = f"❌ Error: {str(e)}"
+        finally:
+            self.signals.done.emit(self, msg)
 
 
 # ---------------- Main UI Class ----------------
@@ -55,7 +206,9 @@ class CryptoraUI(QWidget):
             QPushButton { background-color: #2e2e4e; border: none; padding: 10px 18px; border-radius: 8px; font-size: 11pt; }
             QPushButton:hover { background-color: #4a4aff; }
             QLineEdit { background-color: #2e2e4e; border: 1px solid #444; padding: 8px; border-radius: 6px; color: white; font-size: 11pt; }
-            QTextEdit { background-color: #2e2e4e; border: 1px solid #444; padding: 6px; border-radius: 6px; color: #00ffae; font-size: 11pt; }
+            QPlainTextEdit { background-color: #2e2e4e; border: 1px solid #444; padding: 6px; border-radius: 6px; color: #00ffae; font-size: 11pt; font-weight: bold; }
+            QProgressBar { background-color: #2e2e4e; border: 1px solid #444; border-radius: 6px; text-align: center; color: white; }
+            QProgressBar::chunk { background-color: #4a4aff; border-radius: 6px; }
             QCheckBox { font-size: 10pt; color: #cccccc; }
             QCheckBox::indicator { width: 16px; height: 16px; }
             QCheckBox::indicator:checked { background-color: #4a4aff; border-radius: 3px; }
@@ -69,6 +222,19 @@ class CryptoraUI(QWidget):
         self.key_path = ""
         self.file_path = ""
         self.log_file = None
+        self.log_writer = LogWriter()
+
+        # Status lines are shown in batches, so bursts cost one repaint
+        self.pending_lines = []
+        self.log_timer = QTimer(self)
+        self.log_timer.setSingleShot(True)
+        self.log_timer.setInterval(LOG_VIEW_INTERVAL)
+        self.log_timer.timeout.connect(self.flush_status)
+
+        # Jobs run one at a time in queue order so the progress bar tracks the active one
+        self.jobs = []
+        self.pool = QThreadPool()
+        self.pool.setMaxThreadCount(1)
 
         # ---------- Main Layout ----------
         layout = QVBoxLayout()
@@ -162,13 +328,36 @@ class CryptoraUI(QWidget):
         action_layout.addStretch()
         layout.addLayout(action_layout, stretch=0)
 
+        # ---------- Progress ----------
+        progress_layout = QHBoxLayout()
+        progress_layout.setSpacing(12)
+
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setRange(0, 100)
+        self.progress_bar.setValue(0)
+
+        self.queue_label = QLabel("Idle")
+        self.queue_label.setMinimumWidth(110)
+
+        self.btn_cancel = QPushButton("Cancel")
+        self.btn_cancel.setMinimumWidth(120)
+        self.btn_cancel.setEnabled(False)
+        self.btn_cancel.clicked.connect(self.cancel_jobs)
+        self.btn_cancel.setToolTip("Cancel the running operation and all queued ones.")
+
+        progress_layout.addWidget(self.progress_bar, stretch=2)
+        progress_layout.addWidget(self.queue_label)
+        progress_layout.addWidget(self.btn_cancel)
+        layout.addLayout(progress_layout, stretch=0)
+
         # ---------- Log Viewer Label ----------
         log_label = QLabel("Log Viewer :")
         layout.addWidget(log_label, stretch=0)
 
         # ---------- Status Log ----------
-        self.status_label = QTextEdit()
+        self.status_label = QPlainTextEdit()
         self.status_label.setReadOnly(True)
+        self.status_label.setMaximumBlockCount(LOG_VIEW_LINES)
         self.status_label.setMinimumHeight(120)
         layout.addWidget(self.status_label, stretch=3)
 
@@ -205,6 +394,7 @@ class CryptoraUI(QWidget):
         log_filename = f"log_{today}.txt"
         log_path = os.path.join(LOGS_DIR, log_filename)
         if state == Qt.Checked:
+            os.makedirs(LOGS_DIR, exist_ok=True)
             self.log_file = log_path
             if not os.path.exists(self.log_file):
                 with open(self.log_file, "w", encoding="utf-8") as f:
@@ -219,19 +409,23 @@ class CryptoraUI(QWidget):
         log_filename = f"log_{today}.txt"
         log_path = os.path.join(LOGS_DIR, log_filename)
         if os.path.exists(log_path):
-            with open(log_path, "r", encoding="utf-8") as f:
-                content = f.read()
-            self.status_label.setPlainText(content)
-            self.update_status(f"📂 Loaded logs from {log_path}", save_to_file=False)
+            self.log_writer.flush()
+            lines, truncated = read_log_tail(log_path)
+            self.pending_lines.clear()
+            self.status_label.setPlainText("\n".join(lines[-LOG_VIEW_LINES:]))
+            shown = "last " if truncated or len(lines) > LOG_VIEW_LINES else ""
+            self.update_status(f"📂 Loaded {shown}{min(len(lines), LOG_VIEW_LINES)} lines from {log_path}",
+                               save_to_file=False)
         else:
             self.update_status("⚠️ No logs available for today.", save_to_file=False)
 
     def clear_logs(self):
+        self.pending_lines.clear()
         self.status_label.clear()
         self.update_status("🧹 Logs cleared", save_to_file=False)
 
     def list_keys(self):
-        keys = [f for f in os.listdir(KEYS_DIR) if f.endswith(".key")]
+        keys = key_registry().names()
         if keys:
             self.update_status("🔑 Available keys:", save_to_file=False)
             for k in keys:
@@ -244,25 +438,29 @@ class CryptoraUI(QWidget):
         timestamp = datetime.datetime.now().strftime("[%H:%M:%S]")
         log_line = f"{timestamp} {msg}"
 
-        cursor = self.status_label.textCursor()
-        cursor.movePosition(QTextCursor.End)
-        highlight_format = QTextCharFormat()
-        highlight_format.setForeground(QColor("#00ffae"))
-        highlight_format.setFontWeight(QFont.Bold)
-        cursor.insertText("\n" + log_line, highlight_format)
-        self.status_label.setTextCursor(cursor)
-        self.status_label.ensureCursorVisible()
+        self.pending_lines.append(log_line)
+        if not self.log_timer.isActive():
+            self.log_timer.start()
 
         if self.log_file and save_to_file:
-            with open(self.log_file, "a", encoding="utf-8") as f:
-                f.write(log_line + "\n")
+            self.log_writer.write(self.log_file, log_line)
+
+    def flush_status(self):
+        if not self.pending_lines:
+            return
+        # Only the newest lines can survive the viewer's block limit
+        lines = self.pending_lines[-LOG_VIEW_LINES:]
+        self.pending_lines.clear()
+        self.status_label.appendPlainText("\n".join(lines))
+        scroll_bar = self.status_label.verticalScrollBar()
+        scroll_bar.setValue(scroll_bar.maximum())
 
     def check_initial_status(self):
-        keys = [f for f in os.listdir(KEYS_DIR) if f.endswith(".key")]
+        registry = key_registry()
+        keys = registry.names()
         if keys:
             self.update_status(f"🔑 {len(keys)} key(s) found. Ready to use.", save_to_file=False)
-            latest_key = max(keys, key=lambda f: os.path.getctime(os.path.join(KEYS_DIR, f)))
-            self.key_entry.setText(os.path.join(KEYS_DIR, latest_key))
+            self.key_entry.setText(registry.latest_path() or registry.path(keys[-1]))
         else:
             self.update_status("⚠️ No keys found. Generate a key to get started.", save_to_file=False)
 
@@ -295,18 +493,7 @@ class CryptoraUI(QWidget):
         if ".enc_" in file_path:
             self.update_status("⚠️ File already encrypted", save_to_file=False)
             return
-        try:
-            key = load_key(key_path)
-            f = Fernet(key)
-            with open(file_path, "rb") as file:
-                encrypted = f.encrypt(file.read())
-            key_name = os.path.splitext(os.path.basename(key_path))[0]
-            output_file = file_path + f".enc_{key_name}"
-            with open(output_file, "wb") as file:
-                file.write(encrypted)
-            self.update_status(f"🔒 Encrypted → {output_file}")
-        except Exception as e:
-            self.update_status(f"❌ Error: {str(e)}")
+        self.start_job("encrypt", file_path, key_path)
 
     def decrypt_file(self):
         file_path = self.file_entry.text().strip()
@@ -314,30 +501,60 @@ class CryptoraUI(QWidget):
         if not os.path.exists(file_path):
             self.update_status("❌ Invalid file", save_to_file=False)
             return
+        from cryptora import batch
+        if not batch.is_encrypted_file(file_path):
+            self.update_status("⚠️ Not an encrypted file", save_to_file=False)
+            return
+        header_key = key_registry().find_key_path(file_path)
+        if header_key and os.path.abspath(header_key) != os.path.abspath(key_path):
+            self.update_status(f"🔑 Using key from file header → {header_key}", save_to_file=False)
+            key_path = header_key
         if not os.path.exists(key_path):
             self.update_status("❌ Invalid key", save_to_file=False)
             return
-        if ".enc_" not in file_path:
-            self.update_status("⚠️ Not an encrypted file", save_to_file=False)
-            return
-        try:
-            key = load_key(key_path)
-            f = Fernet(key)
-            with open(file_path, "rb") as file:
-                decrypted = f.decrypt(file.read())
-            output_file = file_path.split(".enc_")[0]
-            with open(output_file, "wb") as file:
-                file.write(decrypted)
-            self.update_status(f"✅ Decrypted → {output_file}")
-        except InvalidToken:
-            self.update_status("❌ Decryption failed: Incorrect key")
-        except Exception as e:
-            self.update_status(f"❌ Error: {str(e)}")
+        self.start_job("decrypt", file_path, key_path)
+
+    # ---------------- Job Queue ----------------
+    def start_job(self, action, file_path, key_path):
+        job = CryptoJob(action, file_path, key_path)
+        job.signals.progress.connect(self.progress_bar.setValue)
+        job.signals.done.connect(self.job_done)
+        self.jobs.append(job)
+        self.pool.start(job)
+        self.update_queue_status()
+        self.update_status(f"⏳ Queued {action} → {file_path}", save_to_file=False)
+
+    def job_done(self, job, msg):
+        self.jobs.remove(job)
+        self.update_status(msg)
+        self.progress_bar.setValue(0)
+        self.update_queue_status()
+
+    def cancel_jobs(self):
+        for job in self.jobs:
+            job.cancel()
+
+    def update_queue_status(self):
+        pending = len(self.jobs)
+        self.btn_cancel.setEnabled(pending > 0)
+        if pending:
+            self.queue_label.setText(f"{pending} job(s)")
+        else:
+            self.queue_label.setText("Idle")
+
+    def closeEvent(self, event):
+        self.cancel_jobs()
+        self.pool.waitForDone()
+        self.log_writer.close()
+        super().closeEvent(event)
 
 
 # ---------------- Run ----------------
-if __name__ == "__main__":
+def main():
     app = QApplication(sys.argv)
     window = CryptoraUI()
     window.show()
     sys.exit(app.exec_())
+
+if __name__ == "__main__":
+    main()
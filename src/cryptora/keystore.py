@@ -0,0 +1,199 @@
+import os
+import re
+import json
+import datetime
+import threading
+
+from cryptora.constants import ENC_MARKER
+
+INDEX_NAME = "index.json"
+INDEX_VERSION = 1
+
+# Retired keys still decrypt (and rotate away from), but are never picked
+# as the latest key for new files. rotate --retire retires the keys it
+# rotated away from, once every file was rotated.
+KEY_STATUSES = ("active", "retired")
+
+_KEY_NAME = re.compile(r"cryptora_(\d{8}_\d{6})\.key$")
+
+# ---------------- Key Registry ----------------
+class KeyRegistry:
+    """
+    In-memory index of the keys in a keys folder.
+
+    Each key's id (fingerprint), creation time and status are kept in
+    `index.json` next to the keys, so key files are read only once. The
+    in-memory copy is refreshed only when the folder's mtime changes, which
+    happens whenever a key file is added, removed or renamed.
+    """
+    def __init__(self, keys_dir):
+        self.keys_dir = keys_dir
+        self.index_path = os.path.join(keys_dir, INDEX_NAME)
+        self._lock = threading.RLock()
+        self._mtime = None
+        self._entries = {}
+        self._by_id = {}
+        self._keys = {}
+
+    # ---------- Index ----------
+    def _load_index(self):
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                index = json.load(f)
+            if index.get("version") == INDEX_VERSION:
+                return index.get("keys", {})
+        except (OSError, ValueError):
+            pass
+        return {}
+
+    def _save_index(self):
+        tmp_path = self.index_path + ".tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"version": INDEX_VERSION, "keys": self._entries}, f, indent=1, sort_keys=True)
+            os.replace(tmp_path, self.index_path)
+        except OSError:
+            # Read-only keys folder: keep the index in memory only
+            pass
+
+    def _describe(self, name):
+        path = os.path.join(self.keys_dir, name)
+        match = _KEY_NAME.match(name)
+        if match:
+            created = datetime.datetime.strptime(match.group(1), "%Y%m%d_%H%M%S")
+        else:
+            created = datetime.datetime.fromtimestamp(os.path.getctime(path))
+        from cryptora import encryption
+        with open(path, "rb") as f:
+            kid = encryption.key_id(f.read())
+        return {"id": kid.hex(), "created": created.isoformat(), "status": "active"}
+
+    def refresh(self):
+        """
+        Re-syncs the index with the folder if its mtime changed
+        """
+        with self._lock:
+            try:
+                mtime = os.stat(self.keys_dir).st_mtime_ns
+            except FileNotFoundError:
+                mtime = None
+            if mtime == self._mtime:
+                return
+            names = set()
+            if mtime is not None:
+                names = {f for f in os.listdir(self.keys_dir) if f.endswith(".key")}
+
+            entries = self._entries or self._load_index()
+            changed = set(entries) != names
+            entries = {name: entry for name, entry in entries.items() if name in names}
+            for name in names - set(entries):
+                try:
+                    entries[name] = self._describe(name)
+                except OSError:
+                    continue
+            self._entries = entries
+            self._by_id = {entry["id"]: name for name, entry in entries.items()}
+            self._keys = {path: key for path, key in self._keys.items()
+                          if os.path.basename(path) in entries}
+            if changed:
+                self._save_index()
+                try:
+                    mtime = os.stat(self.keys_dir).st_mtime_ns
+                except OSError:
+                    pass
+            self._mtime = mtime
+
+    # ---------- Queries ----------
+    def entries(self):
+        """
+        Returns [(name, entry)] ordered from oldest to newest key
+        """
+        self.refresh()
+        with self._lock:
+            return sorted(self._entries.items(), key=lambda item: (item[1]["created"], item[0]))
+
+    def names(self):
+        return [name for name, _ in self.entries()]
+
+    def path(self, name):
+        return os.path.join(self.keys_dir, name)
+
+    def latest_path(self):
+        """
+        Path of the newest active key, or None
+        """
+        active = [name for name, entry in self.entries() if entry["status"] == "active"]
+        return self.path(active[-1]) if active else None
+
+    def path_for_id(self, kid):
+        """
+        Path of the key with the given id (bytes or hex), or None
+        """
+        self.refresh()
+        if isinstance(kid, bytes):
+            kid = kid.hex()
+        with self._lock:
+            name = self._by_id.get(kid)
+        return self.path(name) if name else None
+
+    def find_key_path(self, file_path):
+        """
+        Finds the key for an encrypted file: by the key id in its header,
+        then by the `.enc_<keyname>` filename suffix
+        """
+        from cryptora import encryption
+        try:
+            with open(file_path, "rb") as f:
+                kid = encryption.read_key_id(f)
+        except (OSError, encryption.InvalidToken):
+            kid = None
+        if kid:
+            path = self.path_for_id(kid)
+            if path:
+                return path
+        if ENC_MARKER in file_path:
+            path = self.path(file_path.rsplit(ENC_MARKER, 1)[1] + ".key")
+            if os.path.exists(path):
+                return path
+        return None
+
+    def load(self, key_path):
+        """
+        Returns the key bytes for key_path, read from disk only once
+        """
+        with self._lock:
+            key = self._keys.get(key_path)
+            if key is None:
+                with open(key_path, "rb") as f:
+                    key = f.read()
+                self._keys[key_path] = key
+            return key
+
+    def set_status(self, name, status):
+        """
+        Marks a key (by file name) active or retired in the index. Names
+        not in the keys folder are ignored.
+        """
+        if status not in KEY_STATUSES:
+            raise ValueError(f"Unknown key status: {status}")
+        self.refresh()
+        with self._lock:
+            if name not in self._entries or self._entries[name]["status"] == status:
+                return
+            self._entries[name]["status"] = status
+            self._save_index()
+            self._mtime = os.stat(self.keys_dir).st_mtime_ns
+
+
+_registries = {}
+_registries_lock = threading.Lock()
+
+def get_registry(keys_dir):
+    """
+    Returns the shared KeyRegistry for a keys folder
+    """
+    keys_dir = os.path.abspath(keys_dir)
+    with _registries_lock:
+        if keys_dir not in _registries:
+            _registries[keys_dir] = KeyRegistry(keys_dir)
+        return _registries[keys_dir]
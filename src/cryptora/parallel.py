@@ -0,0 +1,41 @@
+import itertools
+import os
+from collections import deque
+
+# ---------------- Parallel Engine ----------------
+def default_workers():
+    """
+    Number of worker processes to use when none is given
+    """
+    return os.cpu_count() or 1
+
+def ordered_map(func, items, workers=1, window=None):
+    """
+    Maps func over items on a process pool and yields the results in input
+    order. At most `window` items (default 2 per worker) are in flight or
+    waiting in the reorder buffer, so memory stays capped however long the
+    input is. With one worker, or a single item, everything runs in the
+    calling process: the pool only starts once a second item exists.
+    """
+    items = iter(items)
+    head = list(itertools.islice(items, 2)) if workers > 1 else []
+    if workers <= 1 or len(head) < 2:
+        yield from map(func, head)
+        yield from map(func, items)
+        return
+
+    # Imported here: the process pool machinery is slow to load
+    from concurrent.futures import ProcessPoolExecutor
+
+    window = window or 2 * workers
+    pool = ProcessPoolExecutor(max_workers=workers)
+    pending = deque()
+    try:
+        for item in itertools.chain(head, items):
+            pending.append(pool.submit(func, item))
+            if len(pending) >= window:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,209 @@
+import os
+import json
+import time
+import signal
+import socket
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from cryptora import encryption
+from cryptora.client import BLOCK_SIZE, FRAME
+from cryptora.constants import DEFAULT_CIPHER
+
+# ---------------- Service ----------------
+# One warm process serves encrypt/decrypt requests over a Unix socket (see
+# cryptora.client for the protocol). Keys are read once and kept in memory
+# by the key registry. Each request streams through encrypt_stream or
+# decrypt_stream on a worker thread, bridged to the event loop, so memory
+# per request stays at a few chunks and a slow client only holds its own
+# thread. At most max_requests run at once; the rest wait their turn.
+
+DEFAULT_MAX_REQUESTS = 4
+
+
+class _SocketReader:
+    """
+    Blocking read() for a worker thread, served by the event loop's reader
+    """
+    def __init__(self, loop, reader):
+        self.loop = loop
+        self.reader = reader
+
+    async def _read(self, size):
+        # Fill the whole request on the loop side: one thread hop per chunk
+        if size < 0:
+            return await self.reader.read()
+        try:
+            return await self.reader.readexactly(size)
+        except asyncio.IncompleteReadError as e:
+            return e.partial
+
+    def read(self, size=-1):
+        return asyncio.run_coroutine_threadsafe(self._read(size), self.loop).result()
+
+
+class _SocketWriter:
+    """
+    Blocking write() for a worker thread: output is sent as frames of up to
+    BLOCK_SIZE, waiting for the client to keep up
+    """
+    def __init__(self, loop, writer):
+        self.loop = loop
+        self.writer = writer
+        self.buffer = bytearray()
+        self.sent_key = False
+
+    async def _send(self, data):
+        self.writer.write(data)
+        await self.writer.drain()
+
+    def send(self, data):
+        asyncio.run_coroutine_threadsafe(self._send(data), self.loop).result()
+
+    def write(self, data):
+        self.buffer += data
+        if len(self.buffer) >= BLOCK_SIZE:
+            self.flush()
+        return len(data)
+
+    def flush(self):
+        if self.buffer:
+            self.send(FRAME.pack(len(self.buffer)) + bytes(self.buffer))
+            self.buffer.clear()
+
+
+def _reply(message):
+    return json.dumps(message).encode() + b"\n"
+
+
+class Service:
+    def __init__(self, registry, socket_path, max_requests=DEFAULT_MAX_REQUESTS):
+        self.registry = registry
+        self.socket_path = socket_path
+        self.max_requests = max_requests
+        self.pool = ThreadPoolExecutor(max_workers=max_requests, thread_name_prefix="cryptora-serve")
+        self.limit = None
+
+    def _key_path(self, request, src):
+        """
+        Resolves the request's key: a path given by the client, else for
+        decryption the key named in the header (or the `.enc_<key>` name the
+        client saw), else the newest key
+        """
+        if request.get("key"):
+            return request["key"], src
+        if request["op"] == "decrypt":
+            src = encryption.ReplayReader(src)
+            kid = encryption.read_key_id(src)
+            src.rewind()
+            key_path = kid and self.registry.path_for_id(kid)
+            if not key_path and request.get("key_name"):
+                key_path = self.registry.path(request["key_name"] + ".key")
+                key_path = key_path if os.path.exists(key_path) else None
+            if key_path:
+                return key_path, src
+        return self.registry.latest_path(), src
+
+    def _run(self, request, src, dst):
+        """
+        Runs one request on a worker thread
+        """
+        key_path, src = self._key_path(request, src)
+        if not key_path or not os.path.exists(key_path):
+            raise FileNotFoundError("Key not found")
+        key = self.registry.load(key_path)
+        dst.send(_reply({"key": os.path.basename(key_path)}))
+        dst.sent_key = True
+        if request["op"] == "encrypt":
+            encryption.encrypt_stream(src, dst, key, cipher=request.get("cipher") or DEFAULT_CIPHER,
+                                      envelope=bool(request.get("envelope")),
+                                      compression=request.get("compression"), level=request.get("level"))
+        else:
+            encryption.decrypt_stream(src, dst, key)
+        dst.flush()
+
+    async def handle(self, reader, writer):
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        op = "?"
+        dst = _SocketWriter(loop, writer)
+        try:
+            request = json.loads(await reader.readline())
+            op = request.get("op")
+            if op == "ping":
+                await dst._send(_reply({"ok": True, "pid": os.getpid(), "max_requests": self.max_requests}))
+                return
+            if op not in ("encrypt", "decrypt"):
+                raise ValueError(f"Unknown operation: {op}")
+            async with self.limit:
+                await loop.run_in_executor(self.pool, self._run, request, _SocketReader(loop, reader), dst)
+            await dst._send(FRAME.pack(0) + _reply({"ok": True}))
+            print(f"[ok] {op} in {time.perf_counter() - start:.3f}s", flush=True)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            print(f"[failed] {op}: client disconnected", flush=True)
+        except Exception as e:
+            if isinstance(e, encryption.CorruptedFileError):
+                message = f"{op.capitalize()}ion failed: {e}"
+            elif isinstance(e, encryption.InvalidToken):
+                message = f"{op.capitalize()}ion failed: Incorrect key for this file."
+            else:
+                message = f"{op.capitalize()}ion error: {str(e)}"
+            print(f"[failed] {message}", flush=True)
+            try:
+                # Before the key line the error replaces it; after, it ends the output
+                if dst.sent_key:
+                    await dst._send(FRAME.pack(0) + _reply({"ok": False, "error": message}))
+                else:
+                    await dst._send(_reply({"error": message}))
+            except ConnectionError:
+                pass
+        finally:
+            writer.close()
+
+    async def serve(self):
+        self.limit = asyncio.Semaphore(self.max_requests)
+        # Anyone who can connect can use the keys: the socket is owner only
+        # from the moment it exists
+        umask = os.umask(0o177)
+        try:
+            server = await asyncio.start_unix_server(self.handle, path=self.socket_path, limit=BLOCK_SIZE)
+        finally:
+            os.umask(umask)
+        print(f"Serving on {self.socket_path} ({self.max_requests} requests at a time, keys from "
+              f"{self.registry.keys_dir}). Press Ctrl+C to stop.", flush=True)
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(signum, stop.set)
+        async with server:
+            await stop.wait()
+        # Requests in flight need the loop to finish: wait for them off it
+        await loop.run_in_executor(None, self.pool.shutdown)
+
+def _remove_stale_socket(socket_path):
+    """
+    Removes a socket file left by a service that is no longer running.
+    Raises if a service is still listening on it.
+    """
+    if not os.path.exists(socket_path):
+        return
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(socket_path)
+    except OSError:
+        os.remove(socket_path)
+        return
+    finally:
+        probe.close()
+    raise OSError(f"A service is already listening on {socket_path}")
+
+def serve(registry, socket_path, max_requests=DEFAULT_MAX_REQUESTS):
+    """
+    Runs the service until SIGINT or SIGTERM
+    """
+    _remove_stale_socket(socket_path)
+    try:
+        asyncio.run(Service(registry, socket_path, max_requests).serve())
+    finally:
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
@@ -0,0 +1,172 @@
+import sys
+import time
+import threading
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Pipeline stages, in the order they are reported
+STAGES = ("read", "compress", "encrypt", "decrypt", "decompress", "write")
+
+# ---------------- Hooks ----------------
+_hooks = []
+
+def add_hook(hook):
+    """
+    Registers hook(report) to be called with the report of every finished
+    operation, e.g. to export metrics. While any hook is registered the
+    encryption functions record stats even when none are passed in.
+    """
+    _hooks.append(hook)
+
+def remove_hook(hook):
+    _hooks.remove(hook)
+
+@contextmanager
+def recording(operation, path=None, stats=None):
+    """
+    Records one file operation: yields the Stats given, a new one when hooks
+    are registered, or None so unmetered calls pay nothing. The file is
+    counted as ok or failed, and a Stats created here is finished here.
+    """
+    owned = stats is None and bool(_hooks)
+    if owned:
+        stats = Stats(operation, path)
+    ok = False
+    try:
+        yield stats
+        ok = True
+    finally:
+        if stats is not None:
+            stats.count_file(ok)
+            if owned:
+                stats.finish()
+
+def peak_rss_mb(who="self"):
+    """
+    Peak resident memory of this process (or its reaped children) in MB,
+    None where the platform cannot tell
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF if who == "self" else resource.RUSAGE_CHILDREN).ru_maxrss
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    return round(peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024, 1)
+
+# ---------------- Stats ----------------
+class Stats:
+    """
+    Byte counters and timers per pipeline stage for one operation (or one
+    batch of them; it is safe to share across threads).
+
+    Stages are those in STAGES.
+    AEAD ciphers check the tag while they decrypt, so authentication is
+    timed as part of decrypt. With several workers the cipher stages add
+    up time across processes and can exceed the wall time.
+    """
+    def __init__(self, operation, path=None):
+        self.operation = operation
+        self.path = path
+        self.files = 0
+        self.errors = 0
+        self.stages = {}
+        self._lock = threading.Lock()
+        self._start = time.perf_counter()
+        self._seconds = None
+
+    def add(self, stage, nbytes, seconds):
+        with self._lock:
+            entry = self.stages.setdefault(stage, [0, 0.0, 0])
+            entry[0] += nbytes
+            entry[1] += seconds
+            entry[2] += 1
+
+    def count_file(self, ok=True):
+        with self._lock:
+            self.files += 1
+            self.errors += not ok
+
+    def reader(self, stream):
+        return _MeteredReader(stream, self)
+
+    def writer(self, stream):
+        return _MeteredWriter(stream, self)
+
+    def report(self):
+        seconds = self._seconds if self._seconds is not None else time.perf_counter() - self._start
+        with self._lock:
+            stages = {
+                name: {
+                    "bytes": nbytes,
+                    "seconds": round(busy, 6),
+                    "calls": calls,
+                    "mb_s": round(nbytes / (1024 * 1024) / busy, 3) if busy else None,
+                }
+                for name, (nbytes, busy, calls) in sorted(
+                    self.stages.items(), key=lambda item: STAGES.index(item[0]) if item[0] in STAGES else len(STAGES))
+            }
+            files, errors = self.files, self.errors
+        processed = stages.get("read", {}).get("bytes", 0)
+        return {
+            "operation": self.operation,
+            "path": self.path,
+            "files": files,
+            "errors": errors,
+            "bytes": processed,
+            "seconds": round(seconds, 6),
+            "mb_s": round(processed / (1024 * 1024) / seconds, 3) if seconds else None,
+            "stages": stages,
+            "peak_rss_mb": peak_rss_mb(),
+            "peak_children_rss_mb": peak_rss_mb("children"),
+        }
+
+    def finish(self):
+        """
+        Stops the clock and passes the report to every hook. A failing
+        hook is skipped: exporting metrics must never fail the job.
+        """
+        if self._seconds is None:
+            self._seconds = time.perf_counter() - self._start
+        report = self.report()
+        for hook in list(_hooks):
+            try:
+                hook(report)
+            except Exception:
+                pass
+        return report
+
+
+class _MeteredReader:
+    """
+    Times reads from a binary stream into the "read" stage
+    """
+    def __init__(self, stream, stats):
+        self.stream = stream
+        self.stats = stats
+
+    def read(self, size=-1):
+        start = time.perf_counter()
+        data = self.stream.read(size)
+        self.stats.add("read", len(data), time.perf_counter() - start)
+        return data
+
+
+class _MeteredWriter:
+    """
+    Times writes to a binary stream into the "write" stage
+    """
+    def __init__(self, stream, stats):
+        self.stream = stream
+        self.stats = stats
+
+    def write(self, data):
+        start = time.perf_counter()
+        written = self.stream.write(data)
+        self.stats.add("write", len(data), time.perf_counter() - start)
+        return written
+
+    def flush(self):
+        self.stream.flush()
@@ -0,0 +1,180 @@
+import os
+import json
+import time
+import hashlib
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from cryptora import batch, encryption
+from cryptora.atomic import DEFAULT_BUFFER_SIZE, DEFAULT_DURABILITY, DirSyncer, atomic_output
+from cryptora.constants import ENC_MARKER
+
+MANIFEST_NAME = ".cryptora-sync.json"
+MANIFEST_VERSION = 1
+HASH_BUFFER = 1024 * 1024
+
+# ---------------- Manifest ----------------
+# The manifest lives in the destination folder and maps each source file
+# (relative path) to what was last encrypted from it:
+#
+#   size, mtime_ns, sha256          the source as it was encrypted
+#   output, output_size, output_mtime_ns
+#                                   the ciphertext produced (relative path)
+#
+# plus the settings (key id, cipher, compression, ...) of the run. A file
+# whose size and mtime match, and whose output is still there untouched, is
+# skipped with two stat() calls. A file whose mtime changed but whose size
+# did not is hashed first, so touching a file does not re-encrypt it.
+
+def load_manifest(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest.get("version") == MANIFEST_VERSION:
+            return manifest
+    except (OSError, ValueError):
+        pass
+    return {"version": MANIFEST_VERSION, "settings": None, "files": {}}
+
+def save_manifest(path, manifest, durability=DEFAULT_DURABILITY, dir_syncer=None):
+    with atomic_output(path, durability=durability, dir_syncer=dir_syncer) as f:
+        f.write(json.dumps(manifest, indent=1, sort_keys=True).encode())
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while True:
+            block = f.read(HASH_BUFFER)
+            if not block:
+                break
+            digest.update(block)
+    return digest.hexdigest()
+
+def _source_files(src_dir):
+    """
+    Relative paths of the files to sync, by name only: nothing is opened, so
+    a re-run costs one stat() per file. Outputs and the manifest (with its
+    temp files) are left out.
+    """
+    for root, dirs, files in os.walk(src_dir):
+        dirs.sort()
+        for name in sorted(files):
+            path = os.path.join(root, name)
+            if ENC_MARKER in name or MANIFEST_NAME in name:
+                continue
+            yield os.path.relpath(path, src_dir).replace(os.sep, "/")
+
+def _output_intact(dest_dir, entry):
+    try:
+        stat = os.stat(os.path.join(dest_dir, entry["output"]))
+    except OSError:
+        return False
+    return stat.st_size == entry["output_size"] and stat.st_mtime_ns == entry["output_mtime_ns"]
+
+# ---------------- Sync ----------------
+def _encrypt(src_path, dest_dir, rel, key, key_path, stats, output_options, options):
+    output = batch.encrypted_path(os.path.join(dest_dir, *rel.split("/")), key_path)
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    source = os.stat(src_path)
+    digest = hashlib.sha256()
+    encryption.encrypt_file(src_path, key, output, stats=stats, digest=digest, **output_options, **options)
+    written = os.stat(output)
+    return {
+        "size": source.st_size,
+        "mtime_ns": source.st_mtime_ns,
+        "sha256": digest.hexdigest(),
+        "output": os.path.relpath(output, dest_dir).replace(os.sep, "/"),
+        "output_size": written.st_size,
+        "output_mtime_ns": written.st_mtime_ns,
+    }
+
+def _remove_output(dest_dir, entry):
+    path = os.path.join(dest_dir, *entry["output"].split("/"))
+    if os.path.exists(path):
+        os.remove(path)
+
+def sync_folder(src_dir, key, key_path, dest_dir=None, delete=False, workers=None, stats=None,
+                buffer_size=DEFAULT_BUFFER_SIZE, durability=DEFAULT_DURABILITY, **options):
+    """
+    Encrypts new and modified files under src_dir into dest_dir (default:
+    next to the sources), skipping files unchanged since the last sync.
+    With delete, outputs whose source is gone are removed. Options (cipher,
+    envelope, compression, ...) are passed to encryption.encrypt_file; a
+    change of key or options re-encrypts everything. Outputs and the
+    manifest are written atomically, with folders fsynced once at the end
+    for durability "dir".
+    Prints one line per changed file and returns a Counter of statuses.
+    """
+    start = time.perf_counter()
+    dest_dir = dest_dir or src_dir
+    manifest_path = os.path.join(dest_dir, MANIFEST_NAME)
+    manifest = load_manifest(manifest_path)
+    settings = dict(options, key_id=encryption.key_id(key).hex())
+    if manifest["settings"] != settings:
+        manifest["settings"] = settings
+        stale = manifest["files"]
+        manifest["files"] = {}
+    else:
+        stale = {}
+    entries = manifest["files"]
+
+    syncer = DirSyncer()
+    output = dict(buffer_size=buffer_size, durability=durability, dir_syncer=syncer)
+    counts = Counter()
+    changed = []
+    seen = set()
+    for rel in _source_files(src_dir):
+        seen.add(rel)
+        src_path = os.path.join(src_dir, *rel.split("/"))
+        entry = entries.get(rel)
+        try:
+            source = os.stat(src_path)
+        except OSError:
+            continue
+        if entry and _output_intact(dest_dir, entry) and entry["size"] == source.st_size:
+            if entry["mtime_ns"] == source.st_mtime_ns:
+                counts["unchanged"] += 1
+                continue
+            if file_hash(src_path) == entry["sha256"]:
+                entry["mtime_ns"] = source.st_mtime_ns
+                counts["unchanged"] += 1
+                continue
+        changed.append(rel)
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            jobs = {rel: pool.submit(_encrypt, os.path.join(src_dir, *rel.split("/")), dest_dir, rel,
+                                     key, key_path, stats, output, options) for rel in changed}
+            for rel, job in jobs.items():
+                try:
+                    entry = job.result()
+                except Exception as e:
+                    counts["failed"] += 1
+                    print(f"[failed] {rel} -> {e}")
+                    continue
+                old = entries.get(rel) or stale.pop(rel, None)
+                if old and old["output"] != entry["output"]:
+                    _remove_output(dest_dir, old)
+                entries[rel] = entry
+                counts["ok"] += 1
+                print(f"[ok] {rel} -> {entry['output']}")
+
+        # Outputs encrypted under old settings are replaced by the new ones
+        # above; any left belong to sources that are gone
+        gone = {rel: entries.pop(rel) for rel in list(entries) if rel not in seen}
+        gone.update((rel, entry) for rel, entry in stale.items() if rel not in seen)
+        for rel, entry in gone.items():
+            if delete:
+                _remove_output(dest_dir, entry)
+                counts["deleted"] += 1
+                print(f"[deleted] {entry['output']} (source removed)")
+            else:
+                entries[rel] = entry
+    finally:
+        save_manifest(manifest_path, manifest, durability, syncer)
+        syncer.sync()
+
+    elapsed = time.perf_counter() - start
+    print(f"Synced {counts['ok']} file(s), {counts['unchanged']} unchanged, {counts['deleted']} deleted, "
+          f"{counts['failed']} failed in {elapsed:.2f}s")
+    return counts
@@ -0,0 +1,106 @@
+import os
+import time
+from collections import Counter, namedtuple
+
+from cryptora import encryption
+from cryptora.parallel import ordered_map
+
+VerifyResult = namedtuple("VerifyResult", ["path", "status", "detail", "bytes", "seconds"])
+
+# Every file ends up in exactly one of these. "wrong-key" needs the key id a
+# container header records; legacy Fernet files (and containers written
+# before key ids) cannot tell a wrong key from altered data, so both report
+# "corrupt", with a detail saying which it may be.
+STATUSES = ("ok", "corrupt", "truncated", "wrong-key", "missing-key", "error")
+
+# ---------------- Verification ----------------
+def verify_one(item, chunk_workers=1):
+    """
+    Verifies item = (path, key), returns a VerifyResult instead of raising.
+    Runs in a worker process when files are verified in parallel.
+    """
+    path, key = item
+    start = time.perf_counter()
+    try:
+        checked = encryption.verify_file(path, key, chunk_workers)
+        status, detail = "ok", "Intact"
+    except encryption.TruncatedFileError as e:
+        checked, status, detail = 0, "truncated", str(e)
+    except encryption.WrongKeyError as e:
+        checked, status, detail = 0, "wrong-key", str(e)
+    except encryption.CorruptedFileError as e:
+        checked, status, detail = 0, "corrupt", str(e)
+    except encryption.InvalidToken:
+        # With a key id in the header the key was right, so the data was
+        # altered; without one it may just be the wrong key
+        checked, status, detail = 0, "corrupt", "Authentication failed"
+        if not _has_key_id(path):
+            detail += ": wrong key or altered data (the file records no key id)"
+    except Exception as e:
+        checked, status, detail = 0, "error", str(e)
+    return VerifyResult(path, status, detail, checked, round(time.perf_counter() - start, 6))
+
+def _has_key_id(path):
+    try:
+        with open(path, "rb") as f:
+            return encryption.read_key_id(f) is not None
+    except Exception:
+        return False
+
+def verify_files(files, key=None, registry=None, workers=1, stats=None, progress=None):
+    """
+    Authenticates files without writing any plaintext and returns their
+    VerifyResults in input order. Without a key, each file's key is looked up in
+    the registry. Files are spread over `workers` processes (one file is
+    split into chunks across them instead), so all cores are used whatever
+    the cipher. progress(result) is called as each file finishes.
+    """
+    results = [None] * len(files)
+    jobs = []
+    slots = []
+    for slot, path in enumerate(files):
+        file_key = key
+        if not os.path.isfile(path):
+            results[slot] = VerifyResult(path, "error", "File not found", 0, 0.0)
+            continue
+        if file_key is None:
+            key_path = registry.find_key_path(path) if registry else None
+            if not key_path:
+                results[slot] = VerifyResult(path, "missing-key", "No key found for this file", 0, 0.0)
+                continue
+            file_key = registry.load(key_path)
+        jobs.append((path, file_key))
+        slots.append(slot)
+
+    if progress:
+        for result in results:
+            if result is not None:
+                progress(result)
+    if len(jobs) == 1:
+        verified = [verify_one(jobs[0], workers)]
+    else:
+        verified = ordered_map(verify_one, jobs, workers)
+    for slot, result in zip(slots, verified):
+        if stats is not None:
+            stats.add("decrypt", result.bytes, result.seconds)
+            stats.count_file(result.status == "ok")
+        if progress:
+            progress(result)
+        results[slot] = result
+    return results
+
+def summary(results, seconds):
+    """
+    Machine-readable report: counts per status, bytes checked, and every
+    file that is not ok
+    """
+    counts = Counter(result.status for result in results)
+    checked = sum(result.bytes for result in results)
+    return {
+        "files": len(results),
+        "counts": {status: counts[status] for status in STATUSES},
+        "bytes": checked,
+        "seconds": round(seconds, 6),
+        "mb_s": round(checked / (1024 * 1024) / seconds, 3) if seconds else None,
+        "problems": [result._asdict() for result in results if result.status != "ok"],
+    }
@@ -0,0 +1,350 @@
+import os
+import sys
+import queue
+import select
+import struct
+import threading
+from collections import Counter
+
+from cryptora import batch, encryption
+from cryptora.atomic import DEFAULT_BUFFER_SIZE, DEFAULT_DURABILITY, TEMP_SUFFIX, fsync_dir
+from cryptora.constants import ENC_MARKER
+
+PART_SUFFIX = ".part"
+DEFAULT_QUEUE_SIZE = 1000
+DEFAULT_INTERVAL = 1.0
+
+# ---------------- Inotify ----------------
+# Linux only, through ctypes so there is nothing to install. Elsewhere (or
+# when the kernel refuses more watches) the watcher polls instead.
+
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_ONLYDIR
+_EVENT = struct.Struct("iIII")
+
+
+class Inotify:
+    """
+    Minimal inotify wrapper: one watch per directory, events read in bulk
+    """
+    def __init__(self):
+        import ctypes
+        import ctypes.util
+        self._ctypes = ctypes
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.fd = self._libc.inotify_init1(IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.paths = {}
+
+    def add_watch(self, path):
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(path), WATCH_MASK)
+        if wd < 0:
+            errno = self._ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno), path)
+        self.paths[wd] = path
+        return wd
+
+    def read_events(self, timeout):
+        """
+        Waits up to timeout seconds, returns a list of (directory, mask, name)
+        """
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        data = os.read(self.fd, 64 * 1024)
+        events = []
+        offset = 0
+        while offset + _EVENT.size <= len(data):
+            wd, mask, _, length = _EVENT.unpack_from(data, offset)
+            offset += _EVENT.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b"\0"))
+            offset += length
+            directory = self.paths.get(wd)
+            if mask & IN_IGNORED:
+                self.paths.pop(wd, None)
+            events.append((directory, mask, name))
+        return events
+
+    def close(self):
+        os.close(self.fd)
+
+def inotify_available():
+    return sys.platform.startswith("linux")
+
+# ---------------- Watcher ----------------
+class Watcher:
+    """
+    Encrypts files dropped into a folder as they arrive.
+
+    Finished files (closed after writing, or moved in) are found through
+    inotify, or by polling until their size and mtime stop changing. They go
+    into a bounded queue served by a pool of threads sharing one loaded key;
+    when the queue is full the watcher blocks, so a burst is absorbed by the
+    kernel's event queue (rescanned on overflow) rather than by memory.
+
+    Outputs are written as `<output>.part` and renamed when complete, and a
+    file counts as done when its output is newer than it. After a crash a
+    restart removes stale .part files and picks up every file not yet done.
+    """
+    def __init__(self, src_dir, key, key_path, dest_dir=None, workers=4, queue_size=DEFAULT_QUEUE_SIZE,
+                 poll=False, interval=DEFAULT_INTERVAL, remove_source=False, stats=None,
+                 buffer_size=DEFAULT_BUFFER_SIZE, durability=DEFAULT_DURABILITY, **options):
+        self.src_dir = os.path.abspath(src_dir)
+        self.dest_dir = os.path.abspath(dest_dir) if dest_dir else None
+        self.key = key
+        self.key_path = key_path
+        self.workers = workers
+        self.poll = poll or not inotify_available()
+        self.interval = interval
+        self.remove_source = remove_source
+        self.stats = stats
+        self.durability = durability
+        self.options = dict(options, buffer_size=buffer_size, durability=durability)
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.counts = Counter()
+        self._pending = set()
+        self._in_flight = set()
+        self._changed = set()
+        self._failed = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    # ---------- Paths ----------
+    def output_path(self, path):
+        if self.dest_dir:
+            path = os.path.join(self.dest_dir, os.path.relpath(path, self.src_dir))
+        return batch.encrypted_path(path, self.key_path)
+
+    def _is_candidate(self, path):
+        name = os.path.basename(path)
+        # Dot files are usually writers' temp files, renamed once complete
+        if ENC_MARKER in name or name.endswith(PART_SUFFIX) or name.startswith("."):
+            return False
+        return not (self.dest_dir and os.path.commonpath([path, self.dest_dir]) == self.dest_dir)
+
+    def _is_done(self, path):
+        # Strictly newer: timestamps are coarse, and a source written in the
+        # same tick as its output may have changed after it was encrypted
+        try:
+            return os.stat(self.output_path(path)).st_mtime_ns > os.stat(path).st_mtime_ns
+        except OSError:
+            return False
+
+    def _scan(self, directory):
+        for root, dirs, files in os.walk(directory):
+            if self.dest_dir:
+                dirs[:] = [d for d in dirs if os.path.join(root, d) != self.dest_dir]
+            dirs.sort()
+            for name in sorted(files):
+                yield os.path.join(root, name)
+
+    # ---------- Queue ----------
+    def offer(self, path):
+        """
+        Queues a file unless it is already queued, blocking while the queue
+        is full. A file being encrypted is not queued again: it is marked so
+        its worker checks it once more when done. Returns False once the
+        watcher is stopping.
+        """
+        with self._lock:
+            if path in self._pending:
+                return True
+            if path in self._in_flight:
+                self._changed.add(path)
+                return True
+            self._pending.add(path)
+        while not self._stop.is_set():
+            try:
+                self.queue.put(path, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _worker(self):
+        while True:
+            path = self.queue.get()
+            if path is None:
+                return
+            with self._lock:
+                self._pending.discard(path)
+                self._in_flight.add(path)
+            # One worker per file at a time: events for it while it is being
+            # encrypted mark it changed, and the same worker goes again
+            while not self._stop.is_set():
+                try:
+                    self._process(path)
+                except Exception as e:
+                    self._record("failed", path, str(e))
+                with self._lock:
+                    if path not in self._changed:
+                        break
+                    self._changed.discard(path)
+            with self._lock:
+                self._in_flight.discard(path)
+                self._changed.discard(path)
+
+    def _process(self, path):
+        try:
+            before = os.stat(path)
+        except OSError:
+            return  # gone before we got to it
+        if self._is_done(path):
+            self._finish_source(path)
+            return
+        output = self.output_path(path)
+        part = output + PART_SUFFIX
+        try:
+            os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+            encryption.encrypt_file(path, self.key, part, stats=self.stats, **self.options)
+            after = os.stat(path)
+            if (after.st_size, after.st_mtime_ns) != (before.st_size, before.st_mtime_ns):
+                # Still being written: drop this copy, the next event or scan requeues it
+                os.remove(part)
+                self._record("skipped", path, "Changed while encrypting, will retry")
+                return
+            os.replace(part, output)
+            if self.durability == "dir":
+                fsync_dir(os.path.dirname(output))
+        except Exception as e:
+            if os.path.exists(part):
+                os.remove(part)
+            with self._lock:
+                self._failed[path] = (before.st_size, before.st_mtime_ns)
+            self._record("failed", path, str(e))
+            return
+        self._finish_source(path)
+        self._record("ok", path, output)
+
+    def _finish_source(self, path):
+        if self.remove_source and os.path.exists(path):
+            os.remove(path)
+
+    def _record(self, status, path, detail):
+        with self._lock:
+            self.counts[status] += 1
+            print(f"[{status}] {path} -> {detail}", flush=True)
+
+    # ---------- Resume ----------
+    def remove_partials(self):
+        """
+        Removes .part files left by a crash, and the temp files they were
+        being written to. Only safe before the workers start.
+        """
+        for path in self._scan(self.dest_dir or self.src_dir):
+            name = os.path.basename(path)
+            if ENC_MARKER in name and (name.endswith(PART_SUFFIX) or
+                                       name.startswith(".") and name.endswith(TEMP_SUFFIX)):
+                os.remove(path)
+
+    def resume(self):
+        """
+        Queues every file not yet encrypted: on start, and when inotify
+        events were lost
+        """
+        for path in self._scan(self.src_dir):
+            if self._stop.is_set():
+                return
+            if self._is_candidate(path):
+                if self._is_done(path):
+                    self._finish_source(path)
+                else:
+                    self.offer(path)
+
+    # ---------- Watching ----------
+    def _watch_inotify(self):
+        notify = Inotify()
+        try:
+            def watch_tree(directory):
+                for root, dirs, _ in os.walk(directory):
+                    if self.dest_dir:
+                        dirs[:] = [d for d in dirs if os.path.join(root, d) != self.dest_dir]
+                    notify.add_watch(root)
+
+            watch_tree(self.src_dir)
+            # Watches are in place: anything written from now on raises an event
+            self.resume()
+            while not self._stop.is_set():
+                for directory, mask, name in notify.read_events(self.interval):
+                    if mask & IN_Q_OVERFLOW:
+                        self.resume()
+                        continue
+                    if directory is None or not name:
+                        continue
+                    path = os.path.join(directory, name)
+                    if mask & IN_ISDIR:
+                        if mask & (IN_CREATE | IN_MOVED_TO) and self._is_candidate(path):
+                            # Files can land before the watch does: scan the new folder too
+                            watch_tree(path)
+                            for found in self._scan(path):
+                                if self._is_candidate(found):
+                                    self.offer(found)
+                    elif mask & (IN_CLOSE_WRITE | IN_MOVED_TO) and self._is_candidate(path):
+                        self.offer(path)
+        finally:
+            notify.close()
+
+    def _watch_polling(self):
+        self.resume()
+        seen = {}
+        while not self._stop.wait(self.interval):
+            current = {}
+            for path in self._scan(self.src_dir):
+                if not self._is_candidate(path):
+                    continue
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                current[path] = (stat.st_size, stat.st_mtime_ns)
+                # Unchanged since the last scan: the writer is done with it.
+                # A file that failed is retried only once it changes.
+                if (seen.get(path) == current[path] and self._failed.get(path) != current[path]
+                        and not self._is_done(path)):
+                    self.offer(path)
+            seen = current
+
+    def run(self):
+        """
+        Watches until stop() is called, then lets the workers finish the
+        files in hand. Returns a Counter of statuses.
+        """
+        self.remove_partials()
+        threads = [threading.Thread(target=self._worker, daemon=True) for _ in range(self.workers)]
+        for thread in threads:
+            thread.start()
+        try:
+            if self.poll:
+                self._watch_polling()
+            else:
+                try:
+                    self._watch_inotify()
+                except OSError as e:
+                    print(f"inotify unavailable ({e}), polling every {self.interval}s", flush=True)
+                    self.poll = True
+                    self._watch_polling()
+        finally:
+            self._stop.set()
+            # Files still queued are picked up by resume() on the next start
+            while True:
+                try:
+                    self.queue.get_nowait()
+                except queue.Empty:
+                    break
+            for _ in threads:
+                self.queue.put(None)
+            for thread in threads:
+                thread.join()
+        return self.counts
+
+    def stop(self):
+        self._stop.set()
@@ -0,0 +1,65 @@
+import os
+import sys
+
+import pytest
+from cryptography.fernet import Fernet
+
+from cryptora import cli, encryption
+
+# Key files are named like the ones genkey writes, so registry order follows
+# the timestamp in the name
+OLD_KEY = "cryptora_20250101_000000.key"
+NEW_KEY = "cryptora_20250102_000000.key"
+
+
+def write_key(folder, name):
+    path = os.path.join(folder, name)
+    with open(path, "wb") as f:
+        f.write(Fernet.generate_key())
+    return path
+
+def sample_data(size, seed=0):
+    """
+    Compressible but not constant bytes
+    """
+    line = b"".join(b"%d quote %d;" % (seed, i) for i in range(64))
+    return (line * (size // len(line) + 1))[:size]
+
+
+@pytest.fixture
+def key():
+    return Fernet.generate_key()
+
+@pytest.fixture
+def keys_dir(tmp_path, monkeypatch):
+    """
+    An empty keys folder the CLI uses instead of the package's
+    """
+    folder = tmp_path / "keys"
+    folder.mkdir()
+    monkeypatch.setattr(cli, "KEYS_DIR", str(folder))
+    return folder
+
+@pytest.fixture
+def key_paths(keys_dir):
+    """
+    (old, new) key files in the CLI's keys folder
+    """
+    return write_key(keys_dir, OLD_KEY), write_key(keys_dir, NEW_KEY)
+
+@pytest.fixture
+def run_cli(monkeypatch):
+    """
+    Runs cli.main() with the given arguments, returns its exit code
+    """
+    def run(*args):
+        monkeypatch.setattr(sys, "argv", ["cryptora", *map(str, args)])
+        try:
+            cli.main()
+        except SystemExit as e:
+            return e.code or 0
+        return 0
+    return run
+
+def load(path):
+    return encryption.load_key(str(path))
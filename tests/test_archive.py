@@ -0,0 +1,125 @@
+import json
+import os
+
+import pytest
+
+from cryptora import archive, open_encrypted
+
+from conftest import sample_data
+
+
+@pytest.fixture
+def folder(tmp_path):
+    src = tmp_path / "src"
+    (src / "sub").mkdir(parents=True)
+    (src / "a.txt").write_bytes(sample_data(9000))
+    (src / "sub" / "b.txt").write_bytes(b"b")
+    return src
+
+def craft(path, key, names):
+    """
+    Writes an archive whose members have the given names, as another tool might
+    """
+    members = [{"name": name, "offset": i, "size": 1, "mtime": 0, "mode": 0o644} for i, name in enumerate(names)]
+    index = json.dumps({"version": archive.ARCHIVE_VERSION, "members": members}).encode()
+    with open_encrypted(str(path), key, "wb") as out:
+        out.write(b"x" * len(names) + index + archive._TRAILER.pack(len(index), archive.ARCHIVE_MAGIC))
+
+
+def test_round_trip(tmp_path, key, folder):
+    path = str(tmp_path / "src.pack")
+    assert archive.pack(str(folder), path, key) == 2
+    assert [m["name"] for m in archive.list_members(path, key)] == ["a.txt", "sub/b.txt"]
+    assert archive.unpack(path, key, str(tmp_path / "out")) == ["a.txt", "sub/b.txt"]
+    assert (tmp_path / "out" / "a.txt").read_bytes() == sample_data(9000)
+    assert (tmp_path / "out" / "sub" / "b.txt").read_bytes() == b"b"
+
+def test_unpack_selected_members(tmp_path, key, folder):
+    path = str(tmp_path / "src.pack")
+    archive.pack(str(folder), path, key)
+    assert archive.unpack(path, key, str(tmp_path / "out"), names=["sub/b.txt"]) == ["sub/b.txt"]
+    assert (tmp_path / "out" / "sub" / "b.txt").read_bytes() == b"b"
+    assert not (tmp_path / "out" / "a.txt").exists()
+    with pytest.raises(archive.ArchiveError):
+        archive.unpack(path, key, str(tmp_path / "out"), names=["nope.txt"])
+
+def test_keeps_mode_and_mtime(tmp_path, key, folder):
+    os.chmod(folder / "a.txt", 0o600)
+    os.utime(folder / "a.txt", (1_600_000_000, 1_600_000_000))
+    path = str(tmp_path / "src.pack")
+    archive.pack(str(folder), path, key)
+    archive.unpack(path, key, str(tmp_path / "out"))
+    stat = os.stat(tmp_path / "out" / "a.txt")
+    assert stat.st_mode & 0o777 == 0o600
+    assert stat.st_mtime == 1_600_000_000
+
+def test_not_an_archive(tmp_path, key):
+    path = str(tmp_path / "plain.enc")
+    with open_encrypted(path, key, "wb") as out:
+        out.write(b"just some data, no archive trailer")
+    with pytest.raises(archive.ArchiveError):
+        archive.list_members(path, key)
+
+@pytest.mark.skipif(os.name == "nt", reason="colons are not allowed in Windows file names")
+def test_colon_in_name(tmp_path, key):
+    # Legal on POSIX: what pack stores, unpack extracts
+    src = tmp_path / "logs"
+    src.mkdir()
+    (src / "12:30.log").write_bytes(b"lunch")
+    path = str(tmp_path / "logs.pack")
+    assert archive.pack(str(src), path, key) == 1
+    assert archive.unpack(path, key, str(tmp_path / "out")) == ["12:30.log"]
+    assert (tmp_path / "out" / "12:30.log").read_bytes() == b"lunch"
+
+@pytest.mark.parametrize("name", ["../evil", "/etc/evil", "a/../../evil", "a//b", "./a", ""])
+def test_unsafe_names_rejected(tmp_path, key, name):
+    path = tmp_path / "evil.pack"
+    craft(path, key, [name])
+    with pytest.raises(archive.ArchiveError):
+        archive.unpack(str(path), key, str(tmp_path / "out"))
+    assert not (tmp_path / "evil").exists()
+
+def test_windows_rule_applies_to_pack_and_unpack(tmp_path, key, monkeypatch):
+    monkeypatch.setattr(archive, "_UNSAFE_CHARS", ":\\")
+    crafted = tmp_path / "drive.pack"
+    craft(crafted, key, ["C:evil"])
+    with pytest.raises(archive.ArchiveError):
+        archive.unpack(str(crafted), key, str(tmp_path / "out"))
+    src = tmp_path / "logs"
+    src.mkdir()
+    (src / "12:30.log").write_bytes(b"lunch")
+    # Refused when packing, rather than stored and then impossible to extract
+    with pytest.raises(archive.ArchiveError):
+        archive.pack(str(src), str(tmp_path / "logs.pack"), key)
+    assert not (tmp_path / "logs.pack").exists()
+
+def test_archive_inside_packed_folder(key, folder):
+    path = str(folder / "self.pack")
+    assert archive.pack(str(folder), path, key) == 2
+    assert archive.pack(str(folder), path, key) == 2
+
+def test_failed_pack_keeps_previous_archive(tmp_path, key, folder):
+    path = tmp_path / "src.pack"
+    archive.pack(str(folder), str(path), key)
+    previous = path.read_bytes()
+    os.symlink(tmp_path / "missing", folder / "dangling")
+    with pytest.raises(FileNotFoundError):
+        archive.pack(str(folder), str(path), key)
+    assert path.read_bytes() == previous
+    assert sorted(os.listdir(tmp_path)) == ["src", "src.pack"]
+
+def test_unpack_reports_real_error(tmp_path, key, folder):
+    path = str(tmp_path / "src.pack")
+    archive.pack(str(folder), path, key)
+    dest = tmp_path / "out"
+    (dest / "a.txt").mkdir(parents=True)  # a member's target is taken by a folder
+    with pytest.raises(IsADirectoryError):
+        archive.unpack(path, key, str(dest))
+
+def test_pack_and_unpack_through_main(tmp_path, capsys, run_cli, key_paths, folder):
+    assert run_cli("pack", "-d", folder, "-o", tmp_path / "src.pack") == 0
+    assert run_cli("unpack", "-f", tmp_path / "src.pack", "--list") == 0
+    listing = capsys.readouterr().out
+    assert "a.txt" in listing and "sub/b.txt" in listing
+    assert run_cli("unpack", "-f", tmp_path / "src.pack", "-o", tmp_path / "out", "--member", "a.txt") == 0
+    assert os.listdir(tmp_path / "out") == ["a.txt"]
@@ -0,0 +1,78 @@
+import os
+import stat
+
+import pytest
+
+from cryptora import encryption
+from cryptora.atomic import DirSyncer, atomic_output
+
+from conftest import sample_data
+
+
+def test_writes_file(tmp_path):
+    path = tmp_path / "out.bin"
+    with atomic_output(str(path)) as f:
+        f.write(b"data")
+    assert path.read_bytes() == b"data"
+    assert os.listdir(tmp_path) == ["out.bin"]
+
+def test_failure_keeps_existing_file(tmp_path):
+    path = tmp_path / "out.bin"
+    path.write_bytes(b"old")
+    with pytest.raises(RuntimeError):
+        with atomic_output(str(path)) as f:
+            f.write(b"half of the new")
+            raise RuntimeError("failed")
+    assert path.read_bytes() == b"old"
+    assert os.listdir(tmp_path) == ["out.bin"]
+
+def test_failure_without_existing_file(tmp_path):
+    with pytest.raises(RuntimeError):
+        with atomic_output(str(tmp_path / "out.bin")) as f:
+            f.write(b"partial")
+            raise RuntimeError("failed")
+    assert os.listdir(tmp_path) == []
+
+def test_keeps_mode_of_replaced_file(tmp_path):
+    path = tmp_path / "secret.txt"
+    path.write_bytes(b"old")
+    path.chmod(0o600)
+    with atomic_output(str(path)) as f:
+        f.write(b"new")
+    assert path.read_bytes() == b"new"
+    assert stat.S_IMODE(path.stat().st_mode) == 0o600
+
+@pytest.mark.parametrize("durability", ["none", "file", "dir"])
+def test_durability(tmp_path, durability):
+    syncer = DirSyncer()
+    with atomic_output(str(tmp_path / "a"), 4096, durability, syncer) as f:
+        f.write(b"a")
+    with atomic_output(str(tmp_path / "b"), 4096, durability, syncer) as f:
+        f.write(b"b")
+    # Each folder once, however many files
+    assert syncer.sync() == (1 if durability == "dir" else 0)
+
+def test_unknown_durability(tmp_path):
+    with pytest.raises(ValueError):
+        with atomic_output(str(tmp_path / "a"), durability="always"):
+            pass
+
+def test_failed_encrypt_keeps_existing_output(tmp_path, key):
+    output = tmp_path / "data.enc"
+    output.write_bytes(b"previous")
+    with pytest.raises(FileNotFoundError):
+        encryption.encrypt_file(str(tmp_path / "missing"), key, str(output))
+    assert output.read_bytes() == b"previous"
+
+def test_failed_decrypt_keeps_existing_output(tmp_path, key):
+    source = tmp_path / "data"
+    source.write_bytes(sample_data(10000))
+    encrypted = encryption.encrypt_file(str(source), key, str(tmp_path / "data.enc"))
+    with open(encrypted, "r+b") as f:
+        f.truncate(os.path.getsize(encrypted) - 100)
+    output = tmp_path / "data.out"
+    output.write_bytes(b"previous")
+    with pytest.raises(encryption.TruncatedFileError):
+        encryption.decrypt_file(encrypted, key, str(output))
+    assert output.read_bytes() == b"previous"
+    assert sorted(os.listdir(tmp_path)) == ["data", "data.enc", "data.out"]
@@ -0,0 +1,67 @@
+import os
+
+import pytest
+
+from cryptora import batch, cli, encryption
+
+from conftest import NEW_KEY, load, sample_data
+
+
+@pytest.fixture
+def folder(tmp_path):
+    src = tmp_path / "data"
+    (src / "sub" / "deeper").mkdir(parents=True)
+    files = ["a.txt", "b.json", "sub/c.csv", "sub/deeper/d.bin"]
+    for i, name in enumerate(files):
+        (src / name).write_bytes(sample_data(3000 + 1000 * i, seed=i))
+    return src, files
+
+def encrypted_name(path):
+    return str(path) + ".enc_" + NEW_KEY[:-4]
+
+
+def test_collect_files_filters_by_action(key, folder):
+    src, files = folder
+    encryption.encrypt_file(str(src / "a.txt"), key, str(src / "a.txt.enc_x"))
+    (src / "a.txt").unlink()
+    to_encrypt = batch.collect_files([str(src)], "encrypt")
+    assert sorted(os.path.relpath(p, src) for p in to_encrypt) == sorted(files[1:])
+    assert batch.collect_files([str(src)], "decrypt") == [str(src / "a.txt.enc_x")]
+    assert batch.collect_files([str(src)], "encrypt", recursive=False) == [str(src / "b.json")]
+
+def test_collect_files_globs_without_duplicates(folder):
+    src, _ = folder
+    found = batch.collect_files([str(src / "**" / "*.csv"), str(src / "sub" / "c.csv")], "encrypt")
+    assert found == [str(src / "sub" / "c.csv")]
+
+@pytest.mark.parametrize("workers", ["1", "4", "auto"])
+def test_folder_round_trip(capsys, run_cli, key_paths, folder, workers):
+    src, files = folder
+    originals = dict((name, (src / name).read_bytes()) for name in files)
+    assert run_cli("encrypt", "-d", src, "-w", workers) == 0
+    assert "Encrypted 4 file(s), 0 skipped, 0 failed" in capsys.readouterr().out
+    for name in files:
+        assert os.path.exists(encrypted_name(src / name))
+        os.remove(src / name)
+
+    # No -k: each file's key is found from its header
+    assert run_cli("decrypt", "-d", src, "-w", workers) == 0
+    assert "Decrypted 4 file(s), 0 skipped, 0 failed" in capsys.readouterr().out
+    for name in files:
+        assert (src / name).read_bytes() == originals[name]
+
+def test_failures_do_not_stop_the_batch(key_paths, folder):
+    src, files = folder
+    for name in files:
+        encryption.encrypt_file(str(src / name), load(key_paths[1]), encrypted_name(src / name))
+    with open(encrypted_name(src / files[0]), "r+b") as f:
+        f.truncate(100)
+    inputs = [encrypted_name(src / name) for name in files] + [str(src / "missing.enc_x")]
+    counts = batch.run_batch("decrypt", inputs, None, None, 3, cli.key_registry())
+    assert counts == {"ok": 3, "failed": 2}
+
+@pytest.mark.parametrize("value", ["0", "-2", "two"])
+def test_workers_must_be_positive(capsys, run_cli, folder, value):
+    src, _ = folder
+    assert run_cli("encrypt", "-d", src, "-w", value) == 2
+    assert "-w/--workers" in capsys.readouterr().err
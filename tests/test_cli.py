@@ -0,0 +1,162 @@
+import argparse
+import os
+import stat
+import subprocess
+import sys
+
+import pytest
+
+from cryptora import cli, client, encryption
+
+from conftest import NEW_KEY, OLD_KEY, load, sample_data
+
+CHUNK = 4096
+SIZE = 3 * CHUNK + 100
+
+
+@pytest.fixture
+def encrypted(tmp_path, key_paths):
+    data = sample_data(SIZE)
+    source = tmp_path / "quotes.json"
+    source.write_bytes(data)
+    path = encryption.encrypt_file(str(source), load(key_paths[0]), str(tmp_path / "quotes.enc"), chunk_size=CHUNK)
+    return data, path
+
+
+# ---------------- rotate ----------------
+def test_rotate(tmp_path, key_paths, run_cli):
+    old_path, new_path = key_paths
+    source = tmp_path / "report.csv"
+    source.write_bytes(sample_data(10000))
+    assert run_cli("encrypt", "-f", source, "-k", old_path, "--envelope") == 0
+    encrypted = str(source) + ".enc_" + OLD_KEY[:-4]
+    before = open(encrypted, "rb").read()
+
+    assert run_cli("rotate", "-f", encrypted) == 0  # to the latest key
+    rotated = str(source) + ".enc_" + NEW_KEY[:-4]
+    assert not os.path.exists(encrypted)
+    after = open(rotated, "rb").read()
+    # Only the header changed
+    assert len(after) == len(before)
+    assert after[-1000:] == before[-1000:]
+
+    output = encryption.decrypt_file(rotated, load(new_path), str(tmp_path / "out.csv"))
+    assert open(output, "rb").read() == source.read_bytes()
+    with pytest.raises(encryption.WrongKeyError):
+        encryption.decrypt_file(rotated, load(old_path), str(tmp_path / "old.csv"))
+
+def test_rotate_needs_envelope(tmp_path, key_paths, run_cli, capsys):
+    source = tmp_path / "plain.txt"
+    source.write_bytes(b"not an envelope file")
+    assert run_cli("encrypt", "-f", source, "-k", key_paths[0]) == 0
+    encrypted = str(source) + ".enc_" + OLD_KEY[:-4]
+    assert run_cli("rotate", "-f", encrypted) == 0
+    assert "[failed]" in capsys.readouterr().out
+    assert os.path.exists(encrypted)
+
+
+# ---------------- --range ----------------
+@pytest.mark.parametrize("text, expected", [
+    ("0:10", (0, 10)),
+    ("5:", (5, None)),
+    (":7", (0, 7)),
+    ("3:3", (3, 3)),
+])
+def test_parse_range(text, expected):
+    assert cli.parse_range(text) == expected
+
+@pytest.mark.parametrize("text", ["10", "5:2", "-1:4", "a:b"])
+def test_parse_range_rejects(text):
+    with pytest.raises(argparse.ArgumentTypeError):
+        cli.parse_range(text)
+
+@pytest.mark.parametrize("start, end", [
+    (0, 10),
+    (0, CHUNK),                  # exactly one chunk
+    (CHUNK - 5, CHUNK + 5),      # across a chunk boundary
+    (2 * CHUNK, None),           # to the end
+    (SIZE - 1, SIZE),            # last byte
+    (SIZE - 10, SIZE + 1000),    # end past the end of the file
+    (SIZE + 5, None),            # start past the end of the file
+    (7, 7),                      # empty
+])
+def test_range(capsysbinary, encrypted, key_paths, start, end):
+    data, path = encrypted
+    cli.decrypt_range(path, key_paths[0], start, end)
+    out, err = capsysbinary.readouterr()
+    assert out == data[start:end]
+    assert not err
+
+def test_range_through_main(capsysbinary, run_cli, encrypted):
+    data, path = encrypted
+    assert run_cli("decrypt", "-f", path, "--range", "100:200") == 0
+    assert capsysbinary.readouterr().out == data[100:200]
+
+
+# ---------------- Pipes ----------------
+PIPE_SCRIPT = "import sys; from cryptora import cli; cli.KEYS_DIR = sys.argv.pop(1); cli.main()"
+
+def pipe(keys_dir, *args, data=b""):
+    """
+    Runs the CLI in a child process with real stdin/stdout pipes and the
+    given keys folder, returns the CompletedProcess
+    """
+    env = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.dirname(cli.__file__)))
+    env.pop(client.SOCKET_ENV, None)
+    return subprocess.run([sys.executable, "-c", PIPE_SCRIPT, str(keys_dir), *map(str, args)],
+                          input=data, capture_output=True, env=env, timeout=60)
+
+@pytest.mark.parametrize("size", [0, 100, 3 * 1024 * 1024 + 7])
+def test_pipe_round_trip(keys_dir, key_paths, size):
+    data = sample_data(size)
+    encrypted = pipe(keys_dir, "encrypt", "-f", "-", "--compress", "zlib", data=data)
+    assert encrypted.returncode == 0 and not encrypted.stderr
+    assert encrypted.stdout.startswith(encryption.MAGIC)
+    # No -k: the key is found from the header read off the pipe
+    decrypted = pipe(keys_dir, "decrypt", "-f", "-", "-o", "-", data=encrypted.stdout)
+    assert decrypted.returncode == 0
+    assert decrypted.stdout == data
+
+def test_pipe_to_and_from_files(tmp_path, keys_dir, key_paths):
+    data = sample_data(10000)
+    assert pipe(keys_dir, "encrypt", "-f", "-", "-o", tmp_path / "data.enc", data=data).returncode == 0
+    decrypted = pipe(keys_dir, "decrypt", "-f", tmp_path / "data.enc", "-o", "-")
+    assert decrypted.stdout == data
+    # Messages go to stderr, never into the data
+    assert b"Used key" not in decrypted.stdout
+
+def test_pipe_failure(keys_dir, key_paths):
+    encrypted = pipe(keys_dir, "encrypt", "-f", "-", "-k", key_paths[0], data=sample_data(10000)).stdout
+    result = pipe(keys_dir, "decrypt", "-f", "-", "-k", key_paths[1], data=encrypted[:-100])
+    assert result.returncode == 1
+    assert b"failed" in result.stderr
+
+
+# ---------------- Output Files ----------------
+def test_failed_decrypt_keeps_existing_output(tmp_path, encrypted, key_paths, run_cli):
+    _, path = encrypted
+    output = tmp_path / "good.txt"
+    output.write_bytes(b"keep me")
+    assert run_cli("decrypt", "-f", path, "-k", key_paths[1], "-o", output) == 1
+    assert output.read_bytes() == b"keep me"
+    assert sorted(os.listdir(tmp_path)) == ["good.txt", "keys", "quotes.enc", "quotes.json"]
+
+def test_output_keeps_mode(tmp_path, encrypted, key_paths, run_cli):
+    data, path = encrypted
+    output = tmp_path / "secret.txt"
+    output.write_bytes(b"")
+    output.chmod(0o600)
+    assert run_cli("decrypt", "-f", path, "-k", key_paths[0], "-o", output, "--durability", "file") == 0
+    assert output.read_bytes() == data
+    assert stat.S_IMODE(output.stat().st_mode) == 0o600
+
+def test_output_flags_rejected_for_verify(encrypted, run_cli):
+    _, path = encrypted
+    assert run_cli("verify", "-f", path, "--durability", "dir") == 2
+
+@pytest.mark.parametrize("size", ["0", "-5", "big"])
+def test_bad_buffer_size(tmp_path, encrypted, key_paths, run_cli, size):
+    _, path = encrypted
+    output = tmp_path / "out.txt"
+    assert run_cli("decrypt", "-f", path, "-k", key_paths[0], "-o", output, "--buffer-size", size) == 2
+    assert not output.exists()
@@ -0,0 +1,150 @@
+import io
+
+import pytest
+from cryptography.fernet import Fernet
+
+from cryptora import compress, encryption, open_encrypted
+
+from conftest import sample_data
+
+CHUNK = 4096
+CODECS = [None] + compress.available_codecs()
+
+
+def encrypt(data, key, **options):
+    out = io.BytesIO()
+    encryption.encrypt_stream(io.BytesIO(data), out, key, chunk_size=CHUNK, **options)
+    return out.getvalue()
+
+def decrypt(blob, key, workers=1):
+    out = io.BytesIO()
+    encryption.decrypt_stream(io.BytesIO(blob), out, key, workers)
+    return out.getvalue()
+
+def split(blob):
+    """
+    Splits a container into (header, [frames], index trailer)
+    """
+    _, _, length = encryption._PREAMBLE.unpack_from(blob)
+    position = encryption._PREAMBLE.size + length
+    header, frames = blob[:position], []
+    while True:
+        (size,) = encryption._FRAME.unpack_from(blob, position)
+        end = position + encryption._FRAME.size + (size & ~encryption._FINAL_BIT)
+        frames.append(blob[position:end])
+        position = end
+        if size & encryption._FINAL_BIT:
+            return header, frames, blob[position:]
+
+
+# ---------------- Round Trips ----------------
+@pytest.mark.parametrize("cipher", encryption.CIPHERS)
+@pytest.mark.parametrize("codec", CODECS)
+@pytest.mark.parametrize("size", [0, 1, CHUNK, 3 * CHUNK + 17])
+def test_round_trip(key, cipher, codec, size):
+    data = sample_data(size)
+    blob = encrypt(data, key, cipher=cipher, compression=codec)
+    assert blob.startswith(encryption.MAGIC)
+    assert decrypt(blob, key) == data
+
+@pytest.mark.parametrize("cipher", encryption.CIPHERS)
+def test_envelope_round_trip(key, cipher):
+    data = sample_data(2 * CHUNK + 5)
+    assert decrypt(encrypt(data, key, cipher=cipher, envelope=True), key) == data
+
+def test_file_round_trip(tmp_path, key):
+    source = tmp_path / "quotes.json"
+    source.write_bytes(sample_data(10000))
+    encrypted = encryption.encrypt_file(str(source), key, str(tmp_path / "quotes.enc"))
+    decrypted = encryption.decrypt_file(encrypted, key, str(tmp_path / "quotes.out"))
+    assert open(decrypted, "rb").read() == source.read_bytes()
+
+
+# ---------------- Tampering ----------------
+@pytest.fixture(params=encryption.CIPHERS)
+def container(request, key):
+    data = sample_data(3 * CHUNK + 100)
+    return data, encrypt(data, key, cipher=request.param)
+
+def test_container_layout(container):
+    _, blob = container
+    header, frames, trailer = split(blob)
+    assert len(frames) == 4
+    assert trailer.endswith(encryption.INDEX_MAGIC)
+
+@pytest.mark.parametrize("cut", ["header", "mid-frame", "final-frame", "trailer", "footer"])
+def test_truncated(key, container, cut):
+    _, blob = container
+    header, frames, trailer = split(blob)
+    end = {
+        "header": len(header) - 1,
+        "mid-frame": len(header) + len(frames[0]) // 2,
+        "final-frame": len(blob) - len(trailer) - len(frames[-1]),
+        "trailer": len(blob) - len(trailer),
+        "footer": len(blob) - 1,
+    }[cut]
+    with pytest.raises(encryption.TruncatedFileError):
+        decrypt(blob[:end], key)
+
+def test_reordered_chunks(key, container):
+    _, blob = container
+    header, frames, trailer = split(blob)
+    frames[0], frames[1] = frames[1], frames[0]
+    with pytest.raises(encryption.InvalidToken):
+        decrypt(header + b"".join(frames) + trailer, key)
+
+def test_chunk_swapped_from_another_file(key, container):
+    data, blob = container
+    header, frames, trailer = split(blob)
+    cipher = encryption.read_params(io.BytesIO(blob), key)[0].cipher
+    _, other, _ = split(encrypt(data, key, cipher=cipher))
+    frames[1] = other[1]
+    with pytest.raises(encryption.InvalidToken):
+        decrypt(header + b"".join(frames) + trailer, key)
+
+def test_final_flag_moved(key, container):
+    # Dropping the last chunk and flagging the one before it as final
+    _, blob = container
+    header, frames, trailer = split(blob)
+    (size,) = encryption._FRAME.unpack_from(frames[-2])
+    frames[-2] = encryption._FRAME.pack(size | encryption._FINAL_BIT) + frames[-2][encryption._FRAME.size:]
+    with pytest.raises(encryption.InvalidToken):
+        decrypt(header + b"".join(frames[:-1]), key)
+
+def test_flipped_byte(key, container):
+    _, blob = container
+    header, frames, trailer = split(blob)
+    tampered = bytearray(blob)
+    tampered[len(header) + len(frames[0]) + 10] ^= 1
+    with pytest.raises(encryption.InvalidToken):
+        decrypt(bytes(tampered), key)
+
+def test_wrong_key(key, container):
+    _, blob = container
+    with pytest.raises(encryption.WrongKeyError):
+        decrypt(blob, Fernet.generate_key())
+
+def test_edited_codec_fails(key):
+    blob = encrypt(sample_data(2 * CHUNK), key, compression="zlib")
+    assert b"zlib:" in blob[:200]
+    with pytest.raises(encryption.InvalidToken):
+        decrypt(blob.replace(b"zlib:", b"lzma:", 1), key)
+
+
+# ---------------- Legacy Files ----------------
+def test_legacy_fernet_stream(key):
+    token = Fernet(key).encrypt(b"legacy data")
+    assert decrypt(token, key) == b"legacy data"
+
+def test_legacy_fernet_file(tmp_path, key):
+    path = tmp_path / "old.enc"
+    path.write_bytes(Fernet(key).encrypt(b"legacy data"))
+    output = encryption.decrypt_file(str(path), key, str(tmp_path / "old.txt"))
+    assert open(output, "rb").read() == b"legacy data"
+    with open_encrypted(str(path), key) as f:
+        assert f.read() == b"legacy data"
+
+def test_legacy_fernet_wrong_key(key):
+    token = Fernet(key).encrypt(b"legacy data")
+    with pytest.raises(encryption.InvalidToken):
+        decrypt(token, Fernet.generate_key())
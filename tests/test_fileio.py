@@ -0,0 +1,124 @@
+import io
+import json
+import random
+
+import pytest
+
+from cryptora import encryption, open_encrypted
+from cryptora.fileio import EncryptedReader, EncryptedWriter
+
+from conftest import sample_data
+
+CHUNK = 4096
+SIZE = 5 * CHUNK + 123
+
+
+@pytest.fixture
+def container(tmp_path, key):
+    data = sample_data(SIZE)
+    path = tmp_path / "data.enc"
+    with open_encrypted(str(path), key, "wb", chunk_size=CHUNK) as f:
+        f.write(data)
+    return data, str(path)
+
+def decrypt(blob, key):
+    out = io.BytesIO()
+    encryption.decrypt_stream(io.BytesIO(blob), out, key)
+    return out.getvalue()
+
+
+# ---------------- Reading ----------------
+def test_written_file_is_a_container(container, key):
+    data, path = container
+    assert decrypt(open(path, "rb").read(), key) == data
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_read_all(container, key, workers):
+    data, path = container
+    with open_encrypted(path, key, workers=workers) as f:
+        assert f.read() == data
+
+def test_text_mode(tmp_path, key):
+    path = str(tmp_path / "quotes.json.enc")
+    with open_encrypted(path, key, "w", encoding="utf-8") as f:
+        json.dump({"quote": "café"}, f)
+    with open_encrypted(path, key, "r", encoding="utf-8") as f:
+        assert json.load(f) == {"quote": "café"}
+
+def test_seek_and_read(container, key):
+    data, path = container
+    with open_encrypted(path, key) as f:
+        f.seek(CHUNK - 3)
+        assert f.read(6) == data[CHUNK - 3:CHUNK + 3]
+        f.seek(-10, io.SEEK_END)
+        assert f.read() == data[-10:]
+        assert f.tell() == SIZE
+        f.seek(SIZE + 50)
+        assert f.read(5) == b""
+
+def test_seek_end_to_current_position(container, key):
+    # SEEK_END reads the index and last chunk; reading on sequentially from
+    # the same position must not pick up where that left the source
+    data, path = container
+    with open(path, "rb") as src:
+        reader = EncryptedReader(src, key)
+        assert reader.read(CHUNK) == data[:CHUNK]
+        assert reader.seek(CHUNK - SIZE, io.SEEK_END) == CHUNK
+        assert reader.read(10) == data[CHUNK:CHUNK + 10]
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_random_seeks(container, key, workers):
+    data, path = container
+    rng = random.Random(5)
+    for _ in range(30):
+        # Fresh readers: the first seek leaves sequential mode
+        expected = io.BytesIO(data)
+        with open_encrypted(path, key, workers=workers) as f:
+            for _ in range(10):
+                whence = rng.choice([io.SEEK_SET, io.SEEK_CUR, io.SEEK_END])
+                # Often stay put: seeking to the current position is a case of its own
+                target = rng.choice([expected.tell(), rng.randrange(SIZE + 20)])
+                offset = target - {io.SEEK_SET: 0, io.SEEK_CUR: expected.tell(), io.SEEK_END: SIZE}[whence]
+                assert f.seek(offset, whence) == expected.seek(offset, whence)
+                size = rng.choice([1, 10, CHUNK, 3 * CHUNK])
+                assert f.read(size) == expected.read(size)
+
+def test_unseekable_source(container, key):
+    data, path = container
+
+    class Pipe(io.RawIOBase):
+        def __init__(self, data):
+            self._data = io.BytesIO(data)
+        def readable(self):
+            return True
+        def readinto(self, buffer):
+            return self._data.readinto(buffer)
+
+    reader = EncryptedReader(Pipe(open(path, "rb").read()), key)
+    assert not reader.seekable()
+    assert reader.read() == data
+    with pytest.raises(io.UnsupportedOperation):
+        reader.seek(0)
+
+
+# ---------------- Writing ----------------
+def test_writer_abort_leaves_truncated_file(tmp_path, key):
+    path = tmp_path / "partial.enc"
+    with pytest.raises(RuntimeError):
+        with open_encrypted(str(path), key, "wb", chunk_size=CHUNK) as f:
+            f.write(sample_data(3 * CHUNK))
+            raise RuntimeError("producer failed")
+    with pytest.raises(encryption.TruncatedFileError):
+        decrypt(path.read_bytes(), key)
+
+def test_writer_abort_before_first_chunk(key):
+    out = io.BytesIO()
+    writer = EncryptedWriter(out, key)
+    writer.write(b"abc")
+    writer.abort()
+    with pytest.raises(encryption.TruncatedFileError):
+        decrypt(out.getvalue(), key)
+
+def test_invalid_mode(tmp_path, key):
+    with pytest.raises(ValueError):
+        open_encrypted(str(tmp_path / "x"), key, "ab")
@@ -0,0 +1,122 @@
+import os
+
+import pytest
+
+pytest.importorskip("PyQt5")
+
+from cryptora import encryption, gui
+
+from conftest import NEW_KEY, load, sample_data
+
+
+def run_job(action, file_path, key_path, cancel=None):
+    """
+    Runs a CryptoJob in this thread, returns (progress values, done messages)
+    """
+    job = gui.CryptoJob(action, str(file_path), str(key_path))
+    progress, done = [], []
+    job.signals.progress.connect(progress.append)
+    job.signals.done.connect(lambda finished, msg: done.append((finished, msg)))
+    if cancel:
+        job.signals.progress.connect(lambda value: value >= cancel and job.cancel())
+    job.run()
+    assert [finished for finished, _ in done] == [job]
+    return progress, done[0][1]
+
+
+def test_encrypt_and_decrypt(tmp_path, key_paths):
+    source = tmp_path / "report.csv"
+    source.write_bytes(sample_data(3 * 1024 * 1024))
+    progress, msg = run_job("encrypt", source, key_paths[1])
+    encrypted = str(source) + ".enc_" + NEW_KEY[:-4]
+    assert msg == f"🔒 Encrypted → {encrypted}"
+    assert progress[-1] == 100 and progress == sorted(progress)
+
+    os.remove(source)
+    _, msg = run_job("decrypt", encrypted, key_paths[1])
+    assert msg == f"✅ Decrypted → {source}"
+    assert source.read_bytes() == sample_data(3 * 1024 * 1024)
+
+def test_file_removed_while_queued(tmp_path, key_paths):
+    # Reports the error and still finishes, instead of raising out of run()
+    _, msg = run_job("encrypt", tmp_path / "gone.txt", key_paths[1])
+    assert msg == f"❌ File not found: {tmp_path / 'gone.txt'}"
+
+def test_wrong_key(tmp_path, key, key_paths):
+    encrypted = tmp_path / "data.enc"
+    (tmp_path / "data").write_bytes(b"secret")
+    encryption.encrypt_file(str(tmp_path / "data"), load(key_paths[0]), str(encrypted))
+    _, msg = run_job("decrypt", encrypted, key_paths[1])
+    assert msg.startswith("❌ Decryption failed")
+
+def test_cancelled_before_start(tmp_path, key_paths):
+    source = tmp_path / "data"
+    source.write_bytes(b"data")
+    job = gui.CryptoJob("encrypt", str(source), key_paths[1])
+    done = []
+    job.signals.done.connect(lambda finished, msg: done.append(msg))
+    job.cancel()
+    job.run()
+    assert done == [f"🛑 Cancelled → {source}"]
+    assert os.listdir(tmp_path) == ["data", "keys"]
+
+def test_cancelled_while_running(tmp_path, key_paths):
+    source = tmp_path / "big.bin"
+    source.write_bytes(sample_data(8 * 1024 * 1024))
+    _, msg = run_job("encrypt", source, key_paths[1], cancel=1)
+    assert msg == f"🛑 Cancelled → {source}"
+    # No partial output is left behind
+    assert sorted(os.listdir(tmp_path)) == ["big.bin", "keys"]
+
+
+# ---------------- Window ----------------
+@pytest.fixture
+def window(monkeypatch, keys_dir, tmp_path):
+    monkeypatch.setenv("QT_QPA_PLATFORM", "offscreen")
+    monkeypatch.setattr(gui, "KEYS_DIR", str(keys_dir))
+    monkeypatch.setattr(gui, "LOGS_DIR", str(tmp_path / "logs"))
+    app = gui.QApplication.instance() or gui.QApplication([])
+    ui = gui.CryptoraUI()
+    yield ui
+    ui.close()
+    app.processEvents()
+
+def shown(ui):
+    ui.flush_status()
+    return ui.status_label.toPlainText()
+
+def test_window_lists_keys(window, key_paths):
+    window.list_keys()
+    assert f"  - {NEW_KEY}" in shown(window)
+
+def test_window_generates_keys(window, keys_dir):
+    window.generate_key()
+    (key_file,) = [name for name in os.listdir(keys_dir) if name.endswith(".key")]
+    assert len(load(keys_dir / key_file)) == 44
+
+
+# ---------------- Logs ----------------
+def test_log_writer(tmp_path):
+    writer = gui.LogWriter(interval=0.05)
+    try:
+        for i in range(1000):
+            writer.write(str(tmp_path / ("a.log" if i % 2 else "b.log")), f"line {i}")
+        writer.flush()
+        assert (tmp_path / "a.log").read_text().splitlines() == [f"line {i}" for i in range(1, 1000, 2)]
+        assert (tmp_path / "b.log").read_text().splitlines() == [f"line {i}" for i in range(0, 1000, 2)]
+        # A missing folder does not stop the writer
+        writer.write(str(tmp_path / "gone" / "c.log"), "lost")
+        writer.write(str(tmp_path / "a.log"), "after")
+        writer.flush()
+        assert (tmp_path / "a.log").read_text().splitlines()[-1] == "after"
+    finally:
+        writer.close()
+    assert not writer.thread.is_alive()
+
+def test_read_log_tail(tmp_path):
+    path = tmp_path / "log.txt"
+    path.write_text("".join(f"line {i}\n" for i in range(1000)))
+    lines, truncated = gui.read_log_tail(str(path), max_bytes=100)
+    assert truncated and lines[-1] == "line 999"
+    assert all(line.startswith("line ") for line in lines) and len(lines) < 15
+    assert gui.read_log_tail(str(path)) == ([f"line {i}" for i in range(1000)], False)
@@ -0,0 +1,36 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from cryptora import cli
+
+HEAVY = ["cryptography", "cryptora.encryption", "cryptora.batch", "concurrent.futures.process"]
+
+CHECK = """
+import os, sys
+before = set(os.listdir(sys.argv[1]))
+import {module}
+heavy = [name for name in {heavy!r} if name in sys.modules]
+print(heavy, sorted(set(os.listdir(sys.argv[1])) - before))
+"""
+
+
+def import_in_child(module, tmp_path):
+    """
+    Imports module in a fresh interpreter, returns what it printed: the heavy
+    modules loaded and the files created in the current folder
+    """
+    env = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.dirname(cli.__file__)), QT_QPA_PLATFORM="offscreen")
+    result = subprocess.run([sys.executable, "-c", CHECK.format(module=module, heavy=HEAVY), str(tmp_path)],
+                            cwd=tmp_path, capture_output=True, text=True, env=env, timeout=60)
+    assert result.returncode == 0, result.stderr
+    return result.stdout.strip()
+
+def test_cli_import_is_light(tmp_path):
+    assert import_in_child("cryptora.cli", tmp_path) == "[] []"
+
+def test_gui_import_is_light(tmp_path):
+    pytest.importorskip("PyQt5")
+    assert import_in_child("cryptora.gui", tmp_path) == "[] []"
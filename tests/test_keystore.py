@@ -0,0 +1,96 @@
+import json
+import os
+
+import pytest
+
+from cryptora import cli, encryption, keystore
+
+from conftest import NEW_KEY, OLD_KEY, load, sample_data, write_key
+
+
+def statuses():
+    return dict((name, entry["status"]) for name, entry in cli.key_registry().entries())
+
+
+# ---------------- Registry ----------------
+def test_entries_and_latest(key_paths):
+    registry = cli.key_registry()
+    assert registry.names() == [OLD_KEY, NEW_KEY]
+    assert registry.latest_path() == key_paths[1]
+    entry = dict(registry.entries())[OLD_KEY]
+    assert entry["id"] == encryption.key_id(load(key_paths[0])).hex()
+    assert entry["created"] == "2025-01-01T00:00:00"
+
+def test_index_follows_the_folder(keys_dir, key_paths):
+    registry = cli.key_registry()
+    registry.names()
+    index = json.loads((keys_dir / keystore.INDEX_NAME).read_text())
+    assert sorted(index["keys"]) == [OLD_KEY, NEW_KEY]
+    os.remove(key_paths[1])
+    assert registry.names() == [OLD_KEY]
+    newest = write_key(keys_dir, "cryptora_20250103_000000.key")
+    assert registry.latest_path() == newest
+
+def test_find_key_path(tmp_path, key_paths):
+    source = tmp_path / "data"
+    source.write_bytes(sample_data(100))
+    # The header names the key, whatever the file is called
+    encrypted = encryption.encrypt_file(str(source), load(key_paths[0]), str(tmp_path / "renamed.bin"))
+    assert cli.key_registry().find_key_path(encrypted) == key_paths[0]
+    assert cli.key_registry().find_key_path(str(source)) is None
+
+def test_set_status(key_paths):
+    registry = cli.key_registry()
+    registry.set_status(NEW_KEY, "retired")
+    assert statuses() == {OLD_KEY: "active", NEW_KEY: "retired"}
+    assert registry.latest_path() == key_paths[0]
+    registry.set_status("cryptora_gone.key", "retired")  # not in the folder: ignored
+    with pytest.raises(ValueError):
+        registry.set_status(NEW_KEY, "lost")
+
+
+# ---------------- rotate --retire ----------------
+@pytest.fixture
+def envelope_files(tmp_path, key_paths, run_cli):
+    """
+    Two envelope files encrypted with the old key
+    """
+    names = []
+    for name in ("a.txt", "b.txt"):
+        (tmp_path / name).write_bytes(sample_data(2000))
+        assert run_cli("encrypt", "-f", tmp_path / name, "-k", key_paths[0], "--envelope") == 0
+        names.append(str(tmp_path / name) + ".enc_" + OLD_KEY[:-4])
+    return names
+
+def test_rotate_keeps_keys_active(envelope_files, run_cli):
+    assert run_cli("rotate", "-f", envelope_files[0]) == 0
+    assert statuses() == {OLD_KEY: "active", NEW_KEY: "active"}
+
+def test_rotate_retire(envelope_files, run_cli, capsys):
+    assert run_cli("rotate", "-f", *envelope_files, "--retire") == 0
+    assert "Retired key: " + OLD_KEY in capsys.readouterr().out
+    assert statuses() == {OLD_KEY: "retired", NEW_KEY: "active"}
+
+def test_rotate_retire_needs_every_file(tmp_path, envelope_files, run_cli, capsys):
+    plain = tmp_path / "plain.txt"
+    plain.write_bytes(b"not an envelope file")
+    assert run_cli("encrypt", "-f", plain, "-k", cli.key_registry().path(OLD_KEY)) == 0
+    assert run_cli("rotate", "-f", *envelope_files, str(plain) + ".enc_" + OLD_KEY[:-4], "--retire") == 0
+    assert "No keys retired" in capsys.readouterr().out
+    assert statuses() == {OLD_KEY: "active", NEW_KEY: "active"}
+
+def test_rotate_retire_keeps_the_target_key(envelope_files, key_paths, run_cli):
+    # Rotating to the old key itself: everything is skipped, nothing retired
+    assert run_cli("rotate", "-f", *envelope_files, "-k", key_paths[0], "--retire") == 0
+    assert statuses() == {OLD_KEY: "active", NEW_KEY: "active"}
+
+def test_already_rotated_file(envelope_files, run_cli):
+    assert run_cli("rotate", "-f", envelope_files[0], "--retire") == 0
+    rotated = envelope_files[0].replace(OLD_KEY[:-4], NEW_KEY[:-4])
+    # The old key is retired, rotating again just skips
+    assert run_cli("rotate", "-f", rotated, "--retire") == 0
+    assert statuses() == {OLD_KEY: "retired", NEW_KEY: "active"}
+
+def test_retire_only_with_rotate(envelope_files, run_cli, capsys):
+    assert run_cli("decrypt", "-f", envelope_files[0], "--retire") == 2
+    assert "--retire" in capsys.readouterr().err
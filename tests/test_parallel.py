@@ -0,0 +1,43 @@
+import concurrent.futures
+import io
+import operator
+
+from cryptora import encryption, parallel
+
+from conftest import sample_data
+
+CHUNK = 4096
+
+
+def test_results_in_input_order():
+    items = list(range(50))
+    assert list(parallel.ordered_map(operator.neg, items, workers=3, window=4)) == [-i for i in items]
+
+def test_one_worker_runs_inline():
+    # A lambda cannot be sent to a worker process
+    assert list(parallel.ordered_map(lambda x: x * 2, range(5))) == [0, 2, 4, 6, 8]
+
+def no_pool(*args, **kwargs):
+    raise AssertionError("a process pool was started")
+
+def test_single_item_starts_no_pool(monkeypatch):
+    monkeypatch.setattr(concurrent.futures, "ProcessPoolExecutor", no_pool)
+    assert list(parallel.ordered_map(operator.neg, [7], workers=4)) == [-7]
+    assert list(parallel.ordered_map(operator.neg, [], workers=4)) == []
+
+def test_parallel_round_trip(key):
+    data = sample_data(8 * CHUNK)
+    blob = io.BytesIO()
+    encryption.encrypt_stream(io.BytesIO(data), blob, key, chunk_size=CHUNK, workers=2)
+    out = io.BytesIO()
+    encryption.decrypt_stream(io.BytesIO(blob.getvalue()), out, key, 2)
+    assert out.getvalue() == data
+
+def test_small_file_starts_no_pool(monkeypatch, key):
+    monkeypatch.setattr(concurrent.futures, "ProcessPoolExecutor", no_pool)
+    data = sample_data(100)
+    blob = io.BytesIO()
+    encryption.encrypt_stream(io.BytesIO(data), blob, key, chunk_size=CHUNK, workers=2)
+    out = io.BytesIO()
+    encryption.decrypt_stream(io.BytesIO(blob.getvalue()), out, key, 2)
+    assert out.getvalue() == data
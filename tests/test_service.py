@@ -0,0 +1,160 @@
+import io
+import os
+import shutil
+import signal
+import socket
+import stat
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import pytest
+
+from cryptora import client, encryption
+
+from conftest import NEW_KEY, OLD_KEY, load, sample_data
+
+pytestmark = pytest.mark.skipif(not hasattr(socket, "AF_UNIX"), reason="needs Unix sockets")
+
+SCRIPT = "import sys; from cryptora import cli; cli.KEYS_DIR = sys.argv.pop(1); cli.main()"
+
+
+@pytest.fixture
+def socket_path():
+    # Unix socket paths are short: keep it out of pytest's long tmp_path
+    folder = tempfile.mkdtemp(prefix="cry")
+    yield os.path.join(folder, "s.sock")
+    shutil.rmtree(folder)
+
+@pytest.fixture
+def start_service(keys_dir, key_paths, socket_path, monkeypatch):
+    """
+    Starts `cryptora serve` in a child process, returns it once it answers
+    """
+    monkeypatch.delenv(client.SOCKET_ENV, raising=False)
+    processes = []
+
+    def start(*args):
+        env = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.dirname(client.__file__)))
+        process = subprocess.Popen([sys.executable, "-c", SCRIPT, str(keys_dir), "serve", "--socket", socket_path,
+                                    *args], stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, env=env)
+        processes.append(process)
+        deadline = time.monotonic() + 20
+        while True:
+            try:
+                client.call(socket_path, "ping")
+                return process
+            except client.ServiceError:
+                if process.poll() is not None or time.monotonic() > deadline:
+                    raise AssertionError(process.communicate()[0])
+                time.sleep(0.05)
+
+    yield start
+    for process in processes:
+        if process.poll() is None:
+            process.send_signal(signal.SIGTERM)
+            process.communicate(timeout=30)
+
+def remote(socket_path, op, data, **options):
+    out = io.BytesIO()
+    reply = client.call(socket_path, op, io.BytesIO(data), lambda reply: out, **options)
+    return reply, out.getvalue()
+
+
+def test_default_request_limit(start_service, socket_path):
+    start_service()
+    assert client.call(socket_path, "ping")["max_requests"] == 4
+
+def test_request_limit(start_service, socket_path):
+    start_service("-w", "2")
+    assert client.call(socket_path, "ping")["max_requests"] == 2
+
+def test_socket_is_owner_only(start_service, socket_path):
+    start_service()
+    assert stat.S_IMODE(os.stat(socket_path).st_mode) == 0o600
+
+def test_round_trip(start_service, socket_path, key_paths):
+    start_service()
+    data = sample_data(3 * 1024 * 1024 + 5)
+    reply, encrypted = remote(socket_path, "encrypt", data, compression="zlib")
+    assert reply == {"key": NEW_KEY}
+    # Readable without the service, with the key it named
+    out = io.BytesIO()
+    encryption.decrypt_stream(io.BytesIO(encrypted), out, load(key_paths[1]))
+    assert out.getvalue() == data
+    # The key is found from the header
+    assert remote(socket_path, "decrypt", encrypted) == ({"key": NEW_KEY}, data)
+
+def test_concurrent_requests(start_service, socket_path):
+    start_service()
+    inputs = [sample_data(200000 + i, seed=i) for i in range(12)]
+    results = [None] * len(inputs)
+
+    def run(i):
+        _, encrypted = remote(socket_path, "encrypt", inputs[i])
+        results[i] = remote(socket_path, "decrypt", encrypted)[1]
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(len(inputs))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(60)
+    assert results == inputs
+
+def test_failures(start_service, socket_path, key_paths):
+    start_service()
+    _, encrypted = remote(socket_path, "encrypt", sample_data(10000), key=key_paths[0])
+    with pytest.raises(client.ServiceError, match="Incorrect key|failed"):
+        remote(socket_path, "decrypt", encrypted, key=key_paths[1])
+    with pytest.raises(client.ServiceError, match="failed"):
+        remote(socket_path, "decrypt", encrypted[:-100])
+    with pytest.raises(client.ServiceError, match="Unknown operation"):
+        remote(socket_path, "shred", b"")
+    # The service keeps serving
+    assert client.call(socket_path, "ping")["ok"]
+
+def test_cli_through_the_service(tmp_path, start_service, socket_path, run_cli, key_paths):
+    start_service()
+    source = tmp_path / "report.csv"
+    source.write_bytes(sample_data(50000))
+    assert run_cli("encrypt", "-f", source, "--socket", socket_path, "-k", key_paths[0]) == 0
+    encrypted = str(source) + ".enc_" + OLD_KEY[:-4]
+    output = tmp_path / "report.out"
+    assert run_cli("decrypt", "-f", encrypted, "-o", output, "--socket", socket_path) == 0
+    assert output.read_bytes() == source.read_bytes()
+
+    # A failed request keeps the existing output
+    output.write_bytes(b"keep me")
+    assert run_cli("decrypt", "-f", encrypted, "-o", output, "-k", key_paths[1], "--socket", socket_path) == 1
+    assert output.read_bytes() == b"keep me"
+
+@pytest.mark.parametrize("option", [["--stats"], ["-w", "1"], ["-w", "4"]])
+def test_cli_refuses_local_options(tmp_path, run_cli, socket_path, option):
+    source = tmp_path / "data"
+    source.write_bytes(b"data")
+    assert run_cli("encrypt", "-f", source, "--socket", socket_path, *option) == 2
+
+def test_cli_without_a_service(tmp_path, run_cli, socket_path, key_paths, capsys):
+    source = tmp_path / "data"
+    source.write_bytes(b"data")
+    assert run_cli("encrypt", "-f", source, "--socket", socket_path) == 1
+    assert "Cannot reach the service" in capsys.readouterr().out
+
+def test_one_service_per_socket(start_service, socket_path):
+    first = start_service()
+    second = subprocess.run([sys.executable, "-c", SCRIPT, "unused", "serve", "--socket", socket_path],
+                            capture_output=True, text=True, timeout=30,
+                            env=dict(os.environ, PYTHONPATH=os.path.dirname(os.path.dirname(client.__file__))))
+    assert "already listening" in second.stdout
+    first.send_signal(signal.SIGTERM)
+    first.communicate(timeout=30)
+    assert first.returncode == 0
+    assert not os.path.exists(socket_path)
+
+def test_stale_socket_is_replaced(start_service, socket_path):
+    stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    stale.bind(socket_path)
+    stale.close()  # the file stays, nothing listens
+    start_service()
+    assert client.call(socket_path, "ping")["ok"]
@@ -0,0 +1,89 @@
+import io
+import json
+
+import pytest
+
+from cryptora import encryption, stats
+
+from conftest import sample_data
+
+CHUNK = 4096
+
+
+@pytest.fixture
+def hook_reports():
+    reports = []
+    stats.add_hook(reports.append)
+    yield reports
+    stats.remove_hook(reports.append)
+
+def round_trip(key, data, metered=None, **options):
+    blob = io.BytesIO()
+    encryption.encrypt_stream(io.BytesIO(data), blob, key, chunk_size=CHUNK, stats=metered, **options)
+    out = io.BytesIO()
+    encryption.decrypt_stream(io.BytesIO(blob.getvalue()), out, key, 1, metered)
+    return out.getvalue()
+
+
+def test_stage_counters(key):
+    data = sample_data(3 * CHUNK + 10)
+    metered = stats.Stats("encrypt", "data")
+    assert round_trip(key, data, metered, compression="zlib") == data
+    report = metered.finish()
+    assert report["operation"] == "encrypt" and report["path"] == "data"
+    assert list(report["stages"]) == ["read", "compress", "encrypt", "decrypt", "decompress", "write"]
+    assert report["stages"]["compress"]["bytes"] == len(data)
+    assert report["stages"]["decompress"]["bytes"] == len(data)
+    assert report["stages"]["encrypt"]["calls"] == 4
+    json.dumps(report)
+
+def test_report_math():
+    metered = stats.Stats("decrypt")
+    metered.add("read", 2 * 1024 * 1024, 0.5)
+    metered.add("read", 2 * 1024 * 1024, 0.5)
+    metered.count_file()
+    metered.count_file(ok=False)
+    report = metered.report()
+    assert report["stages"]["read"] == {"bytes": 4 * 1024 * 1024, "seconds": 1.0, "calls": 2, "mb_s": 4.0}
+    assert report["bytes"] == 4 * 1024 * 1024
+    assert report["files"] == 2 and report["errors"] == 1
+
+def test_no_stats_without_hooks():
+    with stats.recording("encrypt") as metered:
+        assert metered is None
+
+def test_hooks_get_every_operation(tmp_path, key, hook_reports):
+    source = tmp_path / "data"
+    source.write_bytes(sample_data(10000))
+    encrypted = encryption.encrypt_file(str(source), key, str(tmp_path / "data.enc"))
+    encryption.decrypt_file(encrypted, key, str(tmp_path / "data.out"))
+    assert [report["operation"] for report in hook_reports] == ["encrypt", "decrypt"]
+    assert all(report["files"] == 1 and report["errors"] == 0 for report in hook_reports)
+    assert hook_reports[0]["bytes"] == 10000
+
+def test_failed_operation_is_counted(hook_reports):
+    with pytest.raises(RuntimeError):
+        with stats.recording("encrypt", "data"):
+            raise RuntimeError("failed")
+    assert hook_reports[0]["errors"] == 1
+
+def test_failing_hook_is_skipped(hook_reports):
+    def broken(report):
+        raise ValueError("exporter down")
+    stats.add_hook(broken)
+    try:
+        stats.Stats("encrypt").finish()
+    finally:
+        stats.remove_hook(broken)
+    assert len(hook_reports) == 1
+
+@pytest.mark.parametrize("destination", ["-", "file"])
+def test_stats_option(tmp_path, capsys, run_cli, key_paths, destination):
+    source = tmp_path / "data"
+    source.write_bytes(sample_data(10000))
+    target = "-" if destination == "-" else tmp_path / "stats.json"
+    assert run_cli("encrypt", "-f", source, "--stats", target) == 0
+    text = capsys.readouterr().err if destination == "-" else target.read_text()
+    report = json.loads(text)
+    assert report["files"] == 1 and report["bytes"] == 10000
+    assert report["stages"]["encrypt"]["bytes"] > 0
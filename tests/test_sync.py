@@ -0,0 +1,103 @@
+import os
+
+import pytest
+
+from cryptora import encryption, sync
+
+from conftest import OLD_KEY, NEW_KEY, load, sample_data, write_key
+
+
+@pytest.fixture
+def tree(tmp_path):
+    src = tmp_path / "src"
+    (src / "sub").mkdir(parents=True)
+    for i, name in enumerate(["a.txt", "b.txt", "sub/c.txt"]):
+        (src / name).write_bytes(sample_data(5000 + i, seed=i))
+    return src
+
+@pytest.fixture
+def key_path(tmp_path):
+    return write_key(tmp_path, OLD_KEY)
+
+def run(src, dest, key_path, **options):
+    return sync.sync_folder(str(src), load(key_path), key_path, str(dest), **options)
+
+def output_of(dest, rel, key_path):
+    return os.path.join(dest, rel) + ".enc_" + os.path.basename(key_path)[:-4]
+
+
+def test_first_sync_encrypts_everything(tree, tmp_path, key_path):
+    dest = tmp_path / "dest"
+    counts = run(tree, dest, key_path)
+    assert counts["ok"] == 3
+    for rel in ["a.txt", "b.txt", "sub/c.txt"]:
+        output = encryption.decrypt_file(output_of(dest, rel, key_path), load(key_path), str(tmp_path / "out"))
+        assert open(output, "rb").read() == (tree / rel).read_bytes()
+
+    manifest = sync.load_manifest(str(dest / sync.MANIFEST_NAME))
+    assert manifest["version"] == sync.MANIFEST_VERSION
+    assert sorted(manifest["files"]) == ["a.txt", "b.txt", "sub/c.txt"]
+    entry = manifest["files"]["a.txt"]
+    assert entry["size"] == 5000
+    assert entry["output"] == "a.txt.enc_" + OLD_KEY[:-4]
+
+def test_rerun_skips_unchanged(tree, tmp_path, key_path):
+    dest = tmp_path / "dest"
+    run(tree, dest, key_path)
+    counts = run(tree, dest, key_path)
+    assert counts["unchanged"] == 3 and counts["ok"] == 0
+
+def test_touch_does_not_reencrypt(tree, tmp_path, key_path):
+    dest = tmp_path / "dest"
+    run(tree, dest, key_path)
+    output = output_of(dest, "a.txt", key_path)
+    written = os.stat(output).st_mtime_ns
+    os.utime(tree / "a.txt", ns=(written + 10 ** 9, written + 10 ** 9))
+    counts = run(tree, dest, key_path)
+    assert counts["unchanged"] == 3
+    assert os.stat(output).st_mtime_ns == written
+
+def test_modified_file_is_reencrypted(tree, tmp_path, key_path):
+    dest = tmp_path / "dest"
+    run(tree, dest, key_path)
+    (tree / "b.txt").write_bytes(b"changed")
+    counts = run(tree, dest, key_path)
+    assert counts["ok"] == 1 and counts["unchanged"] == 2
+    output = encryption.decrypt_file(output_of(dest, "b.txt", key_path), load(key_path), str(tmp_path / "out"))
+    assert open(output, "rb").read() == b"changed"
+
+def test_tampered_output_is_replaced(tree, tmp_path, key_path):
+    dest = tmp_path / "dest"
+    run(tree, dest, key_path)
+    with open(output_of(dest, "a.txt", key_path), "ab") as f:
+        f.write(b"junk")
+    assert run(tree, dest, key_path)["ok"] == 1
+
+def test_delete(tree, tmp_path, key_path):
+    dest = tmp_path / "dest"
+    run(tree, dest, key_path)
+    os.remove(tree / "sub" / "c.txt")
+    assert run(tree, dest, key_path)["deleted"] == 0
+    assert os.path.exists(output_of(dest, "sub/c.txt", key_path))
+    assert run(tree, dest, key_path, delete=True)["deleted"] == 1
+    assert not os.path.exists(output_of(dest, "sub/c.txt", key_path))
+    assert "sub/c.txt" not in sync.load_manifest(str(dest / sync.MANIFEST_NAME))["files"]
+
+def test_key_change_reencrypts_and_replaces(tree, tmp_path, key_path):
+    dest = tmp_path / "dest"
+    run(tree, dest, key_path)
+    new_path = write_key(tmp_path, NEW_KEY)
+    assert run(tree, dest, new_path)["ok"] == 3
+    assert not os.path.exists(output_of(dest, "a.txt", key_path))
+    assert os.path.exists(output_of(dest, "a.txt", new_path))
+
+def test_sync_in_place(tree, key_path):
+    assert run(tree, tree, key_path)["ok"] == 3
+    # Outputs and the manifest are not sources
+    assert run(tree, tree, key_path)["unchanged"] == 3
+
+def test_corrupt_manifest_starts_over(tree, tmp_path, key_path):
+    dest = tmp_path / "dest"
+    run(tree, dest, key_path)
+    (dest / sync.MANIFEST_NAME).write_text("{not json")
+    assert run(tree, dest, key_path)["ok"] == 3
@@ -0,0 +1,58 @@
+import json
+import os
+
+import pytest
+from cryptography.fernet import Fernet
+
+from cryptora import encryption, keystore, verify
+
+from conftest import sample_data
+
+
+@pytest.fixture
+def files(tmp_path, key):
+    paths = {}
+    for name in ("first", "second"):
+        (tmp_path / name).write_bytes(sample_data(5000))
+        paths[name] = encryption.encrypt_file(str(tmp_path / name), key, str(tmp_path / f"{name}.enc"))
+    truncated = tmp_path / "truncated.enc"
+    truncated.write_bytes(open(paths["first"], "rb").read()[:-50])
+    paths["truncated"] = str(truncated)
+    legacy = tmp_path / "legacy.enc"
+    legacy.write_bytes(Fernet(Fernet.generate_key()).encrypt(b"other key"))
+    paths["legacy"] = str(legacy)
+    paths["missing"] = str(tmp_path / "missing.enc")
+    return paths
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_results_follow_input_order(files, key, workers):
+    order = ["missing", "first", "legacy", "truncated", "second"]
+    results = verify.verify_files([files[name] for name in order], key=key, workers=workers)
+    assert [result.path for result in results] == [files[name] for name in order]
+    assert [result.status for result in results] == ["error", "ok", "corrupt", "truncated", "ok"]
+    assert "wrong key" in results[2].detail
+
+def test_missing_key_keeps_its_place(files, tmp_path, key):
+    # The registry knows the key of the containers, not the legacy file's
+    (tmp_path / "keys").mkdir()
+    (tmp_path / "keys" / "cryptora_20250101_000000.key").write_bytes(key)
+    registry = keystore.KeyRegistry(str(tmp_path / "keys"))
+    results = verify.verify_files([files["legacy"], files["first"], files["missing"]], registry=registry)
+    assert [result.status for result in results] == ["missing-key", "ok", "error"]
+
+def test_summary(files, key):
+    results = verify.verify_files([files["first"], files["truncated"]], key=key)
+    report = verify.summary(results, 1.0)
+    assert report["files"] == 2
+    assert report["counts"]["ok"] == 1 and report["counts"]["truncated"] == 1
+    assert [problem["path"] for problem in report["problems"]] == [files["truncated"]]
+
+def test_verify_action(files, key, keys_dir, run_cli, tmp_path):
+    (keys_dir / "cryptora_20250101_000000.key").write_bytes(key)
+    before = sorted(os.listdir(tmp_path))
+    report = tmp_path / "report.json"
+    assert run_cli("verify", "-f", files["first"], files["second"], "--report", report) == 0
+    assert json.loads(report.read_text())["counts"]["ok"] == 2
+    # Nothing but the report is written
+    assert sorted(os.listdir(tmp_path)) == sorted(before + ["report.json"])
+    assert run_cli("verify", "-f", files["first"], files["truncated"]) == 1
@@ -0,0 +1,172 @@
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+from cryptora import encryption, watch
+
+from conftest import NEW_KEY, load, sample_data
+
+MODES = ["poll"] + (["inotify"] if watch.inotify_available() else [])
+
+
+def wait_for(condition, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("timed out")
+        time.sleep(0.02)
+
+@pytest.fixture
+def start(key_paths):
+    """
+    Starts a Watcher on a thread, returns it; stopped after the test
+    """
+    running = []
+
+    def start(src, dest=None, mode="poll", **options):
+        options.setdefault("interval", 0.05)
+        watcher = watch.Watcher(str(src), load(key_paths[1]), key_paths[1], dest and str(dest),
+                                poll=mode == "poll", **options)
+        thread = threading.Thread(target=watcher.run)
+        thread.start()
+        running.append((watcher, thread))
+        return watcher
+
+    yield start
+    for watcher, thread in running:
+        watcher.stop()
+        thread.join(10)
+
+@pytest.fixture
+def folders(tmp_path):
+    src, dest = tmp_path / "drop", tmp_path / "encrypted"
+    src.mkdir()
+    return src, dest
+
+def output_of(dest, rel):
+    return os.path.join(dest, rel) + ".enc_" + NEW_KEY[:-4]
+
+def decrypted(path, key_paths, tmp_path):
+    out = encryption.decrypt_file(path, load(key_paths[1]), str(tmp_path / "check.out"))
+    return open(out, "rb").read()
+
+
+@pytest.mark.parametrize("mode", MODES)
+def test_encrypts_existing_and_new_files(tmp_path, key_paths, start, folders, mode):
+    src, dest = folders
+    (src / "before.txt").write_bytes(sample_data(5000))
+    watcher = start(src, dest, mode)
+    wait_for(lambda: os.path.exists(output_of(dest, "before.txt")))
+
+    (src / "sub").mkdir()
+    (src / "sub" / "after.txt").write_bytes(sample_data(7000, seed=1))
+    wait_for(lambda: os.path.exists(output_of(dest, "sub/after.txt")))
+    assert decrypted(output_of(dest, "sub/after.txt"), key_paths, tmp_path) == sample_data(7000, seed=1)
+    wait_for(lambda: watcher.counts["ok"] == 2)
+
+@pytest.mark.parametrize("mode", MODES)
+def test_burst_through_a_small_queue(tmp_path, key_paths, start, folders, mode):
+    src, dest = folders
+    start(src, dest, mode, workers=3, queue_size=2)
+    for i in range(60):
+        (src / f"f{i}.txt").write_bytes(sample_data(1000 + i, seed=i))
+
+    def all_encrypted():
+        # A file caught half written is encrypted again once complete
+        try:
+            return all(decrypted(output_of(dest, f"f{i}.txt"), key_paths, tmp_path) == sample_data(1000 + i, seed=i)
+                       for i in range(60))
+        except OSError:
+            return False
+    wait_for(all_encrypted)
+    assert not [name for name in os.listdir(dest) if name.endswith(watch.PART_SUFFIX)]
+
+def test_in_place_with_remove_source(start, folders):
+    src, _ = folders
+    (src / "a.txt").write_bytes(b"a")
+    (src / ".hidden.tmp").write_bytes(b"writer's temp file")
+    watcher = start(src, remove_source=True)
+    expected = [".hidden.tmp", "a.txt.enc_" + NEW_KEY[:-4]]
+    wait_for(lambda: sorted(os.listdir(src)) == expected)
+    # Neither the output nor the dot file is picked up
+    time.sleep(0.3)
+    assert sorted(os.listdir(src)) == expected
+    assert watcher.counts == {"ok": 1}
+
+def test_restart_resumes(tmp_path, key_paths, start, folders):
+    src, dest = folders
+    (src / "done.txt").write_bytes(b"done")
+    os.utime(src / "done.txt", (1_600_000_000, 1_600_000_000))
+    (src / "todo.txt").write_bytes(b"todo")
+    dest.mkdir()
+    encryption.encrypt_file(str(src / "done.txt"), load(key_paths[1]), output_of(dest, "done.txt"))
+    done_before = os.stat(output_of(dest, "done.txt")).st_mtime_ns
+    # Left by a crash
+    stale = output_of(dest, "todo.txt") + watch.PART_SUFFIX
+    open(stale, "wb").write(b"half")
+    start(src, dest)
+    wait_for(lambda: os.path.exists(output_of(dest, "todo.txt")))
+    assert not os.path.exists(stale)
+    assert os.stat(output_of(dest, "done.txt")).st_mtime_ns == done_before
+
+def test_file_changed_while_encrypting_is_redone(folders, key_paths):
+    src, dest = folders
+    path = str(src / "a.txt")
+    watcher = watch.Watcher(str(src), load(key_paths[1]), key_paths[1], str(dest), workers=2)
+    calls = []
+
+    def process(path):
+        calls.append(path)
+        if len(calls) == 1:
+            # An event for the file arrives while it is being encrypted
+            watcher.offer(path)
+            assert watcher.queue.empty()
+    watcher._process = process
+
+    workers = [threading.Thread(target=watcher._worker) for _ in range(2)]
+    for thread in workers:
+        thread.start()
+    watcher.offer(path)
+    wait_for(lambda: len(calls) == 2)
+    for thread in workers:
+        watcher.queue.put(None)
+    for thread in workers:
+        thread.join(10)
+    # The same worker went again, no other worker had it at the same time
+    assert calls == [path, path]
+    assert not watcher._in_flight and not watcher._changed
+
+def test_output_from_the_same_tick_is_not_done(folders, key_paths):
+    # A source written in the same timestamp tick as its output may have
+    # changed after it was encrypted
+    src, dest = folders
+    (src / "a.txt").write_bytes(b"a")
+    watcher = watch.Watcher(str(src), load(key_paths[1]), key_paths[1], str(dest))
+    dest.mkdir()
+    output = watcher.output_path(str(src / "a.txt"))
+    open(output, "wb").close()
+    mtime = os.stat(src / "a.txt").st_mtime_ns
+    os.utime(output, ns=(mtime, mtime))
+    assert not watcher._is_done(str(src / "a.txt"))
+    os.utime(output, ns=(mtime + 1, mtime + 1))
+    assert watcher._is_done(str(src / "a.txt"))
+
+def test_watch_action_stops_on_sigterm(tmp_path, keys_dir, key_paths, folders):
+    src, dest = folders
+    env = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.dirname(watch.__file__)))
+    script = "import sys; from cryptora import cli; cli.KEYS_DIR = sys.argv.pop(1); cli.main()"
+    process = subprocess.Popen([sys.executable, "-c", script, str(keys_dir), "watch", "-d", str(src), "-o", str(dest),
+                                "--poll", "--interval", "0.05"], stdout=subprocess.PIPE, text=True, env=env)
+    try:
+        (src / "a.txt").write_bytes(b"a")
+        wait_for(lambda: os.path.exists(output_of(dest, "a.txt")))
+    finally:
+        process.send_signal(signal.SIGTERM)
+        out, _ = process.communicate(timeout=30)
+    assert process.returncode == 0
+    assert "Stopped. Encrypted 1 file(s), 0 skipped, 0 failed" in out